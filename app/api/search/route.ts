@@ -39,7 +39,7 @@ function getDocumentTitle(filename: string): string {
   return filename.replace('.pdf', '') // Fallback to filename without extension
 }
 
-async function callRAGBackend(query: string): Promise<SummaryResponse | null> {
+async function callRAGBackend(query: string, collection?: string): Promise<SummaryResponse | null> {
   try {
     const response = await fetch("http://localhost:8000/api/search", {
       method: "POST",
@@ -49,7 +49,8 @@ async function callRAGBackend(query: string): Promise<SummaryResponse | null> {
       body: JSON.stringify({
         query: query,
         threshold: 0.3,  // Show all results above 30% similarity
-        max_results: 15   // Get more results
+        max_results: 15,  // Get more results
+        collection        // Restrict retrieval to the selected collection, if any
       })
     })
 
@@ -162,7 +163,7 @@ export async function POST(request: Request) {
     const backendSources = toBackendSources(source as SourceInput)
     
     // Try to call our new RAG backend first
-    const ragResponse = await callRAGBackend(query)
+    const ragResponse = await callRAGBackend(query, collection)
     if (ragResponse) {
       return NextResponse.json(ragResponse, {
         status: 200,
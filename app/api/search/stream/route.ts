@@ -0,0 +1,41 @@
+import { NextResponse } from "next/server"
+
+// Proxies the backend's server-sent-events stream (`sources`, `token`, `done`)
+// straight through to the browser without buffering the body.
+export async function POST(request: Request) {
+  try {
+    const { query, threshold = 0.3, max_results = 15, collection, documents, page_from, page_to } = await request.json()
+
+    if (!query || typeof query !== "string" || query.trim().length === 0) {
+      return NextResponse.json({ error: "Query is required" }, { status: 400 })
+    }
+
+    const response = await fetch("http://localhost:8000/api/search/stream", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        accept: "text/event-stream",
+      },
+      body: JSON.stringify({ query, threshold, max_results, collection, documents, page_from, page_to }),
+      signal: request.signal,
+    })
+
+    if (!response.ok || !response.body) {
+      console.error("RAG stream backend error:", response.status)
+      return NextResponse.json({ error: "Streaming search failed" }, { status: 502 })
+    }
+
+    return new Response(response.body, {
+      status: 200,
+      headers: {
+        "content-type": "text/event-stream",
+        "cache-control": "no-cache, no-transform",
+        connection: "keep-alive",
+        "x-accel-buffering": "no",
+      },
+    })
+  } catch (error) {
+    console.error("Error calling RAG stream backend:", error)
+    return NextResponse.json({ error: "Streaming search failed" }, { status: 502 })
+  }
+}
@@ -0,0 +1,273 @@
+import gc
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, Request
+
+from src.embedding_engine import EmbeddingEngine, create_embedding_engine
+from src.embedding_cache import EmbeddingCache, create_embedding_cache
+from src.vector_store import create_vector_store
+from src.search_filter import DocumentCollections
+from src.lexical_index import LexicalIndex
+from src.manifest import DocumentManifest
+from src.search_engine import SemanticSearchEngine
+from src.rag_engine import RAGEngine
+from src.query_batcher import QueryBatcher
+from src.concurrency import BoundedExecutor
+from src.answer_cache import AnswerCache
+from src.reranker import CrossEncoderReranker, create_reranker
+from src.context_builder import ContextBuilder
+from src.retrieval_cutoff import create_adaptive_cutoff
+from src.lru_cache import LRUCache
+from src.warmup import Warmup, WarmupTimeout
+from config import settings
+
+
+class ComponentRegistry:
+    """
+    Owns the RAG components of one server process.
+
+    Every component is built at most once, under a lock, no matter how many
+    requests or warm-up attempts ask for it concurrently; a failed build
+    keeps what was already constructed and the next attempt builds the rest.
+    `warmup` builds and warms everything in a background thread, and
+    `close()` releases thread pools, clients and database handles on
+    shutdown.
+
+    For preforked workers, `preload()` loads the model weights in the parent
+    before forking so the children share them copy-on-write; each child
+    then calls `after_fork()` and builds the per-process parts (caches,
+    clients, thread pools) itself.
+    """
+
+    def __init__(self):
+        self.embedding_engine: Optional[EmbeddingEngine] = None
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.vector_store = None
+        self.search_engine: Optional[SemanticSearchEngine] = None
+        self.query_batcher: Optional[QueryBatcher] = None
+        self.reranker: Optional[CrossEncoderReranker] = None
+        self.rag_engine: Optional[RAGEngine] = None
+        self.collections = DocumentCollections.load(settings.COLLECTIONS_PATH)
+        self.preloaded = False
+        self._reranker_built = False
+        self._lock = threading.Lock()
+        self.warmup = Warmup(self.warm_up)
+
+    def preload(self):
+        """
+        Load model weights without running inference or opening files,
+        sockets or thread pools, so the process can fork safely afterwards.
+        The ONNX backend is not preloaded: an ONNX Runtime session owns
+        thread pools that do not survive a fork.
+        """
+        with self._lock:
+            if settings.EMBEDDING_BACKEND == "torch" and self.embedding_engine is None:
+                self.embedding_engine = create_embedding_engine(settings.EMBEDDING_MODEL, cache=None)
+            if not self._reranker_built:
+                self.reranker = self._create_reranker()
+                self._reranker_built = True
+            # Modules the workers import anyway are loaded once, in the parent
+            if settings.VECTOR_BACKEND == "chroma":
+                import chromadb  # noqa: F401
+            import anthropic  # noqa: F401
+            self.preloaded = True
+        # Keep the garbage collector from writing to the preloaded objects
+        # (and so copying their pages) in every worker
+        gc.collect()
+        gc.freeze()
+
+    def after_fork(self, torch_threads: int = 0):
+        """
+        Per-worker setup in a forked child: its own embedding cache
+        connection and, if given, a share of the CPU threads for PyTorch
+        """
+        if torch_threads > 0 and settings.EMBEDDING_BACKEND == "torch":
+            import torch
+            torch.set_num_threads(torch_threads)
+        with self._lock:
+            if self.embedding_engine is not None and self.embedding_cache is None:
+                self.embedding_cache = self._create_embedding_cache()
+                self.embedding_engine.cache = self.embedding_cache
+
+    def _create_embedding_cache(self) -> Optional[EmbeddingCache]:
+        return create_embedding_cache(
+            settings.EMBEDDING_CACHE_ENABLED,
+            settings.EMBEDDING_CACHE_PATH,
+            settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+
+    def _create_reranker(self) -> Optional[CrossEncoderReranker]:
+        return create_reranker(
+            settings.RERANK_ENABLED,
+            settings.RERANK_MODEL,
+            candidates=settings.RERANK_CANDIDATES,
+            top_k=settings.RERANK_TOP_K,
+            batch_size=settings.RERANK_BATCH_SIZE,
+            latency_budget_ms=settings.RERANK_BUDGET_MS,
+            cache_max_entries=settings.RERANK_CACHE_MAX_ENTRIES
+        )
+
+    def build(self) -> RAGEngine:
+        """
+        Construct whatever has not been built yet and return the RAG engine
+        """
+        with self._lock:
+            if self.rag_engine is not None:
+                return self.rag_engine
+
+            if self.embedding_engine is None:
+                self.embedding_cache = self._create_embedding_cache()
+                self.embedding_engine = create_embedding_engine(
+                    settings.EMBEDDING_MODEL,
+                    cache=self.embedding_cache,
+                    backend=settings.EMBEDDING_BACKEND,
+                    onnx_dir=settings.ONNX_MODEL_DIR,
+                    onnx_quantized=settings.ONNX_QUANTIZE,
+                    intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+                    inter_op_threads=settings.ONNX_INTER_OP_THREADS
+                )
+
+            if self.vector_store is None:
+                self.vector_store = create_vector_store(
+                    settings.VECTOR_BACKEND,
+                    compression=settings.VECTOR_COMPRESSION,
+                    pq_subspaces=settings.PQ_SUBSPACES,
+                    rescore_factor=settings.RESCORE_FACTOR,
+                    partitions=self.collections.partitions(settings.PARTITIONED_COLLECTIONS),
+                    shards=settings.VECTOR_SHARDS
+                )
+                manifest = DocumentManifest.for_store(self.vector_store.persist_directory)
+                if manifest.entries and manifest.shards != settings.VECTOR_SHARDS:
+                    print(f"⚠️  The vector store was ingested with {manifest.shards} shard(s) but "
+                          f"VECTOR_SHARDS={settings.VECTOR_SHARDS}; run process_all_pdfs.py to re-ingest it")
+
+            if self.search_engine is None:
+                self.search_engine = SemanticSearchEngine(
+                    self.embedding_engine,
+                    self.vector_store,
+                    result_cache=LRUCache(settings.RETRIEVAL_CACHE_MAX_ENTRIES)
+                    if settings.RETRIEVAL_CACHE_ENABLED else None,
+                    lexical_index=LexicalIndex.for_store(self.vector_store.persist_directory)
+                    if settings.SEARCH_MODE == "hybrid" else None,
+                    mode=settings.SEARCH_MODE,
+                    fusion=settings.HYBRID_FUSION,
+                    rrf_k=settings.RRF_K,
+                    lexical_weight=settings.HYBRID_LEXICAL_WEIGHT,
+                    candidate_pool=settings.HYBRID_CANDIDATES
+                )
+
+            if self.query_batcher is None:
+                self.query_batcher = QueryBatcher(
+                    self.embedding_engine,
+                    window_ms=settings.QUERY_BATCH_WINDOW_MS,
+                    max_batch_size=settings.QUERY_BATCH_MAX_SIZE
+                )
+
+            if not self._reranker_built:
+                self.reranker = self._create_reranker()
+                self._reranker_built = True
+
+            self.rag_engine = RAGEngine(
+                self.search_engine,
+                search_executor=BoundedExecutor("rag-search", max_workers=settings.SEARCH_EXECUTOR_WORKERS),
+                query_batcher=self.query_batcher,
+                answer_cache=AnswerCache(
+                    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+                    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                    semantic_distance=settings.ANSWER_CACHE_SEMANTIC_DISTANCE
+                ) if settings.ANSWER_CACHE_ENABLED else None,
+                reranker=self.reranker,
+                context_builder=ContextBuilder(
+                    token_budget=settings.CONTEXT_TOKEN_BUDGET,
+                    duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD
+                ) if settings.CONTEXT_PACKING_ENABLED else None,
+                cutoff=create_adaptive_cutoff(
+                    settings.RETRIEVAL_CUTOFF,
+                    min_results=settings.RETRIEVAL_MIN_RESULTS,
+                    elbow_gap=settings.RETRIEVAL_ELBOW_GAP,
+                    score_mass=settings.RETRIEVAL_SCORE_MASS,
+                    token_budget=settings.RETRIEVAL_TOKEN_BUDGET
+                ),
+                max_results=settings.MAX_SEARCH_RESULTS,
+                max_concurrent_llm_calls=settings.LLM_MAX_CONCURRENCY,
+                llm_model=settings.LLM_MODEL
+            )
+            return self.rag_engine
+
+    def warm_up(self, steps: Dict[str, float]) -> RAGEngine:
+        """
+        Build every component and run dummy inferences, recording each step's duration
+        """
+        started = time.perf_counter()
+        rag_engine = self.build()
+        steps['build_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        rag_engine.search_engine.embedding_engine.warm_up()
+        steps['encode_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        started = time.perf_counter()
+        rag_engine.search_engine.vector_store.get_collection_stats()
+        steps['vector_store_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        if rag_engine.reranker is not None:
+            started = time.perf_counter()
+            rag_engine.reranker.warm_up()
+            steps['rerank_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return rag_engine
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'preloaded': self.preloaded
+        }
+
+    async def close(self):
+        """
+        Release thread pools, clients and database handles of whatever was built
+        """
+        with self._lock:
+            rag_engine, self.rag_engine = self.rag_engine, None
+            query_batcher, self.query_batcher = self.query_batcher, None
+            search_engine, self.search_engine = self.search_engine, None
+            vector_store, self.vector_store = self.vector_store, None
+            embedding_cache, self.embedding_cache = self.embedding_cache, None
+
+        if query_batcher is not None:
+            await query_batcher.close()
+        if rag_engine is not None:
+            rag_engine.search_executor.shutdown(wait=False)
+            try:
+                await rag_engine.async_anthropic_client.close()
+                rag_engine.anthropic_client.close()
+            except Exception as e:
+                print(f"Error closing Anthropic clients: {str(e)}")
+        if search_engine is not None:
+            search_engine.close()
+        if vector_store is not None:
+            vector_store.close()
+        if embedding_cache is not None:
+            if self.embedding_engine is not None:
+                self.embedding_engine.cache = None
+            embedding_cache.close()
+
+
+def get_components(request: Request) -> ComponentRegistry:
+    return request.app.state.components
+
+
+async def get_rag_engine(request: Request) -> RAGEngine:
+    """
+    The RAG engine once warm-up has finished; 503 if it takes longer than
+    WARMUP_WAIT_TIMEOUT_S or fails
+    """
+    components = get_components(request)
+    try:
+        return await components.warmup.wait(settings.WARMUP_WAIT_TIMEOUT_S)
+    except WarmupTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
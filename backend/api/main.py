@@ -1,18 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from .routes import search
+from .components import ComponentRegistry
+from .metrics import MetricsMiddleware, component_collector, router as metrics_router
+from src.metrics import REGISTRY
+from config import settings
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    components = app.state.components
+    collector = component_collector(components)
+    REGISTRY.add_collector(collector)
+    # Models load in the background; the port is bound without waiting for them
+    if settings.WARMUP_ENABLED:
+        components.warmup.start()
+    yield
+    if REGISTRY.shared_directory is not None:
+        REGISTRY.stop_sharing()
+    REGISTRY.remove_collector(collector)
+    await components.close()
+
 app = FastAPI(
     title="IRIS.ai RAG API",
     description="Retrieval-Augmented Generation API for Patent Document Analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# One registry per process; a preforking server preloads it before forking workers
+app.state.components = ComponentRegistry()
+
 # Configure CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -22,8 +46,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts, latency and in-flight gauges for /metrics (not installed when disabled)
+REGISTRY.enabled = settings.METRICS_ENABLED
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -35,7 +65,31 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """
+    Liveness (the process serves requests) and readiness (models are loaded)
+    """
+    components = app.state.components
+    return {
+        "status": "healthy",
+        "live": True,
+        "ready": components.warmup.ready,
+        "warmup": components.warmup.stats(),
+        "worker": components.stats()
+    }
+
+@app.get("/health/live")
+async def liveness():
+    return {"status": "live"}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    200 once warm-up has finished, 503 before (for load balancer readiness probes)
+    """
+    warmup = app.state.components.warmup
+    if warmup.ready:
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": warmup.state, "warmup": warmup.stats()})
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,108 @@
+import time
+from typing import Iterable
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from src.metrics import REGISTRY, Family
+from .components import ComponentRegistry
+
+HTTP_REQUESTS = REGISTRY.counter("rag_http_requests", "HTTP requests by route and status", ["method", "route", "status"])
+HTTP_SECONDS = REGISTRY.histogram("rag_http_request_duration_seconds", "HTTP request latency by route", ["route"])
+HTTP_IN_FLIGHT = REGISTRY.gauge("rag_http_requests_in_flight", "HTTP requests in progress")
+
+router = APIRouter()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests, their latency (until the response
+    body is sent, so streams count in full) and the number in flight,
+    labelled by route template rather than raw path
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.labels(scope["method"], path, status).inc()
+            HTTP_SECONDS.labels(path).observe(time.perf_counter() - started)
+
+
+def component_collector(components: ComponentRegistry):
+    """
+    Scrape-time metrics read from the components' own counters: cache hits
+    and misses, executor and batcher activity, warm-up state
+    """
+
+    def collect() -> Iterable[Family]:
+        yield ("rag_ready", "gauge", "1 once warm-up has finished",
+               [({}, 1.0 if components.warmup.ready else 0.0)])
+        rag_engine = components.rag_engine
+        if rag_engine is None:
+            return
+
+        caches = []
+        embedding_cache = rag_engine.search_engine.embedding_engine.cache
+        if embedding_cache is not None:
+            caches.append(("embedding", embedding_cache.hits, embedding_cache.misses))
+        if rag_engine.search_engine.result_cache is not None:
+            stats = rag_engine.search_engine.result_cache.stats()
+            caches.append(("retrieval", stats['hits'], stats['misses']))
+        if rag_engine.answer_cache is not None:
+            stats = rag_engine.answer_cache.stats()
+            caches.append(("answer", stats['exact_hits'] + stats['semantic_hits'], stats['misses']))
+        if rag_engine.reranker is not None:
+            stats = rag_engine.reranker.score_cache.stats()
+            caches.append(("rerank_score", stats['hits'], stats['misses']))
+        yield ("rag_cache_hits_total", "counter", "Cache hits by cache",
+               [({'cache': name}, hits) for name, hits, _ in caches])
+        yield ("rag_cache_misses_total", "counter", "Cache misses by cache",
+               [({'cache': name}, misses) for name, _, misses in caches])
+        yield ("rag_cache_hit_ratio", "gauge", "Cache hit ratio since startup by cache",
+               [({'cache': name}, hits / (hits + misses) if hits + misses else 0.0)
+                for name, hits, misses in caches])
+
+        executor = rag_engine.search_executor.stats()
+        yield ("rag_search_executor_in_flight", "gauge", "Retrieval calls running or queued in the search pool",
+               [({}, executor['in_flight'])])
+        yield ("rag_search_executor_completed_total", "counter", "Retrieval calls completed by the search pool",
+               [({}, executor['completed'])])
+        if rag_engine.query_batcher is not None:
+            batcher = rag_engine.query_batcher
+            yield ("rag_query_batcher_queries_total", "counter", "Query embeddings requested through the batcher",
+                   [({}, batcher.queries)])
+            yield ("rag_query_batcher_batches_total", "counter", "Encoder batches run by the query batcher",
+                   [({}, batcher.batches)])
+
+    return collect
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of this worker's metrics
+    """
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -5,12 +5,30 @@ class SearchQuery(BaseModel):
     query: str
     threshold: float = 0.3  # Show results above 30% similarity
     max_results: int = 15
+    # Optional filters: a collection (ID or name), source documents, and an inclusive page range
+    collection: Optional[str] = None
+    documents: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+
+class BatchSearchQuery(BaseModel):
+    queries: List[str]
+    threshold: float = 0.3
+    max_results: int = 15
+    collection: Optional[str] = None
+    documents: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    # Also generate an answer per query (retrieval is still batched)
+    generate_answers: bool = False
 
 class ChunkMetadata(BaseModel):
     document: str
     page: int
     section: str
     type: str
+    # Last page of chunks that span a page break
+    page_end: Optional[int] = None
 
 class Source(BaseModel):
     chunk_id: str
@@ -23,6 +41,20 @@ class RAGResponse(BaseModel):
     sources: List[Source]
     confidence: float
     total_chunks_found: int
+    timings: Optional[Dict[str, float]] = None
+    context: Optional[Dict[str, int]] = None
+
+class BatchSearchResult(BaseModel):
+    query: str
+    sources: List[Source]
+    total_chunks_found: int
+    answer: Optional[str] = None
+    confidence: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None
+
+class BatchSearchResponse(BaseModel):
+    results: List[BatchSearchResult]
+    timings: Dict[str, float]
 
 class ProcessingStatus(BaseModel):
     status: str
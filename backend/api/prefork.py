@@ -0,0 +1,117 @@
+import gc
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI
+
+from src.metrics import REGISTRY, mark_process_dead
+
+# A worker that exits sooner than this after starting is restarted with a delay
+MIN_WORKER_UPTIME_S = 5.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """
+    Listening socket created once in the master and inherited by every worker
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_preforked(app: FastAPI, host: str, port: int, workers: int, preload: bool = True,
+                    log_level: str = "info"):
+    """
+    Run `workers` uvicorn servers in forked child processes sharing one
+    listening socket.
+
+    With `preload`, the app's component registry loads the model weights in
+    this (master) process before forking, so all workers map the same
+    physical pages copy-on-write instead of each loading its own copy.
+    Unlike `uvicorn --workers`, which spawns fresh interpreters, this needs
+    `fork` and so only runs on POSIX systems. The master restarts workers
+    that die and forwards SIGINT/SIGTERM to them on shutdown. Workers share
+    their metrics through a temporary directory, so /metrics on any worker
+    covers the whole server.
+    """
+    components = app.state.components
+    sock = bind_socket(host, port)
+    if preload:
+        started = time.perf_counter()
+        components.preload()
+        print(f"📦 Preloaded models in {time.perf_counter() - started:.1f}s (pid {os.getpid()})")
+    else:
+        gc.freeze()
+    # Split the CPU between workers instead of each using every core
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    metrics_directory = tempfile.mkdtemp(prefix="rag-metrics-") if REGISTRY.enabled else None
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # uvicorn installs its own handlers once the server starts
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            status = 0
+            try:
+                components.after_fork(torch_threads)
+                if metrics_directory is not None:
+                    REGISTRY.share(metrics_directory)
+                config = uvicorn.Config(app, log_level=log_level)
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException as e:
+                print(f"Error in worker {os.getpid()}: {str(e)}")
+                status = 1
+            finally:
+                os._exit(status)
+        children[pid] = time.monotonic()
+        print(f"🚀 Started worker {pid}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if metrics_directory is not None:
+            mark_process_dead(metrics_directory, pid)
+        if started is None or stopping:
+            continue
+        print(f"⚠️  Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+        if time.monotonic() - started < MIN_WORKER_UPTIME_S:
+            time.sleep(MIN_WORKER_UPTIME_S)
+        if not stopping:
+            spawn()
+
+    sock.close()
+    if metrics_directory is not None:
+        shutil.rmtree(metrics_directory, ignore_errors=True)
+    print("✅ All workers stopped")
@@ -1,85 +1,181 @@
-from fastapi import APIRouter, HTTPException
-from ..models import SearchQuery, RAGResponse, ChunkDetail, Source, ChunkMetadata
-from src.embedding_engine import EmbeddingEngine
-from src.vector_store import VectorStore
-from src.search_engine import SemanticSearchEngine
+from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import Optional, Union
+from fastapi.responses import StreamingResponse
+from ..models import (SearchQuery, RAGResponse, ChunkDetail, Source, ChunkMetadata,
+                      BatchSearchQuery, BatchSearchResponse, BatchSearchResult)
+from ..components import ComponentRegistry, get_components, get_rag_engine
 from src.rag_engine import RAGEngine
+from src.search_filter import SearchFilter
+from src.metrics import server_timing_header
+from config import settings
+import json
 import os
+import time
 
 router = APIRouter()
 
-# Initialize components (singleton pattern)
-embedding_engine = None
-vector_store = None
-search_engine = None
-rag_engine = None
+def to_source(source_data: dict) -> Source:
+    """
+    Convert a RAG engine source to the API response format
+    """
+    return Source(
+        chunk_id=source_data['chunk_id'],
+        content=source_data['content'],
+        similarity=source_data['similarity'],
+        metadata=ChunkMetadata(
+            document=source_data['metadata']['document'],
+            page=source_data['metadata']['page'],
+            section=source_data['metadata']['section'],
+            type=source_data['metadata']['type'],
+            page_end=source_data['metadata'].get('page_end')
+        )
+    )
 
-def get_rag_components():
-    global embedding_engine, vector_store, search_engine, rag_engine
-    
-    if not embedding_engine:
-        embedding_engine = EmbeddingEngine()
-    
-    if not vector_store:
-        vector_store = VectorStore()
-    
-    if not search_engine:
-        search_engine = SemanticSearchEngine(embedding_engine, vector_store)
-    
-    if not rag_engine:
-        rag_engine = RAGEngine(search_engine)
-    
-    return rag_engine
+def to_search_filter(query: Union[SearchQuery, BatchSearchQuery],
+                     components: ComponentRegistry) -> Optional[SearchFilter]:
+    """
+    Build the request's search filter; an invalid filter is a 400
+    """
+    try:
+        return components.collections.build_filter(
+            collection=query.collection,
+            documents=query.documents,
+            page_from=query.page_from,
+            page_to=query.page_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/search", response_model=RAGResponse)
-async def search_documents(search_query: SearchQuery):
+async def search_documents(search_query: SearchQuery, http_response: Response,
+                           rag_engine: RAGEngine = Depends(get_rag_engine),
+                           components: ComponentRegistry = Depends(get_components)):
     """
     Search for relevant document chunks and generate an answer using Claude Sonnet
     """
+    search_filter = to_search_filter(search_query, components)
     try:
-        rag_engine = get_rag_components()
-        
-        # Generate RAG response
-        response = rag_engine.generate_answer(
+        # Generate RAG response without blocking the event loop
+        response = await rag_engine.generate_answer_async(
             query=search_query.query,
-            threshold=search_query.threshold
+            threshold=search_query.threshold,
+            max_results=search_query.max_results,
+            search_filter=search_filter
         )
-        
-        # Convert to API response format
-        sources = []
-        for source_data in response.sources:
-            source = Source(
-                chunk_id=source_data['chunk_id'],
-                content=source_data['content'],
-                similarity=source_data['similarity'],
-                metadata=ChunkMetadata(
-                    document=source_data['metadata']['document'],
-                    page=source_data['metadata']['page'],
-                    section=source_data['metadata']['section'],
-                    type=source_data['metadata']['type']
-                )
-            )
-            sources.append(source)
+        if settings.SERVER_TIMING_ENABLED and response.timings:
+            http_response.headers["Server-Timing"] = server_timing_header(response.timings)
         
         return RAGResponse(
             answer=response.answer,
-            sources=sources,
+            sources=[to_source(source_data) for source_data in response.sources],
             confidence=response.confidence,
-            total_chunks_found=response.total_chunks_found
+            total_chunks_found=response.total_chunks_found,
+            timings=response.timings,
+            context=response.context
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def search_documents_batch(batch_query: BatchSearchQuery, http_response: Response,
+                                 rag_engine: RAGEngine = Depends(get_rag_engine),
+                                 components: ComponentRegistry = Depends(get_components)):
+    """
+    Search for several queries in one request: all queries are embedded in
+    one forward pass and looked up in one vector store call. With
+    `generate_answers`, an answer per query is generated concurrently.
+    """
+    if not batch_query.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(batch_query.queries) > settings.BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_SEARCH_MAX_QUERIES} queries per batch"
+        )
+    search_filter = to_search_filter(batch_query, components)
+    
+    try:
+        started = time.perf_counter()
+        results = []
+        if batch_query.generate_answers:
+            responses = await rag_engine.generate_answers_async(
+                batch_query.queries,
+                threshold=batch_query.threshold,
+                max_results=batch_query.max_results,
+                search_filter=search_filter
+            )
+            for query, response in zip(batch_query.queries, responses):
+                results.append(BatchSearchResult(
+                    query=query,
+                    sources=[to_source(source_data) for source_data in response.sources],
+                    total_chunks_found=response.total_chunks_found,
+                    answer=response.answer,
+                    confidence=response.confidence,
+                    timings=response.timings
+                ))
+        else:
+            chunk_lists = await rag_engine.search_executor.run(
+                rag_engine.search_engine.search_many,
+                batch_query.queries,
+                threshold=batch_query.threshold,
+                max_results=batch_query.max_results,
+                search_filter=search_filter
+            )
+            for query, chunks in zip(batch_query.queries, chunk_lists):
+                results.append(BatchSearchResult(
+                    query=query,
+                    sources=[to_source(source_data) for source_data in rag_engine.format_sources(chunks)],
+                    total_chunks_found=len(chunks)
+                ))
+        
+        timings = {'total_ms': round((time.perf_counter() - started) * 1000, 2)}
+        if settings.SERVER_TIMING_ENABLED:
+            http_response.headers["Server-Timing"] = server_timing_header(timings)
+        
+        return BatchSearchResponse(results=results, timings=timings)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+@router.post("/search/stream")
+async def search_documents_stream(search_query: SearchQuery, rag_engine: RAGEngine = Depends(get_rag_engine),
+                                  components: ComponentRegistry = Depends(get_components)):
+    """
+    Stream a RAG answer as server-sent events: `sources` first, then `token`
+    events as Claude generates, then `done` with confidence and timings
+    """
+    search_filter = to_search_filter(search_query, components)
+    
+    async def event_stream():
+        async for event, data in rag_engine.stream_answer(
+            query=search_query.query,
+            threshold=search_query.threshold,
+            max_results=search_query.max_results,
+            search_filter=search_filter
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering so tokens flush immediately
+        }
+    )
+
 @router.get("/chunks/{chunk_id}", response_model=ChunkDetail)
-async def get_chunk_details(chunk_id: str):
+async def get_chunk_details(chunk_id: str, rag_engine: RAGEngine = Depends(get_rag_engine)):
     """
     Get detailed information about a specific chunk
     """
     try:
-        rag_engine = get_rag_components()
-        
-        chunk_data = rag_engine.search_engine.vector_store.get_chunk_by_id(chunk_id)
+        chunk_data = await rag_engine.search_executor.run(
+            rag_engine.search_engine.vector_store.get_chunk_by_id, chunk_id
+        )
         
         if not chunk_data:
             raise HTTPException(status_code=404, detail="Chunk not found")
@@ -91,7 +187,8 @@ async def get_chunk_details(chunk_id: str):
                 document=chunk_data['metadata']['source_document'],
                 page=chunk_data['metadata']['page_number'],
                 section=chunk_data['metadata']['section_title'],
-                type=chunk_data['metadata']['chunk_type']
+                type=chunk_data['metadata']['chunk_type'],
+                page_end=chunk_data['metadata'].get('page_end')
             )
         )
         
@@ -101,19 +198,44 @@ async def get_chunk_details(chunk_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve chunk: {str(e)}")
 
 @router.get("/status")
-async def get_status():
+async def get_status(components: ComponentRegistry = Depends(get_components)):
     """
-    Get the status of the RAG system
+    Get the status of the RAG system (without waiting for warm-up)
     """
+    warmup = components.warmup
+    if not warmup.ready:
+        warmup.start()
+        return {
+            "status": warmup.state,
+            "warmup": warmup.stats()
+        }
+    
     try:
-        rag_engine = get_rag_components()
-        stats = rag_engine.search_engine.get_statistics()
+        rag_engine = warmup.result
+        stats = await rag_engine.search_executor.run(rag_engine.search_engine.get_statistics)
+        embedding_cache = rag_engine.search_engine.embedding_engine.cache
         
         return {
             "status": "ready",
+            "warmup": warmup.stats(),
+            "worker_pid": os.getpid(),
             "total_chunks": stats['total_chunks'],
             "embedding_model": "all-MiniLM-L6-v2",
-            "llm_model": "claude-3-5-sonnet-20241022"
+            "embedding_backend": rag_engine.search_engine.embedding_engine.backend,
+            "llm_model": "claude-3-5-sonnet-20241022",
+            "search_mode": stats['search_mode'],
+            "lexical_index": stats.get('lexical_index'),
+            "embedding_cache": embedding_cache.stats() if embedding_cache else None,
+            "query_batcher": rag_engine.query_batcher.stats() if rag_engine.query_batcher else None,
+            "search_executor": rag_engine.search_executor.stats(),
+            "answer_cache": rag_engine.answer_cache.stats() if rag_engine.answer_cache else None,
+            "reranker": rag_engine.reranker.stats() if rag_engine.reranker else None,
+            "context_builder": rag_engine.context_builder.stats() if rag_engine.context_builder else None,
+            "retrieval_cutoff": rag_engine.cutoff.stats() if rag_engine.cutoff else None,
+            "retrieval_cache": (
+                rag_engine.search_engine.result_cache.stats()
+                if rag_engine.search_engine.result_cache else None
+            )
         }
         
     except Exception as e:
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the chunker against the previous implementation (a list
+of DocumentChunk + ChunkMetadata dataclasses per document): identical
+spans and contents, chunking time, and peak memory of materializing a
+document's chunks versus streaming slotted records in embedding batches.
+Also compares page and patent-aware chunking on the bundled PDFs.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.pdf_processor import PDFProcessor, DocumentChunk, ChunkMetadata
+from src.patent_chunker import PatentChunker
+import argparse
+import glob
+import json
+import random
+import time
+import tracemalloc
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Chunker speed and memory micro-benchmark")
+    parser.add_argument("--pdf-dir", default="../public/pdfs", help="PDFs whose page text is chunked")
+    parser.add_argument("--synthetic-pages", type=int, default=2000,
+                        help="Pages of a synthetic document for the memory comparison")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embedding batch")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+def reference_spans(text: str, chunk_size: int, overlap: int):
+    """
+    The previous span computation (loops forever if a chunk is shorter than the overlap)
+    """
+    if len(text) <= chunk_size:
+        return [(0, len(text))]
+    spans = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        if end < len(text):
+            break_point = max(text.rfind('.', start, end), text.rfind('\n', start, end))
+            if break_point > start:
+                end = break_point + 1
+        spans.append((start, end))
+        start = end - overlap
+        if start >= len(text):
+            break
+    return spans
+
+def synthetic_pages(count: int):
+    """
+    Patent-like pages: numbered paragraphs of sentences with line breaks
+    """
+    rng = random.Random(0)
+    words = ("steel sheet mass silicon chromium annealing temperature content alloy "
+             "rolling nitrogen atmosphere percent volume core loss grain").split()
+    pages = []
+    for _ in range(count):
+        lines = []
+        while sum(len(line) for line in lines) < 3500:
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 24)))
+            lines.append(f"[{rng.randint(1, 999):04d}] {sentence.capitalize()}.")
+        pages.append("\n".join(lines))
+    return pages
+
+def best_time(function, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def as_dataclasses(processor: PDFProcessor, pages):
+    """
+    Materialize every chunk as DocumentChunk + ChunkMetadata, as the chunker used to
+    """
+    chunks = []
+    for page_num, text in enumerate(pages):
+        for start, end in reference_spans(text, processor.chunk_size, processor.overlap):
+            content = text[start:end].strip()
+            if len(content) < 50:
+                continue
+            chunk_id = processor.make_chunk_id("0" * 64, page_num + 1, start)
+            chunks.append(DocumentChunk(
+                chunk_id=chunk_id,
+                content=content,
+                metadata=ChunkMetadata(
+                    chunk_id=chunk_id, source_document="synthetic.pdf", page_number=page_num + 1,
+                    chunk_type="text", section_title=content.split('\n', 1)[0][:100],
+                    document_hash="0" * 64, char_start=start, char_end=end
+                )
+            ))
+    return chunks
+
+def peak_memory(function) -> int:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    args = parse_args()
+    processor = PDFProcessor(chunk_size=args.chunk_size, overlap=args.overlap)
+
+    pages = []
+    documents = []
+    for path in sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf"))):
+        document = list(processor.iter_page_texts(path, PDFProcessor.compute_file_hash(path)))
+        documents.append(document)
+        pages += [text for _, text in document]
+    corpora = {'bundled': pages, 'synthetic': synthetic_pages(args.synthetic_pages)}
+
+    report = {}
+    for name, texts in corpora.items():
+        if not texts:
+            continue
+        old_chunks = as_dataclasses(processor, texts)
+        new_chunks = list(processor.chunk_pages(enumerate(texts), "synthetic.pdf", "0" * 64))
+        if [(chunk.chunk_id, chunk.content, chunk.metadata.section_title) for chunk in old_chunks] != \
+                [(chunk.chunk_id, chunk.content, chunk.section_title) for chunk in new_chunks]:
+            raise SystemExit(f"❌ Chunk mismatch on the {name} corpus")
+
+        old_seconds = best_time(lambda: as_dataclasses(processor, texts), args.repeat)
+        new_seconds = best_time(
+            lambda: list(processor.chunk_pages(enumerate(texts), "synthetic.pdf", "0" * 64)), args.repeat
+        )
+        report[name] = {
+            'pages': len(texts),
+            'chunks': len(new_chunks),
+            'dataclass_us_per_chunk': round(old_seconds / len(new_chunks) * 1e6, 3),
+            'record_us_per_chunk': round(new_seconds / len(new_chunks) * 1e6, 3),
+            'speedup': round(old_seconds / new_seconds, 2)
+        }
+
+    def stream_in_batches():
+        batch = []
+        for chunk in processor.chunk_pages(enumerate(corpora['synthetic']), "synthetic.pdf", "0" * 64):
+            batch.append(chunk)
+            if len(batch) >= args.batch_size:
+                batch = []  # handed to the embedder and released
+
+    # Whole-document patent chunking against page chunking on the bundled PDFs
+    patent = PDFProcessor(chunk_size=args.chunk_size, overlap=args.overlap,
+                          document_chunker=PatentChunker(chunk_size=args.chunk_size, overlap=args.overlap))
+    strategies = {}
+    for chunker in (processor, patent):
+        started = time.perf_counter()
+        chunks = [chunk for document in documents for chunk in chunker.chunk_pages(document, "bundled.pdf", "0" * 64)]
+        strategies[chunker.chunking] = {
+            'chunks': len(chunks),
+            'characters': sum(len(chunk.content) for chunk in chunks),
+            'cross_page_chunks': sum(chunk.page_end > chunk.page_number for chunk in chunks),
+            'ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+    report['strategies'] = strategies
+
+    report['memory'] = {
+        'pages': args.synthetic_pages,
+        'list_of_dataclasses_mb': round(peak_memory(lambda: as_dataclasses(processor, corpora['synthetic'])) / 2**20, 2),
+        'list_of_records_mb': round(peak_memory(
+            lambda: list(processor.chunk_pages(enumerate(corpora['synthetic']), "synthetic.pdf", "0" * 64))
+        ) / 2**20, 2),
+        'streamed_records_mb': round(peak_memory(stream_in_batches) / 2**20, 2),
+        'batch_size': args.batch_size
+    }
+
+    print(f"📊 chunk_size={args.chunk_size}, overlap={args.overlap}, chunks identical to the previous chunker")
+    print(f"\n{'corpus':<10} {'pages':>6} {'chunks':>7} {'dataclass us':>13} {'record us':>10} {'speedup':>8}")
+    for name in corpora:
+        if name in report:
+            row = report[name]
+            print(f"{name:<10} {row['pages']:>6} {row['chunks']:>7} {row['dataclass_us_per_chunk']:>13.3f} "
+                  f"{row['record_us_per_chunk']:>10.3f} {row['speedup']:>7.2f}x")
+    print(f"\n{'strategy':<10} {'chunks':>7} {'characters':>11} {'cross-page':>11} {'ms':>8}")
+    for name, row in report['strategies'].items():
+        print(f"{name:<10} {row['chunks']:>7} {row['characters']:>11} {row['cross_page_chunks']:>11} {row['ms']:>8.2f}")
+    memory = report['memory']
+    print(f"\n🧠 Peak Python memory chunking {memory['pages']} pages: "
+          f"{memory['list_of_dataclasses_mb']} MB as a list of dataclasses, "
+          f"{memory['list_of_records_mb']} MB as a list of records, "
+          f"{memory['streamed_records_mb']} MB streamed in batches of {memory['batch_size']}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
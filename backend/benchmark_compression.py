@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Report recall@k, memory and latency of compressed vector search (int8 and
+product quantization) against exact float32 search, to pick a compression
+level per deployment
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.quantization import ScalarQuantizer, ProductQuantizer, rescored_search
+import argparse
+import json
+import time
+import numpy as np
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall@k of compressed vector search")
+    parser.add_argument("--store", default="data/embeddings_numpy",
+                        help="NumPy vector store directory to benchmark on")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Use this many synthetic clustered vectors instead of a store")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="Held-out vectors used as queries")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--pq-subspaces", type=int, nargs="+", default=[16, 32, 48, 96],
+                        help="Product quantization subspace counts to evaluate")
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4, 10],
+                        help="Shortlist sizes (x k) re-scored exactly; 1 = codes only")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+def load_vectors(args) -> np.ndarray:
+    """
+    Live rows of a NumPy vector store, or synthetic clustered unit vectors
+    """
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(args.synthetic // 500, 8), args.dim)).astype(np.float32)
+        assignment = rng.integers(len(centers), size=args.synthetic)
+        vectors = centers[assignment] + 0.6 * rng.normal(size=(args.synthetic, args.dim)).astype(np.float32)
+    else:
+        from src.numpy_vector_store import NumpyVectorStore
+        store = NumpyVectorStore(args.store)
+        if store.count == 0:
+            raise SystemExit(f"❌ No vectors in {args.store}; ingest with VECTOR_BACKEND=numpy or use --synthetic")
+        vectors = np.asarray(store._matrix[:store.count])[store.alive[:store.count]]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_top_k(database: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = database @ queries.T
+    return np.argpartition(-scores, k - 1, axis=0)[:k].T
+
+def evaluate(name, quantizer, database, queries, truth, k, rescore_factors):
+    """
+    Train, encode and measure recall@k for each rescore factor
+    """
+    started = time.perf_counter()
+    quantizer.train(database)
+    codes = quantizer.encode(database)
+    build_seconds = time.perf_counter() - started
+
+    rows = []
+    for factor in rescore_factors:
+        started = time.perf_counter()
+        shortlists = rescored_search(quantizer, codes, database, queries, k, factor)
+        elapsed = time.perf_counter() - started
+
+        recalls = []
+        for (candidates, exact), expected in zip(shortlists, truth):
+            top = candidates[np.argsort(-exact)[:k]]
+            recalls.append(len(set(top.tolist()) & set(expected.tolist())) / k)
+
+        rows.append({
+            'index': name,
+            'bytes_per_vector': codes.shape[1] * codes.itemsize,
+            'compression': round(database.shape[1] * 4 / (codes.shape[1] * codes.itemsize), 1),
+            'rescore_factor': factor,
+            f'recall@{k}': round(float(np.mean(recalls)), 4),
+            'query_ms': round(elapsed / len(queries) * 1000, 3),
+            'build_s': round(build_seconds, 2)
+        })
+    return rows
+
+def main():
+    args = parse_args()
+    vectors = load_vectors(args).astype(np.float32)
+    if len(vectors) <= args.queries + args.k:
+        raise SystemExit(f"❌ Need more than {args.queries + args.k} vectors, have {len(vectors)}")
+
+    # Hold out queries so they are not their own nearest neighbour
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries, database = vectors[order[:args.queries]], vectors[order[args.queries:]]
+    k = args.k
+
+    print(f"📊 {len(database)} vectors x {database.shape[1]} dims, {len(queries)} queries, k={k}")
+
+    started = time.perf_counter()
+    truth = exact_top_k(database, queries, k)
+    exact_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    report = [{
+        'index': 'float32', 'bytes_per_vector': database.shape[1] * 4, 'compression': 1.0,
+        'rescore_factor': 0, f'recall@{k}': 1.0, 'query_ms': round(exact_ms, 3), 'build_s': 0.0
+    }]
+    report += evaluate("int8", ScalarQuantizer(), database, queries, truth, k, args.rescore_factors)
+    for subspaces in args.pq_subspaces:
+        if database.shape[1] % subspaces:
+            print(f"⚠️ Skipping pq{subspaces}: {database.shape[1]} dims are not divisible")
+            continue
+        report += evaluate(f"pq{subspaces}", ProductQuantizer(subspaces=subspaces),
+                           database, queries, truth, k, args.rescore_factors)
+
+    print(f"\n{'index':<8} {'bytes/vec':>9} {'ratio':>6} {'rescore':>7} {f'recall@{k}':>9} "
+          f"{'query ms':>9} {'build s':>8}")
+    for row in report:
+        print(f"{row['index']:<8} {row['bytes_per_vector']:>9} {row['compression']:>5}x "
+              f"{row['rescore_factor'] or '-':>7} {row[f'recall@{k}']:>9.4f} "
+              f"{row['query_ms']:>9.3f} {row['build_s']:>8.2f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
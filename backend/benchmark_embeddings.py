@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Compare embedding inference backends on the CPU: PyTorch SentenceTransformer
+against ONNX Runtime (fp32 and dynamic int8). Reports batch encode
+throughput, single-query latency and cosine agreement with the PyTorch
+embeddings already stored in the index
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.pdf_processor import PDFProcessor
+from src.onnx_embedding import OnnxEncoder, onnx_model_dir, export_onnx_model, onnx_model_file
+from config import settings
+import argparse
+import glob
+import json
+import time
+import numpy as np
+
+QUERIES = [
+    "chromium content in steel",
+    "electrical resistivity requirements",
+    "temperature effects on material properties",
+    "silicon percentage in alloys",
+    "What is the final annealing atmosphere?",
+    "core loss at high frequency",
+    "hot-dip plating bath composition",
+    "nitrogen content limit"
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark PyTorch vs ONNX Runtime embeddings")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="Sentence-transformers model")
+    parser.add_argument("--onnx-dir", default=settings.ONNX_MODEL_DIR, help="Root directory of exported ONNX models")
+    parser.add_argument("--pdf-dir", default="../public/pdfs", help="PDFs whose chunks are encoded")
+    parser.add_argument("--max-chunks", type=int, default=512, help="Chunks encoded per throughput run")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="Intra-op thread counts to evaluate")
+    parser.add_argument("--latency-runs", type=int, default=50, help="Single-query encodes per configuration")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+def load_chunks(pdf_dir: str, limit: int):
+    processor = PDFProcessor()
+    texts = []
+    for path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+        texts += [chunk.content for chunk in processor.iter_chunks(path)]
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+def measure(encode, texts, batch_size: int, latency_runs: int):
+    """
+    Texts per second for batch encoding, and single-query latency percentiles
+    """
+    encode(texts[:batch_size], batch_size)  # warm-up
+    started = time.perf_counter()
+    embeddings = encode(texts, batch_size)
+    throughput = len(texts) / (time.perf_counter() - started)
+
+    latencies = []
+    for i in range(latency_runs):
+        started = time.perf_counter()
+        encode([QUERIES[i % len(QUERIES)]], 1)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return embeddings, throughput, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+def main():
+    args = parse_args()
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    texts = load_chunks(args.pdf_dir, args.max_chunks)
+    if not texts:
+        raise SystemExit(f"❌ No chunks found in {args.pdf_dir}")
+
+    model_dir = onnx_model_dir(args.onnx_dir, args.model)
+    if not os.path.exists(onnx_model_file(model_dir, quantized=True)):
+        print(f"📦 Exporting {args.model} to ONNX in {model_dir}...")
+        export_onnx_model(args.model, model_dir, quantize=True)
+
+    print(f"📊 {len(texts)} chunks, batch size {args.batch_size}, {os.cpu_count()} CPUs")
+    model = SentenceTransformer(args.model, device='cpu')
+
+    def torch_encode(batch, batch_size):
+        return model.encode(batch, batch_size=batch_size, show_progress_bar=False,
+                            convert_to_numpy=True, normalize_embeddings=True)
+
+    report = []
+    reference = None
+    for threads in sorted(set(args.threads)):
+        torch.set_num_threads(threads)
+        embeddings, throughput, p50, p95 = measure(torch_encode, texts, args.batch_size, args.latency_runs)
+        if reference is None:
+            reference = embeddings
+        backends = [('torch', threads, embeddings, throughput, p50, p95)]
+
+        for quantized in (False, True):
+            encoder = OnnxEncoder(model_dir, quantized=quantized, intra_op_threads=threads)
+            embeddings, throughput, p50, p95 = measure(encoder.encode, texts, args.batch_size, args.latency_runs)
+            backends.append(('onnx-int8' if quantized else 'onnx-fp32', threads, embeddings, throughput, p50, p95))
+
+        for name, threads, embeddings, throughput, p50, p95 in backends:
+            cosine = np.sum(embeddings * reference, axis=1)
+            report.append({
+                'backend': name, 'threads': threads,
+                'texts_per_second': round(throughput, 1),
+                'query_p50_ms': round(float(p50), 3), 'query_p95_ms': round(float(p95), 3),
+                'mean_cosine_to_torch': round(float(np.mean(cosine)), 6),
+                'min_cosine_to_torch': round(float(np.min(cosine)), 6)
+            })
+
+    print(f"\n{'backend':<10} {'threads':>7} {'texts/s':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'mean cos':>9} {'min cos':>9}")
+    for row in report:
+        print(f"{row['backend']:<10} {row['threads']:>7} {row['texts_per_second']:>9.1f} "
+              f"{row['query_p50_ms']:>8.3f} {row['query_p95_ms']:>8.3f} "
+              f"{row['mean_cosine_to_torch']:>9.6f} {row['min_cosine_to_torch']:>9.6f}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Compare PDF text extraction backends (PyMuPDF, pypdf) on the bundled PDFs:
+extraction time per page, serial vs parallel page extraction, page text
+cache hits, and how much the extracted text and chunks differ
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.pdf_processor import PDFProcessor, PageTextCache, PDF_BACKENDS, fitz
+import argparse
+import glob
+import json
+import shutil
+import tempfile
+import time
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction backends")
+    parser.add_argument("--pdf-dir", default="../public/pdfs", help="Directory of PDFs to extract")
+    parser.add_argument("--backends", nargs="+", choices=PDF_BACKENDS, default=list(PDF_BACKENDS),
+                        help="Backends to compare")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4],
+                        help="Page worker counts to evaluate (1 = serial)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration (best is reported)")
+    parser.add_argument("--json", help="Also write the report as JSON to this path")
+    return parser.parse_args()
+
+def timed_extraction(processor: PDFProcessor, pdf_files, hashes, repeat: int):
+    """
+    Best wall time over `repeat` full extractions, with page, chunk and character counts
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pages = characters = 0
+        for path in pdf_files:
+            for _, text in processor.iter_page_texts(path, hashes[path]):
+                pages += 1
+                characters += len(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    chunks = sum(1 for path in pdf_files for _ in processor.iter_chunks(path, hashes[path]))
+    return best, pages, chunks, characters
+
+def main():
+    args = parse_args()
+    pdf_files = sorted(glob.glob(os.path.join(args.pdf_dir, "*.pdf")))
+    if not pdf_files:
+        raise SystemExit(f"❌ No PDF files found in {args.pdf_dir}")
+    backends = [backend for backend in args.backends if backend != "pymupdf" or fitz is not None]
+    if len(backends) < len(args.backends):
+        print("⚠️ PyMuPDF is not installed, skipping it")
+
+    hashes = {path: PDFProcessor.compute_file_hash(path) for path in pdf_files}
+    print(f"📊 {len(pdf_files)} PDFs from {args.pdf_dir}, best of {args.repeat} runs")
+
+    report = []
+    texts = {}
+    for backend in backends:
+        evaluated = set()
+        for workers in args.workers:
+            # parallel_min_pages=1 so every document uses the requested worker count
+            processor = PDFProcessor(backend=backend, page_workers=workers, parallel_min_pages=1)
+            # Worker counts are capped at the CPU count
+            if processor.page_workers in evaluated:
+                continue
+            evaluated.add(processor.page_workers)
+            seconds, pages, chunks, characters = timed_extraction(processor, pdf_files, hashes, args.repeat)
+            report.append({
+                'backend': backend, 'workers': processor.page_workers, 'cache': 'off', 'pages': pages,
+                'chunks': chunks, 'characters': characters, 'seconds': round(seconds, 4),
+                'ms_per_page': round(seconds / max(pages, 1) * 1000, 3)
+            })
+
+        # Warm a throwaway page cache, then measure re-chunking from it
+        cache_dir = tempfile.mkdtemp(prefix="page-cache-")
+        try:
+            processor = PDFProcessor(backend=backend, page_cache=PageTextCache(os.path.join(cache_dir, "pages.sqlite")))
+            for path in pdf_files:
+                for _ in processor.iter_page_texts(path, hashes[path]):
+                    pass
+            seconds, pages, chunks, characters = timed_extraction(processor, pdf_files, hashes, args.repeat)
+            report.append({
+                'backend': backend, 'workers': 1, 'cache': 'warm', 'pages': pages,
+                'chunks': chunks, 'characters': characters, 'seconds': round(seconds, 4),
+                'ms_per_page': round(seconds / max(pages, 1) * 1000, 3)
+            })
+            processor.page_cache.close()
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        texts[backend] = {
+            path: [text for _, text in PDFProcessor(backend=backend).iter_page_texts(path, hashes[path])]
+            for path in pdf_files
+        }
+
+    print(f"\n{'backend':<8} {'workers':>7} {'cache':>5} {'pages':>6} {'chunks':>6} "
+          f"{'chars':>9} {'seconds':>8} {'ms/page':>8}")
+    for row in report:
+        print(f"{row['backend']:<8} {row['workers']:>7} {row['cache']:>5} {row['pages']:>6} "
+              f"{row['chunks']:>6} {row['characters']:>9} {row['seconds']:>8.3f} {row['ms_per_page']:>8.3f}")
+
+    if len(texts) == 2:
+        # Chunk IDs and offsets depend on the extracted text, so switching backends re-ingests
+        first, second = texts.values()
+        identical = sum(a == b for path in pdf_files for a, b in zip(first[path], second[path]))
+        total = sum(len(first[path]) for path in pdf_files)
+        print(f"\n🔎 {identical}/{total} pages extract to identical text across backends")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
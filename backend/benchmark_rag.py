@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+End-to-end retrieval and RAG benchmark: ingests the bundled PDFs into a
+temporary store, replays a query workload at a configurable concurrency
+(closed loop) or request rate (open loop) against the RAG engine, with a
+local stub standing in for the Anthropic API, and reports p50/p95/p99
+latency per stage, throughput and peak RSS. The JSON report can be
+compared against a previous build's with --baseline
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.pdf_processor import PDFProcessor
+from src.patent_chunker import create_document_chunker
+from src.embedding_engine import create_embedding_engine
+from src.vector_store import create_vector_store
+from src.lexical_index import LexicalIndex
+from src.search_engine import SemanticSearchEngine
+from src.rag_engine import RAGEngine
+from src.query_batcher import QueryBatcher
+from src.concurrency import BoundedExecutor
+from src.answer_cache import AnswerCache
+from src.reranker import create_reranker
+from src.context_builder import ContextBuilder
+from src.retrieval_cutoff import create_adaptive_cutoff
+from src.lru_cache import LRUCache
+from process_all_pdfs import process_single_pdf
+from config import settings
+from types import SimpleNamespace
+import argparse
+import asyncio
+import glob
+import json
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+QUERIES = [
+    "steel hardness",
+    "material composition",
+    "electrical steel properties",
+    "Cr content",
+    "Si content",
+    "chromium content in steel",
+    "electrical resistivity requirements",
+    "temperature effects on material properties",
+    "What is the final annealing atmosphere?",
+    "core loss at high frequency",
+    "hot-dip plating bath composition",
+    "nitrogen content limit",
+    "cold rolling reduction ratio",
+    "magnetic flux density after annealing",
+    "aluminum and manganese ranges",
+    "What do the claims cover?"
+]
+
+# Stages reported from RAGResponse timings, in pipeline order
+STAGES = ("embed_ms", "search_ms", "rerank_ms", "context_ms", "llm_ms", "first_token_ms", "total_ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval and RAG latency with a stub LLM")
+    parser.add_argument("--pdf-dir", default="../public/pdfs", help="PDFs ingested into the benchmark store")
+    parser.add_argument("--store-dir", help="Reuse this store instead of a temporary one "
+                                            "(ingested only if empty)")
+    parser.add_argument("--vector-backend", choices=("chroma", "numpy"), default=settings.VECTOR_BACKEND)
+    parser.add_argument("--shards", type=int, default=settings.VECTOR_SHARDS,
+                        help="Vector store shard processes (1 = in-process store)")
+    parser.add_argument("--mode", choices=("search", "answer", "stream"), default="answer",
+                        help="Retrieval only, full answers, or streamed answers")
+    parser.add_argument("--queries", help="Workload file: one query per line, or a JSON list")
+    parser.add_argument("--requests", type=int, default=200, help="Requests replayed (cycling the workload)")
+    parser.add_argument("--warmup-requests", type=int, default=5, help="Requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at most")
+    parser.add_argument("--qps", type=float, default=0.0,
+                        help="Open-loop arrival rate; 0 sends the next request as soon as one finishes")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Stub LLM time per answer")
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0, help="Uniform +/- jitter on the stub latency")
+    parser.add_argument("--llm-tokens", type=int, default=40, help="Tokens per streamed stub answer")
+    parser.add_argument("--caches", action="store_true",
+                        help="Keep the retrieval and answer caches on (off by default so every request "
+                             "runs the full pipeline)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the report as JSON to this path")
+    parser.add_argument("--baseline", help="Previous JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Exit with status 1 if p95 latency or throughput regresses by more than this "
+                             "percentage against --baseline")
+    return parser.parse_args()
+
+class StubLLM:
+    """
+    Stands in for both Anthropic clients: `messages.create` (sync or async)
+    and `messages.stream` wait a random latency and return a canned answer
+    """
+
+    def __init__(self, latency_ms: float, jitter_ms: float, tokens: int, seed: int, is_async: bool):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens = max(1, tokens)
+        self.random = random.Random(seed)
+        self.is_async = is_async
+        self.calls = 0
+        self.messages = self
+
+    def _latency(self) -> float:
+        self.calls += 1
+        jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, self.latency_ms + jitter) / 1000
+
+    def _answer(self):
+        return SimpleNamespace(content=[SimpleNamespace(text="stub " * self.tokens)])
+
+    def create(self, model: str, max_tokens: int, messages: list):
+        if not self.is_async:
+            time.sleep(self._latency())
+            return self._answer()
+
+        async def respond():
+            await asyncio.sleep(self._latency())
+            return self._answer()
+        return respond()
+
+    def stream(self, model: str, max_tokens: int, messages: list):
+        return StubStream(self._latency(), self.tokens)
+
+    async def close(self):
+        pass
+
+class StubStream:
+    def __init__(self, latency: float, tokens: int):
+        self.delay = latency / tokens
+        self.tokens = tokens
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for _ in range(self.tokens):
+            await asyncio.sleep(self.delay)
+            yield "stub "
+
+def load_queries(path: str):
+    if not path:
+        return QUERIES
+    with open(path) as file:
+        text = file.read()
+    if path.endswith(".json"):
+        return json.loads(text)
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def summarize(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+        'max': round(float(values.max()), 3)
+    }
+
+def ingest(pdf_dir: str, embedding_engine, vector_store):
+    """
+    Ingest every PDF under pdf_dir; returns documents, chunks and seconds
+    """
+    chunk_size, overlap = 1000, 200
+    pdf_processor = PDFProcessor(
+        chunk_size=chunk_size,
+        overlap=overlap,
+        backend=settings.PDF_BACKEND,
+        page_workers=settings.PDF_PAGE_WORKERS,
+        parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+        document_chunker=create_document_chunker(settings.CHUNKING_STRATEGY, chunk_size, overlap)
+    )
+    pdf_files = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+    if not pdf_files:
+        raise SystemExit(f"❌ No PDF files found in {pdf_dir}")
+
+    started = time.perf_counter()
+    chunks = sum(process_single_pdf(path, pdf_processor, embedding_engine, vector_store) for path in pdf_files)
+    vector_store.lexical_index.save()
+    if getattr(vector_store, 'compression', 'none') != 'none':
+        vector_store.build_compressed_index()
+    return {'documents': len(pdf_files), 'chunks': chunks, 'seconds': round(time.perf_counter() - started, 2)}
+
+def build_rag_engine(args, store_dir: str):
+    """
+    The components the API builds, over the benchmark store and the stub LLM
+    """
+    # Ingestion embeds cold; no embedding cache, so query embedding is measured too
+    embedding_engine = create_embedding_engine(
+        settings.EMBEDDING_MODEL,
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_dir=settings.ONNX_MODEL_DIR,
+        onnx_quantized=settings.ONNX_QUANTIZE,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+        inter_op_threads=settings.ONNX_INTER_OP_THREADS
+    )
+    vector_store = create_vector_store(
+        args.vector_backend,
+        persist_directory=store_dir,
+        compression=settings.VECTOR_COMPRESSION,
+        pq_subspaces=settings.PQ_SUBSPACES,
+        rescore_factor=settings.RESCORE_FACTOR,
+        shards=args.shards
+    )
+    vector_store.lexical_index = LexicalIndex.for_store(store_dir)
+
+    report = None
+    if vector_store.get_collection_stats()['total_chunks'] == 0:
+        print(f"📥 Ingesting {args.pdf_dir} into {store_dir}...")
+        report = ingest(args.pdf_dir, embedding_engine, vector_store)
+        print(f"✅ Ingested {report['chunks']} chunks from {report['documents']} PDFs in {report['seconds']}s")
+
+    search_engine = SemanticSearchEngine(
+        embedding_engine,
+        vector_store,
+        result_cache=LRUCache(settings.RETRIEVAL_CACHE_MAX_ENTRIES) if args.caches else None,
+        lexical_index=vector_store.lexical_index if settings.SEARCH_MODE == "hybrid" else None,
+        mode=settings.SEARCH_MODE,
+        fusion=settings.HYBRID_FUSION,
+        rrf_k=settings.RRF_K,
+        lexical_weight=settings.HYBRID_LEXICAL_WEIGHT,
+        candidate_pool=settings.HYBRID_CANDIDATES
+    )
+    rag_engine = RAGEngine(
+        search_engine,
+        anthropic_client=StubLLM(args.llm_latency_ms, args.llm_jitter_ms, args.llm_tokens, args.seed, False),
+        async_anthropic_client=StubLLM(args.llm_latency_ms, args.llm_jitter_ms, args.llm_tokens, args.seed, True),
+        search_executor=BoundedExecutor("rag-search", max_workers=settings.SEARCH_EXECUTOR_WORKERS),
+        query_batcher=QueryBatcher(
+            embedding_engine,
+            window_ms=settings.QUERY_BATCH_WINDOW_MS,
+            max_batch_size=settings.QUERY_BATCH_MAX_SIZE
+        ),
+        answer_cache=AnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            semantic_distance=settings.ANSWER_CACHE_SEMANTIC_DISTANCE
+        ) if args.caches else None,
+        reranker=create_reranker(
+            settings.RERANK_ENABLED,
+            settings.RERANK_MODEL,
+            candidates=settings.RERANK_CANDIDATES,
+            top_k=settings.RERANK_TOP_K,
+            batch_size=settings.RERANK_BATCH_SIZE,
+            latency_budget_ms=settings.RERANK_BUDGET_MS,
+            cache_max_entries=settings.RERANK_CACHE_MAX_ENTRIES
+        ),
+        context_builder=ContextBuilder(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD
+        ) if settings.CONTEXT_PACKING_ENABLED else None,
+        cutoff=create_adaptive_cutoff(
+            settings.RETRIEVAL_CUTOFF,
+            min_results=settings.RETRIEVAL_MIN_RESULTS,
+            elbow_gap=settings.RETRIEVAL_ELBOW_GAP,
+            score_mass=settings.RETRIEVAL_SCORE_MASS,
+            token_budget=settings.RETRIEVAL_TOKEN_BUDGET
+        ),
+        max_results=settings.MAX_SEARCH_RESULTS,
+        max_concurrent_llm_calls=settings.LLM_MAX_CONCURRENCY,
+        llm_model=settings.LLM_MODEL
+    )
+    return rag_engine, report
+
+async def run_request(rag_engine: RAGEngine, mode: str, query: str, threshold: float):
+    """
+    One request; returns its stage timings
+    """
+    if mode == "search":
+        timings = {}
+        started = time.perf_counter()
+        query_embedding = await rag_engine.query_batcher.embed(query)
+        timings['embed_ms'] = (time.perf_counter() - started) * 1000
+        stage_started = time.perf_counter()
+        await rag_engine.search_executor.run(
+            rag_engine.search_engine.search, query, threshold,
+            rag_engine.retrieval_size(rag_engine.max_results),
+            query_embedding=query_embedding, check_cache=False
+        )
+        timings['search_ms'] = (time.perf_counter() - stage_started) * 1000
+        timings['total_ms'] = (time.perf_counter() - started) * 1000
+        return timings
+
+    if mode == "stream":
+        async for event, data in rag_engine.stream_answer(query, threshold=threshold):
+            if event == "error":
+                raise RuntimeError(data['message'])
+            if event == "done":
+                return data['timings']
+        raise RuntimeError("Stream ended without a done event")
+
+    response = await rag_engine.generate_answer_async(query, threshold=threshold)
+    if response.answer.startswith("Error generating answer"):
+        raise RuntimeError(response.answer)
+    return response.timings
+
+async def replay(rag_engine: RAGEngine, args, queries):
+    """
+    Send args.requests requests, closed loop (args.concurrency workers) or
+    open loop (args.qps arrivals per second, at most args.concurrency in flight)
+    """
+    for i in range(args.warmup_requests):
+        await run_request(rag_engine, args.mode, queries[i % len(queries)], args.threshold)
+
+    stage_values = {stage: [] for stage in STAGES}
+    latencies = []
+    errors = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        # Latency runs from the scheduled arrival, so queueing delay counts
+        arrival = time.perf_counter()
+        async with semaphore:
+            try:
+                timings = await run_request(rag_engine, args.mode, queries[i % len(queries)], args.threshold)
+            except Exception as e:
+                errors.append(str(e))
+                return
+        latencies.append((time.perf_counter() - arrival) * 1000)
+        for stage in STAGES:
+            if stage in timings:
+                stage_values[stage].append(timings[stage])
+
+    started = time.perf_counter()
+    if args.qps > 0:
+        tasks = []
+        for i in range(args.requests):
+            delay = started + i / args.qps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(i)))
+        await asyncio.gather(*tasks)
+    else:
+        counter = iter(range(args.requests))
+
+        async def worker():
+            for i in counter:
+                await one(i)
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+    await rag_engine.query_batcher.close()
+    rag_engine.search_executor.shutdown()
+
+    return {
+        'requests': args.requests,
+        'completed': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0
+    }, {
+        'end_to_end_ms': summarize(latencies),
+        **{stage: summarize(values) for stage, values in stage_values.items() if values}
+    }
+
+def compare(report, baseline, max_regression):
+    """
+    Print changes against a baseline report; returns False if p95 latency or
+    throughput regressed by more than max_regression percent
+    """
+    print(f"\n📈 Against baseline {baseline['build'].get('git_commit')} ({baseline['build']['timestamp']}):")
+    ok = True
+    for stage, summary in report['latency_ms'].items():
+        before = baseline['latency_ms'].get(stage)
+        if not summary or not before:
+            continue
+        changes = []
+        for percentile in ('p50', 'p95', 'p99'):
+            change = (summary[percentile] - before[percentile]) / before[percentile] * 100 if before[percentile] else 0.0
+            changes.append(f"{percentile} {before[percentile]:.1f} -> {summary[percentile]:.1f} ({change:+.1f}%)")
+            if percentile == 'p95' and max_regression is not None and change > max_regression:
+                ok = False
+        print(f"  {stage:<15} " + ", ".join(changes))
+
+    before, after = baseline['workload']['throughput_rps'], report['workload']['throughput_rps']
+    change = (after - before) / before * 100 if before else 0.0
+    print(f"  {'throughput':<15} {before:.2f} -> {after:.2f} req/s ({change:+.1f}%)")
+    if max_regression is not None and -change > max_regression:
+        ok = False
+    return ok
+
+def main():
+    args = parse_args()
+    queries = load_queries(args.queries)
+    if not queries:
+        raise SystemExit("❌ Empty query workload")
+
+    store_dir = args.store_dir or tempfile.mkdtemp(prefix="rag-benchmark-")
+    try:
+        rag_engine, ingest_report = build_rag_engine(args, store_dir)
+        rss_after_ingest = peak_rss_mb()
+        print(f"🏁 {args.requests} {args.mode} requests, "
+              + (f"{args.qps:g} QPS open loop" if args.qps > 0 else "closed loop")
+              + f", concurrency {args.concurrency}, stub LLM {args.llm_latency_ms:g}±{args.llm_jitter_ms:g} ms")
+        workload, latency = asyncio.run(replay(rag_engine, args, queries))
+    finally:
+        if not args.store_dir:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+    report = {
+        'build': {
+            'git_commit': git_commit(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            **vars(args),
+            'embedding_model': settings.EMBEDDING_MODEL,
+            'embedding_backend': rag_engine.search_engine.embedding_engine.backend,
+            'search_mode': settings.SEARCH_MODE,
+            'rerank': rag_engine.reranker is not None,
+            'context_packing': rag_engine.context_builder is not None,
+            'max_results': rag_engine.max_results,
+            'cutoff': rag_engine.cutoff.stats() if rag_engine.cutoff else None,
+            'queries': len(queries)
+        },
+        'ingest': ingest_report,
+        'workload': workload,
+        'latency_ms': latency,
+        'memory': {
+            'peak_rss_after_ingest_mb': rss_after_ingest,
+            'peak_rss_mb': peak_rss_mb()
+        }
+    }
+
+    print(f"\n{'stage':<15} {'count':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for stage, summary in latency.items():
+        if summary:
+            print(f"{stage:<15} {summary['count']:>6} {summary['mean']:>9.2f} {summary['p50']:>9.2f} "
+                  f"{summary['p95']:>9.2f} {summary['p99']:>9.2f} {summary['max']:>9.2f}")
+    print(f"\n⚡ {workload['completed']}/{workload['requests']} requests in {workload['duration_s']}s: "
+          f"{workload['throughput_rps']} req/s, {workload['errors']} errors")
+    print(f"🧠 Peak RSS {report['memory']['peak_rss_mb']} MB "
+          f"({report['memory']['peak_rss_after_ingest_mb']} MB after ingestion)")
+    if workload['first_error']:
+        print(f"❌ First error: {workload['first_error']}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"\n💾 Report written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(report, baseline, args.max_regression):
+            print(f"❌ Regression beyond {args.max_regression:g}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
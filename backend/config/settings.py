@@ -8,20 +8,136 @@ load_dotenv()
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
+# start_server.py: more than one worker forks them from a master that preloads the models
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
 
 # Model Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 LLM_MODEL = os.getenv("LLM_MODEL", "claude-3-5-sonnet-20241022")
 
+# Embedding Inference Configuration
+# "torch" (SentenceTransformer) or "onnx" (ONNX Runtime on CPU, exported on first use)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/models/onnx")
+# Dynamic int8 weight quantization (mean cosine to PyTorch embeddings >= 0.98)
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+# 0 lets ONNX Runtime use one thread per physical core
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+
+# Embedding Cache Configuration
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Query Batching Configuration
+QUERY_BATCH_WINDOW_MS = float(os.getenv("QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+
+# Request Concurrency Configuration
+SEARCH_EXECUTOR_WORKERS = int(os.getenv("SEARCH_EXECUTOR_WORKERS", "4"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+# Startup Configuration
+# Load models and clients in the background as soon as the server starts
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Requests arriving during warm-up wait this long before getting a 503
+WARMUP_WAIT_TIMEOUT_S = float(os.getenv("WARMUP_WAIT_TIMEOUT_S", "30"))
+
+# Observability Configuration
+# Prometheus metrics at /metrics (request and stage latency histograms, cache hit ratios)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Add a Server-Timing header with stage durations to search responses
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# Answer Cache Configuration
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+# Cosine distance for reusing answers to near-duplicate queries (0 disables the semantic tier)
+ANSWER_CACHE_SEMANTIC_DISTANCE = float(os.getenv("ANSWER_CACHE_SEMANTIC_DISTANCE", "0.05"))
+
+# Retrieval Cache Configuration
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+
+# Reranking Configuration
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Retrieval over-fetches RERANK_CANDIDATES chunks; the best RERANK_TOP_K go to Claude
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "5"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Past this budget the remaining batches are skipped and cosine order is used
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "50000"))
+
+# Context Packing Configuration
+CONTEXT_PACKING_ENABLED = os.getenv("CONTEXT_PACKING_ENABLED", "true").lower() == "true"
+# Estimated prompt tokens available for excerpts (about 4 characters per token)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# MinHash Jaccard similarity at which a less relevant passage is dropped
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+# Retrieval Cutoff Configuration
+# "none", "elbow" (cut at the largest score drop) or "budget" (keep RETRIEVAL_SCORE_MASS of the score)
+RETRIEVAL_CUTOFF = os.getenv("RETRIEVAL_CUTOFF", "elbow")
+# Never send fewer chunks than this to the LLM
+RETRIEVAL_MIN_RESULTS = int(os.getenv("RETRIEVAL_MIN_RESULTS", "3"))
+# Smallest drop, as a fraction of the result list's score range, that counts as an elbow
+RETRIEVAL_ELBOW_GAP = float(os.getenv("RETRIEVAL_ELBOW_GAP", "0.25"))
+RETRIEVAL_SCORE_MASS = float(os.getenv("RETRIEVAL_SCORE_MASS", "0.9"))
+# Estimated tokens of retrieved chunks after which the rest are dropped (0 disables it)
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "0"))
+
+# Vector Store Configuration
+# "chroma" (HNSW index) or "numpy" (exact search over a memory-mapped matrix)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+# numpy backend only: "none", "int8" or "pq" (product quantization)
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "48"))
+# Compressed search re-scores this many candidates per requested result exactly
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "10"))
+# Above 1, the backend is split across this many shard processes (by document)
+VECTOR_SHARDS = int(os.getenv("VECTOR_SHARDS", "1"))
+# numpy backend only: collection IDs (comma-separated) searched through their own contiguous index
+PARTITIONED_COLLECTIONS = [
+    collection.strip() for collection in os.getenv("PARTITIONED_COLLECTIONS", "").split(",")
+    if collection.strip()
+]
+
+# PDF Extraction Configuration
+# "pymupdf" (falls back to pypdf if not installed) or "pypdf"
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+# Documents with at least PDF_PARALLEL_MIN_PAGES uncached pages are split across worker processes
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", "4"))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "32"))
+PAGE_TEXT_CACHE_ENABLED = os.getenv("PAGE_TEXT_CACHE_ENABLED", "true").lower() == "true"
+PAGE_TEXT_CACHE_PATH = os.getenv("PAGE_TEXT_CACHE_PATH", "data/cache/page_text.sqlite")
+
 # Chunking Configuration
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# "patent" chunks the whole document by EP structure (paragraphs, claims), "page" chunks each page
+CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "patent")
 
 # Search Configuration
 DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("DEFAULT_SIMILARITY_THRESHOLD", "0.7"))
 MAX_SEARCH_RESULTS = int(os.getenv("MAX_SEARCH_RESULTS", "10"))
+# Most queries accepted by one /api/search/batch request
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", "64"))
+# "vector" (the default) or "hybrid" (BM25 + vector, fused)
+SEARCH_MODE = os.getenv("SEARCH_MODE", "vector")
+# "rrf" (reciprocal rank fusion) or "weighted" (normalized BM25 and cosine)
+HYBRID_FUSION = os.getenv("HYBRID_FUSION", "rrf")
+RRF_K = int(os.getenv("RRF_K", "60"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "0.3"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
 
 # File Paths
 PDF_SOURCE_DIR = os.getenv("PDF_SOURCE_DIR", "../public/pdfs")
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "data/embeddings")
-PROCESSED_DATA_PATH = os.getenv("PROCESSED_DATA_PATH", "data/processed")
\ No newline at end of file
+PROCESSED_DATA_PATH = os.getenv("PROCESSED_DATA_PATH", "data/processed")
+# Collection definitions shared with the frontend (for collection filters)
+COLLECTIONS_PATH = os.getenv("COLLECTIONS_PATH", "../data/collections.ts")
\ No newline at end of file
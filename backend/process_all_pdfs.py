@@ -6,47 +6,177 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.pdf_processor import PDFProcessor
-from src.embedding_engine import EmbeddingEngine
-from src.vector_store import VectorStore
+from src.pdf_processor import PDFProcessor, PDF_BACKENDS, create_page_text_cache
+from src.patent_chunker import CHUNKING_STRATEGIES, create_document_chunker
+from src.embedding_engine import create_embedding_engine
+from src.embedding_cache import create_embedding_cache
+from src.vector_store import create_vector_store
+from src.lexical_index import LexicalIndex
+from config import settings
+from src.ingestion_pipeline import IngestionPipeline
+from src.manifest import DocumentManifest
+from src.metrics import REGISTRY, INGEST_CHUNKS, INGEST_STAGE_SECONDS
+import argparse
 import glob
 import time
 
-def process_single_pdf(pdf_path: str, pdf_processor, embedding_engine, vector_store):
+def process_single_pdf(pdf_path: str, pdf_processor, embedding_engine, vector_store,
+                       document_hash: str = None, batch_size: int = 256):
     """
-    Process a single PDF file and add it to the vector database
+    Process a single PDF file and add it to the vector database, embedding
+    chunks in batches as extraction yields them
     """
     print(f"\n📄 Processing: {os.path.basename(pdf_path)}")
     
-    # Process PDF into chunks
-    chunks = pdf_processor.process_pdf(pdf_path)
+    total_chunks = 0
+    stage_started = time.perf_counter()
+    for batch in pdf_processor.iter_chunk_batches(pdf_path, document_hash, batch_size):
+        INGEST_STAGE_SECONDS.labels('extract').observe(time.perf_counter() - stage_started)
+        # Generate embeddings and add them to the vector store
+        with INGEST_STAGE_SECONDS.labels('embed').time():
+            embeddings = embedding_engine.generate_embeddings([chunk.content for chunk in batch])
+        if len(embeddings) != len(batch):
+            raise RuntimeError(f"Failed to generate embeddings for {len(batch)} chunks")
+        with INGEST_STAGE_SECONDS.labels('write').time():
+            stored = vector_store.add_chunks(batch, embeddings.tolist())
+        if stored != len(batch):
+            raise RuntimeError(f"Stored {stored} of {len(batch)} chunks in the vector store")
+        INGEST_CHUNKS.inc(len(batch))
+        total_chunks += len(batch)
+        stage_started = time.perf_counter()
     
-    if not chunks:
+    if not total_chunks:
         print(f"  ⚠️ No chunks extracted from {os.path.basename(pdf_path)}")
         return 0
     
-    print(f"  ✓ Extracted {len(chunks)} chunks")
+    print(f"  ✓ Extracted, embedded and stored {total_chunks} chunks")
     
-    # Generate embeddings
-    texts = [chunk.content for chunk in chunks]
-    embeddings = embedding_engine.generate_embeddings(texts)
+    return total_chunks
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Process all PDFs into the vector database")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Use the parallel multi-process ingestion pipeline")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Extraction worker processes (default: CPU count - 1)")
+    parser.add_argument("--embed-batch-size", type=int, default=256,
+                        help="Chunks per embedding batch in pipeline mode")
+    parser.add_argument("--write-batch-size", type=int, default=2048,
+                        help="Chunks per vector store commit in pipeline mode")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Capacity of the queues between pipeline stages")
+    parser.add_argument("--pdf-backend", choices=PDF_BACKENDS, default=settings.PDF_BACKEND,
+                        help="PDF text extraction library")
+    parser.add_argument("--chunking", choices=CHUNKING_STRATEGIES, default=settings.CHUNKING_STRATEGY,
+                        help="Chunk each page, or whole documents by patent structure")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-ingest every PDF even if the manifest says it is unchanged")
+    parser.add_argument("--metrics-file",
+                        help="Write ingestion stage metrics here in Prometheus text format "
+                             "(e.g. for node_exporter's textfile collector)")
+    return parser.parse_args()
+
+def run_pipeline(pdf_files, document_hashes, pdf_processor, embedding_engine, vector_store, args):
+    """
+    Process all PDFs with the pipelined ingestion mode
+    """
+    pipeline = IngestionPipeline(
+        pdf_processor,
+        embedding_engine,
+        vector_store,
+        workers=args.workers,
+        embed_batch_size=args.embed_batch_size,
+        write_batch_size=args.write_batch_size,
+        queue_size=args.queue_size
+    )
+    print(f"⚙️ Pipeline: {pipeline.workers} extraction workers, "
+          f"embed batch {pipeline.embed_batch_size}, write batch {pipeline.write_batch_size}")
+
+    report = pipeline.run(pdf_files, document_hashes)
+
+    print("\n⏱️ Stage throughput:")
+    for stage in report.stages.values():
+        print(f"  - {stage.name:<8} {stage.items:>7} chunks in {stage.wall_seconds:7.2f}s "
+              f"({stage.throughput:8.1f} chunks/s, busy {stage.busy_seconds:.2f}s)")
+
+    paths_by_name = {os.path.basename(path): path for path in pdf_files}
+    succeeded = {
+        paths_by_name[name]: report.chunk_counts[name] for name in report.documents_succeeded
+    }
+    return report.chunks_written, succeeded, report.documents_failed
+
+def run_serial(pdf_files, document_hashes, pdf_processor, embedding_engine, vector_store):
+    """
+    Process all PDFs one after another
+    """
+    total_chunks_added = 0
+    succeeded = {}
+    failed_pdfs = []
     
-    if embeddings.size == 0:
-        print(f"  ❌ Failed to generate embeddings")
-        return 0
+    for i, pdf_path in enumerate(pdf_files, 1):
+        print(f"\n[{i}/{len(pdf_files)}] Processing...")
+        try:
+            chunks_added = process_single_pdf(
+                pdf_path, 
+                pdf_processor, 
+                embedding_engine, 
+                vector_store,
+                document_hashes.get(pdf_path)
+            )
+            if chunks_added > 0:
+                total_chunks_added += chunks_added
+                succeeded[pdf_path] = chunks_added
+            else:
+                failed_pdfs.append(os.path.basename(pdf_path))
+        except Exception as e:
+            print(f"  ❌ Error processing {os.path.basename(pdf_path)}: {str(e)}")
+            failed_pdfs.append(os.path.basename(pdf_path))
     
-    print(f"  ✓ Generated {len(embeddings)} embeddings")
+    return total_chunks_added, succeeded, failed_pdfs
+
+def backfill_lexical_index(vector_store, lexical_index):
+    """
+    Rebuild the lexical index over every stored chunk, for chunks ingested
+    before it existed or written without it
+    """
+    count = lexical_index.rebuild(vector_store.iter_chunks())
+    print(f"🔤 Built lexical index over {count} existing chunks")
+
+def update_compressed_index(vector_store, changed: bool):
+    """
+    Retrain and re-encode the compressed index (numpy backend) after the
+    corpus changed, or build it if compression was just enabled
+    """
+    if getattr(vector_store, 'compression', 'none') == 'none':
+        return
+    if changed or not vector_store.compressed:
+        vector_store.build_compressed_index()
+
+def apply_removals(plan, manifest, vector_store, purge_new: bool = True):
+    """
+    Purge chunks of deleted PDFs and of PDFs about to be (re-)ingested.
+    New PDFs are purged too (unless the store is empty): a store ingested
+    before the manifest existed, or by an interrupted run, can already hold
+    chunks of them under older chunk IDs that re-adding would not overwrite.
+    """
+    for filename in plan.deleted:
+        vector_store.delete_document(filename)
+        manifest.remove(filename)
     
-    # Add to vector store
-    vector_store.add_chunks(chunks, embeddings.tolist())
-    print(f"  ✓ Added to vector database")
+    for pdf_path in (plan.new if purge_new else []) + plan.changed:
+        filename = os.path.basename(pdf_path)
+        vector_store.delete_document(filename)
+        manifest.remove(filename)
     
-    return len(chunks)
+    manifest.save()
 
 def main():
     """
     Main function to process all PDFs
     """
+    args = parse_args()
+    REGISTRY.enabled = bool(args.metrics_file)
+    
     # Get PDF directory
     pdf_dir = "../public/pdfs"
     
@@ -66,47 +196,111 @@ def main():
     
     # Initialize components once
     print("🚀 Initializing components...")
-    pdf_processor = PDFProcessor(chunk_size=1000, overlap=200)
-    embedding_engine = EmbeddingEngine()
-    vector_store = VectorStore()
+    chunk_size, overlap = 1000, 200
+    pdf_processor = PDFProcessor(
+        chunk_size=chunk_size,
+        overlap=overlap,
+        backend=args.pdf_backend,
+        # The pipeline already extracts one document per worker process
+        page_workers=1 if args.pipeline else settings.PDF_PAGE_WORKERS,
+        parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+        page_cache=create_page_text_cache(settings.PAGE_TEXT_CACHE_ENABLED, settings.PAGE_TEXT_CACHE_PATH),
+        document_chunker=create_document_chunker(args.chunking, chunk_size, overlap)
+    )
+    embedding_cache = create_embedding_cache(
+        settings.EMBEDDING_CACHE_ENABLED,
+        settings.EMBEDDING_CACHE_PATH,
+        settings.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+    embedding_engine = create_embedding_engine(
+        settings.EMBEDDING_MODEL,
+        cache=embedding_cache,
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_dir=settings.ONNX_MODEL_DIR,
+        onnx_quantized=settings.ONNX_QUANTIZE,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+        inter_op_threads=settings.ONNX_INTER_OP_THREADS
+    )
+    vector_store = create_vector_store(
+        settings.VECTOR_BACKEND,
+        compression=settings.VECTOR_COMPRESSION,
+        pq_subspaces=settings.PQ_SUBSPACES,
+        rescore_factor=settings.RESCORE_FACTOR,
+        shards=settings.VECTOR_SHARDS
+    )
+    lexical_index = LexicalIndex.for_store(vector_store.persist_directory)
+    vector_store.lexical_index = lexical_index
     
     # Get initial stats
     initial_stats = vector_store.get_collection_stats()
     initial_chunks = initial_stats['total_chunks']
     print(f"📊 Initial database contains {initial_chunks} chunks")
     
-    # For automation, we'll append to existing database
-    if initial_chunks > 0:
-        print(f"ℹ️ Appending to existing database with {initial_chunks} chunks")
+    if initial_chunks and not lexical_index.covers(initial_chunks):
+        backfill_lexical_index(vector_store, lexical_index)
+    
+    # Only new, changed and deleted PDFs touch the database
+    manifest = DocumentManifest.for_store(vector_store.persist_directory)
+    plan = manifest.plan(
+        pdf_files,
+        chunk_size=chunk_size,
+        overlap=overlap,
+        embedding_model=embedding_engine.model_name,
+        force=args.force,
+        extractor=pdf_processor.backend,
+        chunker=pdf_processor.chunking,
+        shards=settings.VECTOR_SHARDS
+    )
+    if plan.relayout:
+        # Chunks placed under the old shard count may sit in the wrong shard
+        print(f"🔀 Store was ingested with {manifest.shards} shard(s), now {settings.VECTOR_SHARDS}: "
+              f"re-ingesting every PDF")
+        vector_store.reset_collection()
+    manifest.shards = settings.VECTOR_SHARDS
+    print(f"🗂️ Manifest: {len(plan.new)} new, {len(plan.changed)} changed, "
+          f"{len(plan.unchanged)} unchanged, {len(plan.deleted)} deleted")
+    
+    apply_removals(plan, manifest, vector_store, purge_new=initial_chunks > 0)
+    lexical_index.save()
+    
+    pdf_files = plan.to_ingest
+    if not pdf_files:
+        update_compressed_index(vector_store, changed=bool(plan.deleted))
+        stats = vector_store.get_collection_stats()
+        print(f"\n✅ Nothing to ingest. Database contains {stats['total_chunks']} chunks.")
+        return
     
     print("\n" + "=" * 50)
     print("Starting PDF processing...")
     print("=" * 50)
     
-    # Process each PDF
-    total_chunks_added = 0
-    successful_pdfs = 0
-    failed_pdfs = []
-    
     start_time = time.time()
     
-    for i, pdf_path in enumerate(pdf_files, 1):
-        print(f"\n[{i}/{len(pdf_files)}] Processing...")
-        try:
-            chunks_added = process_single_pdf(
-                pdf_path, 
-                pdf_processor, 
-                embedding_engine, 
-                vector_store
-            )
-            if chunks_added > 0:
-                total_chunks_added += chunks_added
-                successful_pdfs += 1
-            else:
-                failed_pdfs.append(os.path.basename(pdf_path))
-        except Exception as e:
-            print(f"  ❌ Error processing {os.path.basename(pdf_path)}: {str(e)}")
-            failed_pdfs.append(os.path.basename(pdf_path))
+    if args.pipeline:
+        total_chunks_added, succeeded, failed_pdfs = run_pipeline(
+            pdf_files, plan.hashes, pdf_processor, embedding_engine, vector_store, args
+        )
+    else:
+        total_chunks_added, succeeded, failed_pdfs = run_serial(
+            pdf_files, plan.hashes, pdf_processor, embedding_engine, vector_store
+        )
+    
+    # Record successfully ingested PDFs so the next run can skip them
+    for pdf_path, chunk_count in succeeded.items():
+        manifest.record(
+            pdf_path,
+            content_hash=plan.hashes[pdf_path],
+            chunk_size=chunk_size,
+            overlap=overlap,
+            embedding_model=embedding_engine.model_name,
+            chunk_count=chunk_count,
+            extractor=pdf_processor.backend,
+            chunker=pdf_processor.chunking
+        )
+    manifest.save()
+    lexical_index.save()
+    update_compressed_index(vector_store, changed=bool(succeeded or plan.deleted))
+    successful_pdfs = len(succeeded)
     
     end_time = time.time()
     processing_time = end_time - start_time
@@ -129,6 +323,10 @@ def main():
         for pdf in failed_pdfs:
             print(f"  - {pdf}")
     
+    if args.metrics_file:
+        REGISTRY.write(args.metrics_file)
+        print(f"\n📈 Ingestion metrics written to {args.metrics_file}")
+    
     print("\n✅ All PDFs processed! You can now search across all documents.")
     print("🔍 Try queries like:")
     print("  - 'chromium content in steel'")
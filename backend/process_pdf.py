@@ -6,11 +6,19 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.pdf_processor import PDFProcessor
-from src.embedding_engine import EmbeddingEngine
-from src.vector_store import VectorStore
+from src.pdf_processor import PDFProcessor, create_page_text_cache
+from src.patent_chunker import create_document_chunker
+from src.embedding_engine import create_embedding_engine
+from src.embedding_cache import create_embedding_cache
+from src.vector_store import create_vector_store
+from src.lexical_index import LexicalIndex
+from src.manifest import DocumentManifest
+from config import settings
 import glob
 
+# Chunks embedded and stored per batch
+EMBED_BATCH_SIZE = 256
+
 def process_single_pdf(pdf_path: str):
     """
     Process a single PDF file and add it to the vector database
@@ -18,34 +26,92 @@ def process_single_pdf(pdf_path: str):
     print(f"Processing PDF: {pdf_path}")
     
     # Initialize components
-    pdf_processor = PDFProcessor(chunk_size=1000, overlap=200)
-    embedding_engine = EmbeddingEngine()
-    vector_store = VectorStore()
-    
-    # Process PDF into chunks
-    print("Extracting and chunking PDF...")
-    chunks = pdf_processor.process_pdf(pdf_path)
-    
-    if not chunks:
-        print("No chunks extracted from PDF")
+    pdf_processor = PDFProcessor(
+        chunk_size=1000,
+        overlap=200,
+        backend=settings.PDF_BACKEND,
+        page_workers=settings.PDF_PAGE_WORKERS,
+        parallel_min_pages=settings.PDF_PARALLEL_MIN_PAGES,
+        page_cache=create_page_text_cache(settings.PAGE_TEXT_CACHE_ENABLED, settings.PAGE_TEXT_CACHE_PATH),
+        document_chunker=create_document_chunker(settings.CHUNKING_STRATEGY, 1000, 200)
+    )
+    embedding_cache = create_embedding_cache(
+        settings.EMBEDDING_CACHE_ENABLED,
+        settings.EMBEDDING_CACHE_PATH,
+        settings.EMBEDDING_CACHE_MAX_ENTRIES
+    )
+    embedding_engine = create_embedding_engine(
+        settings.EMBEDDING_MODEL,
+        cache=embedding_cache,
+        backend=settings.EMBEDDING_BACKEND,
+        onnx_dir=settings.ONNX_MODEL_DIR,
+        onnx_quantized=settings.ONNX_QUANTIZE,
+        intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+        inter_op_threads=settings.ONNX_INTER_OP_THREADS
+    )
+    vector_store = create_vector_store(
+        settings.VECTOR_BACKEND,
+        compression=settings.VECTOR_COMPRESSION,
+        pq_subspaces=settings.PQ_SUBSPACES,
+        rescore_factor=settings.RESCORE_FACTOR,
+        shards=settings.VECTOR_SHARDS
+    )
+    vector_store.lexical_index = LexicalIndex.for_store(vector_store.persist_directory)
+    
+    # Index chunks already in the store first, so the saved index covers all of them
+    existing_chunks = vector_store.get_collection_stats()['total_chunks']
+    if existing_chunks and not vector_store.lexical_index.covers(existing_chunks):
+        count = vector_store.lexical_index.rebuild(vector_store.iter_chunks())
+        print(f"Built lexical index over {count} existing chunks")
+    
+    # The manifest's fingerprint is the corpus version, so answers cached by the API expire
+    manifest = DocumentManifest.for_store(vector_store.persist_directory)
+    if manifest.entries and manifest.shards != settings.VECTOR_SHARDS:
+        print(f"The vector store was ingested with {manifest.shards} shard(s) but "
+              f"VECTOR_SHARDS={settings.VECTOR_SHARDS}; run process_all_pdfs.py to re-ingest it")
         return False
-    
-    print(f"Extracted {len(chunks)} chunks")
-    
-    # Generate embeddings
-    print("Generating embeddings...")
-    texts = [chunk.content for chunk in chunks]
-    embeddings = embedding_engine.generate_embeddings(texts)
-    
-    if embeddings.size == 0:
-        print("Failed to generate embeddings")
+    manifest.shards = settings.VECTOR_SHARDS
+    
+    # Replace chunks of any earlier ingestion of this PDF
+    filename = os.path.basename(pdf_path)
+    vector_store.delete_document(filename)
+    manifest.remove(filename)
+    manifest.save()
+    
+    # Extract, chunk and embed in fixed-size batches so memory stays flat
+    print("Extracting, chunking and embedding PDF...")
+    document_hash = PDFProcessor.compute_file_hash(pdf_path)
+    total_chunks = 0
+    try:
+        for batch in pdf_processor.iter_chunk_batches(pdf_path, document_hash, batch_size=EMBED_BATCH_SIZE):
+            embeddings = embedding_engine.generate_embeddings([chunk.content for chunk in batch])
+            if len(embeddings) != len(batch):
+                raise RuntimeError(f"Failed to generate embeddings for {len(batch)} chunks")
+            stored = vector_store.add_chunks(batch, embeddings.tolist())
+            if stored != len(batch):
+                raise RuntimeError(f"Stored {stored} of {len(batch)} chunks in the vector store")
+            total_chunks += len(batch)
+    except Exception as e:
+        print(f"Error processing PDF: {str(e)}")
         return False
     
-    print(f"Generated {len(embeddings)} embeddings")
+    if not total_chunks:
+        print("No chunks extracted from PDF")
+        return False
     
-    # Add to vector store
-    print("Adding chunks to vector database...")
-    vector_store.add_chunks(chunks, embeddings.tolist())
+    print(f"Added {total_chunks} chunks to vector database")
+    vector_store.lexical_index.save()
+    manifest.record(
+        pdf_path,
+        content_hash=document_hash,
+        chunk_size=pdf_processor.chunk_size,
+        overlap=pdf_processor.overlap,
+        embedding_model=embedding_engine.model_name,
+        chunk_count=total_chunks,
+        extractor=pdf_processor.backend,
+        chunker=pdf_processor.chunking
+    )
+    manifest.save()
     
     # Get stats
     stats = vector_store.get_collection_stats()
@@ -0,0 +1,130 @@
+import threading
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .lru_cache import LRUCache
+
+
+class AnswerCache:
+    """
+    Cache of generated RAG answers in front of the LLM call.
+
+    The exact tier is keyed by (normalized query, threshold, max results,
+    search filter, corpus version).
+    The optional semantic tier reuses an answer when a new query's embedding is
+    within `semantic_distance` (cosine) of a cached query AND retrieval returned
+    the identical chunk-ID set, so the LLM would have seen the same context.
+    Entries are dropped when the corpus version changes (re-ingest).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 3600,
+                 semantic_distance: float = 0.0):
+        self.semantic_distance = semantic_distance
+        self._answers = LRUCache(max_entries, ttl_seconds)
+        # (version, threshold, chunk-ID set) -> [(query embedding, exact key), ...]
+        self._semantic = LRUCache(max_entries, ttl_seconds)
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.exact_misses = 0
+        self.semantic_hits = 0
+        self.invalidations = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_distance > 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return " ".join(query.casefold().split())
+
+    def _exact_key(self, query: str, threshold: float, corpus_version: str,
+                   max_results: Optional[int], search_filter: Optional[Hashable]) -> Tuple:
+        return (self.normalize_query(query), round(threshold, 4), max_results, search_filter, corpus_version)
+
+    def _semantic_key(self, chunk_ids: Iterable[str], threshold: float, corpus_version: str) -> Tuple:
+        return (corpus_version, round(threshold, 4), frozenset(chunk_ids))
+
+    def _check_version(self, corpus_version: str):
+        """
+        Drop everything cached against an older corpus
+        """
+        with self._lock:
+            if self._version is not None and self._version != corpus_version:
+                self._answers.clear()
+                self._semantic.clear()
+                self.invalidations += 1
+            self._version = corpus_version
+
+    def lookup_exact(self, query: str, threshold: float, corpus_version: str,
+                     max_results: Optional[int] = None,
+                     search_filter: Optional[Hashable] = None) -> Optional[Any]:
+        self._check_version(corpus_version)
+        answer = self._answers.get(
+            self._exact_key(query, threshold, corpus_version, max_results, search_filter)
+        )
+        if answer is not None:
+            self.exact_hits += 1
+        else:
+            self.exact_misses += 1
+        return answer
+
+    def lookup_semantic(self, query_embedding: np.ndarray, chunk_ids: List[str],
+                        threshold: float, corpus_version: str) -> Optional[Any]:
+        """
+        Find a cached answer for a near-duplicate query over the same chunks.
+        Call after `lookup_exact` missed and retrieval has run.
+        """
+        if not self.semantic_enabled:
+            return None
+
+        candidates = self._semantic.get(self._semantic_key(chunk_ids, threshold, corpus_version)) or []
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        for embedding, exact_key in candidates:
+            # Embeddings are normalized, so cosine distance is 1 - dot product
+            if 1.0 - float(np.dot(embedding, query_embedding)) <= self.semantic_distance:
+                answer = self._answers.get(exact_key)
+                if answer is not None:
+                    self.semantic_hits += 1
+                    return answer
+
+        return None
+
+    def store(self, query: str, threshold: float, corpus_version: str, answer: Any,
+              query_embedding: Optional[np.ndarray] = None, chunk_ids: Optional[List[str]] = None,
+              max_results: Optional[int] = None, search_filter: Optional[Hashable] = None):
+        self._check_version(corpus_version)
+        exact_key = self._exact_key(query, threshold, corpus_version, max_results, search_filter)
+        self._answers.put(exact_key, answer)
+
+        if self.semantic_enabled and query_embedding is not None and chunk_ids:
+            semantic_key = self._semantic_key(chunk_ids, threshold, corpus_version)
+            with self._lock:
+                candidates = [
+                    entry for entry in (self._semantic.get(semantic_key) or [])
+                    if entry[1] != exact_key
+                ]
+                candidates.append((np.asarray(query_embedding, dtype=np.float32), exact_key))
+                self._semantic.put(semantic_key, candidates)
+
+    def invalidate(self):
+        with self._lock:
+            self._answers.clear()
+            self._semantic.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        # Every request does one exact lookup; semantic hits are a subset of exact misses
+        lookups = self.exact_hits + self.exact_misses
+        return {
+            'size': len(self._answers),
+            'exact_hits': self.exact_hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.exact_misses - self.semantic_hits,
+            'hit_rate': round((self.exact_hits + self.semantic_hits) / lookups, 4) if lookups else 0.0,
+            'evictions': self._answers.evictions,
+            'invalidations': self.invalidations,
+            'semantic_distance': self.semantic_distance,
+            'corpus_version': self._version
+        }
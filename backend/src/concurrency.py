@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class BoundedExecutor:
+    """
+    A dedicated thread pool for one blocking stage of the request path.
+
+    Async callers await a slot before their work is submitted, so at most
+    `max_concurrency` calls run (or wait in the pool) at once and excess
+    requests queue on the event loop instead of piling up in the executor.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_concurrency: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.completed = 0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking callable in this stage's pool without blocking the event loop
+        """
+        # Created lazily so the semaphore binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'max_workers': self.max_workers,
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.in_flight,
+            'completed': self.completed
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
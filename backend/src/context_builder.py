@@ -0,0 +1,320 @@
+import math
+import zlib
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .search_engine import SearchResult
+
+# Mersenne prime for the universal hashes of the MinHash permutations
+_MINHASH_PRIME = np.uint64((1 << 61) - 1)
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """
+    Approximate Claude token count from character length (no network call)
+    """
+    return max(1, math.ceil(len(text) / chars_per_token)) if text else 0
+
+
+def page_label(metadata: Dict[str, Any]) -> Any:
+    """
+    Page of a chunk for the prompt, "5-6" for chunks that span a page break
+    """
+    page = metadata.get('page_number', 'Unknown')
+    page_end = metadata.get('page_end') or page
+    return f"{page}-{page_end}" if page_end != page else page
+
+
+def format_excerpt(index: int, relevance: float, document: str, page: Any,
+                   section: str, content: str) -> str:
+    """
+    Render one context excerpt in the prompt's EXCERPT layout
+    """
+    return f"""
+EXCERPT {index} (Relevance: {round(relevance * 100, 1)}%)
+Document: {document}
+Page: {page}
+Section: {section}
+
+Content:
+"{content}"
+
+---
+"""
+
+
+@dataclass
+class ContextPassage:
+    """
+    A contiguous span of one document, built from one or more retrieved
+    chunks; char_end is an offset into page_end's text
+    """
+    source_document: str
+    page_number: Any
+    section_title: str
+    content: str
+    char_start: int
+    char_end: int
+    relevance: float
+    value: float
+    chunk_ids: List[str] = field(default_factory=list)
+    tokens: int = 0
+    page_end: Any = None
+
+    @property
+    def page_label(self) -> Any:
+        return page_label({'page_number': self.page_number, 'page_end': self.page_end})
+
+
+@dataclass
+class PackedContext:
+    text: str
+    passages: List[ContextPassage]
+    stats: Dict[str, int]
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        """
+        IDs of the chunks that made it into the context (merged ones included)
+        """
+        return [chunk_id for passage in self.passages for chunk_id in passage.chunk_ids]
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a token-budgeted LLM context.
+
+    Chunks are cut with a fixed character overlap, so neighbouring hits from
+    the same page repeat text. The builder (1) stitches chunks of the same
+    document whose (page, offset) spans overlap, or are separated by at most
+    `adjacency_gap` characters of one page (consecutive paragraphs of the
+    patent chunker), into a single passage, (2) drops passages whose
+    MinHash-estimated shingle Jaccard similarity to a more relevant passage
+    reaches `duplicate_threshold`, and (3) fills `token_budget` greedily by
+    relevance per token. Token counts are estimated from character length.
+    """
+
+    def __init__(self, token_budget: int = 3000, chars_per_token: float = 4.0,
+                 shingle_size: int = 5, num_permutations: int = 64,
+                 duplicate_threshold: float = 0.8, seed: int = 0, adjacency_gap: int = 2):
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.shingle_size = shingle_size
+        self.duplicate_threshold = duplicate_threshold
+        self.adjacency_gap = adjacency_gap
+
+        rng = np.random.default_rng(seed)
+        self._hash_a = rng.integers(1, 1 << 31, size=num_permutations, dtype=np.uint64)
+        self._hash_b = rng.integers(0, 1 << 31, size=num_permutations, dtype=np.uint64)
+
+        # Metrics
+        self.requests = 0
+        self.input_tokens = 0
+        self.context_tokens = 0
+        self.tokens_saved = 0
+        self.tokens_dropped = 0
+
+    def build(self, chunks: List[SearchResult]) -> PackedContext:
+        """
+        Merge, deduplicate and pack chunks; `stats` compares the result with
+        formatting every chunk as its own excerpt
+        """
+        input_tokens = sum(
+            self._excerpt_tokens(chunk.similarity, chunk.metadata, chunk.content) for chunk in chunks
+        )
+
+        passages = self._merge(chunks)
+        merged = len(chunks) - len(passages)
+        passages, duplicates = self._deduplicate(passages)
+        for passage in passages:
+            passage.tokens = self._passage_tokens(passage)
+        unpacked_tokens = sum(passage.tokens for passage in passages)
+
+        packed = self._pack(passages)
+        text = "\n".join(
+            format_excerpt(i, passage.relevance, passage.source_document, passage.page_label,
+                           passage.section_title, passage.content)
+            for i, passage in enumerate(packed, 1)
+        )
+
+        context_tokens = estimate_tokens(text, self.chars_per_token)
+        stats = {
+            'input_tokens': input_tokens,
+            'context_tokens': context_tokens,
+            # Removed by merging overlaps and dropping near-duplicates
+            'tokens_saved': max(input_tokens - unpacked_tokens, 0),
+            # Left out to stay within the budget
+            'tokens_dropped': max(unpacked_tokens - sum(passage.tokens for passage in packed), 0),
+            'chunks': len(chunks),
+            'passages': len(packed),
+            'merged_chunks': merged,
+            'duplicates_removed': duplicates
+        }
+
+        self.requests += 1
+        self.input_tokens += stats['input_tokens']
+        self.context_tokens += stats['context_tokens']
+        self.tokens_saved += stats['tokens_saved']
+        self.tokens_dropped += stats['tokens_dropped']
+        return PackedContext(text=text, passages=packed, stats=stats)
+
+    def _merge(self, chunks: List[SearchResult]) -> List[ContextPassage]:
+        """
+        Stitch chunks of the same document whose spans overlap or nearly touch
+        """
+        groups: Dict[str, List[SearchResult]] = {}
+        for chunk in chunks:
+            groups.setdefault(chunk.metadata.get('source_document', 'Unknown'), []).append(chunk)
+
+        passages = []
+        for document, group in groups.items():
+            group.sort(key=lambda chunk: self._span(chunk.metadata)[0])
+            current: Optional[ContextPassage] = None
+            for chunk in group:
+                (page, start), (page_end, end) = self._span(chunk.metadata)
+                stitched = None
+                if current is not None and end > 0 and current.char_end > 0:
+                    if (page, start) <= (current.page_end, current.char_end):
+                        # Overlap in characters, or an upper bound when it crosses a page break
+                        overlap = current.char_end - start if page == current.page_end else len(chunk.content)
+                        stitched = self._stitch(current.content, chunk.content, overlap)
+                    elif page == current.page_end and start - current.char_end <= self.adjacency_gap:
+                        stitched = f"{current.content}\n{chunk.content}"
+
+                if stitched is not None:
+                    current.content = stitched
+                    section_title = chunk.metadata.get('section_title', 'N/A')
+                    if section_title not in current.section_title:
+                        current.section_title = f"{current.section_title}; {section_title}"
+                    if (page_end, end) > (current.page_end, current.char_end):
+                        current.page_end, current.char_end = page_end, end
+                    current.relevance = max(current.relevance, chunk.similarity)
+                    current.value += chunk.similarity
+                    current.chunk_ids.append(chunk.chunk_id)
+                    continue
+
+                current = ContextPassage(
+                    source_document=document,
+                    page_number=chunk.metadata.get('page_number', 'Unknown'),
+                    section_title=chunk.metadata.get('section_title', 'N/A'),
+                    content=chunk.content,
+                    char_start=start,
+                    char_end=end,
+                    relevance=chunk.similarity,
+                    value=chunk.similarity,
+                    chunk_ids=[chunk.chunk_id],
+                    page_end=page_end
+                )
+                passages.append(current)
+        return passages
+
+    @staticmethod
+    def _span(metadata: Dict[str, Any]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        ((page, char_start), (page_end, char_end)) of a chunk
+        """
+        try:
+            page = int(metadata.get('page_number', 0) or 0)
+        except (TypeError, ValueError):
+            page = 0
+        page_end = int(metadata.get('page_end', 0) or 0) or page
+        return (page, int(metadata.get('char_start', 0) or 0)), (page_end, int(metadata.get('char_end', 0) or 0))
+
+    @staticmethod
+    def _stitch(left: str, right: str, overlap: int) -> Optional[str]:
+        """
+        Join two texts that share `overlap` characters of the page (measured
+        before whitespace stripping). Returns None if the shared text cannot be
+        located, so the chunks stay separate excerpts.
+        """
+        if overlap <= 0:
+            return f"{left} {right}"
+        if right in left:
+            return left
+
+        # Chunk content is stripped, so search the tail of `left` for the head of `right`
+        anchor = right[:min(len(right), overlap, 64)].rstrip()
+        if not anchor:
+            return None
+        position = left.find(anchor, max(0, len(left) - overlap))
+        while position >= 0:
+            tail = left[position:]
+            if right.startswith(tail):
+                return left + right[len(tail):]
+            position = left.find(anchor, position + 1)
+        return None
+
+    def _deduplicate(self, passages: List[ContextPassage]) -> Tuple[List[ContextPassage], int]:
+        """
+        Drop passages that are near-duplicates of a more relevant passage
+        """
+        kept: List[ContextPassage] = []
+        signatures: List[np.ndarray] = []
+        for passage in sorted(passages, key=lambda passage: passage.relevance, reverse=True):
+            signature = self._minhash(passage.content)
+            if any(float(np.mean(signature == other)) >= self.duplicate_threshold for other in signatures):
+                continue
+            kept.append(passage)
+            signatures.append(signature)
+        return kept, len(passages) - len(kept)
+
+    def _minhash(self, text: str) -> np.ndarray:
+        words = text.lower().split()
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (np.outer(hashes, self._hash_a) + self._hash_b) % _MINHASH_PRIME
+        return permuted.min(axis=0)
+
+    def _pack(self, passages: List[ContextPassage]) -> List[ContextPassage]:
+        """
+        Greedy knapsack by relevance per token; the packed passages are
+        returned most relevant first
+        """
+        remaining = self.token_budget
+        packed = []
+        for passage in sorted(passages, key=lambda passage: passage.value / passage.tokens, reverse=True):
+            if passage.tokens <= remaining:
+                packed.append(passage)
+                remaining -= passage.tokens
+
+        if not packed and passages:
+            # Nothing fits whole: truncate the most relevant passage to the budget
+            best = max(passages, key=lambda passage: passage.relevance)
+            overhead = best.tokens - estimate_tokens(best.content, self.chars_per_token)
+            keep_chars = max(int((self.token_budget - overhead) * self.chars_per_token), 0)
+            best.content = best.content[:keep_chars]
+            best.tokens = self._passage_tokens(best)
+            packed.append(best)
+
+        packed.sort(key=lambda passage: passage.relevance, reverse=True)
+        return packed
+
+    def _passage_tokens(self, passage: ContextPassage) -> int:
+        return estimate_tokens(
+            format_excerpt(0, passage.relevance, passage.source_document, passage.page_label,
+                           passage.section_title, passage.content),
+            self.chars_per_token
+        )
+
+    def _excerpt_tokens(self, relevance: float, metadata: Dict[str, Any], content: str) -> int:
+        return estimate_tokens(
+            format_excerpt(0, relevance, metadata.get('source_document', 'Unknown'),
+                           page_label(metadata), metadata.get('section_title', 'N/A'),
+                           content),
+            self.chars_per_token
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'token_budget': self.token_budget,
+            'requests': self.requests,
+            'input_tokens': self.input_tokens,
+            'context_tokens': self.context_tokens,
+            'tokens_saved': self.tokens_saved,
+            'tokens_dropped': self.tokens_dropped,
+            'mean_tokens_saved': round(self.tokens_saved / self.requests, 1) if self.requests else 0.0
+        }
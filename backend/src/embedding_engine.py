@@ -1,34 +1,67 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Union
-import torch
+from typing import List, Union, Optional
+from .embedding_cache import EmbeddingCache
+from .onnx_embedding import EMBEDDING_BACKENDS, load_onnx_encoder
 
 class EmbeddingEngine:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache: Optional[EmbeddingCache] = None,
+                 backend: str = "torch", onnx_dir: str = "data/models/onnx", onnx_quantized: bool = True,
+                 intra_op_threads: int = 0, inter_op_threads: int = 1):
         """
-        Initialize the embedding engine with a sentence transformer model
+        Initialize the embedding engine with a sentence transformer model.
+        If a cache is given, embeddings are looked up there before encoding.
+        
+        With backend="onnx" the model is exported to ONNX under `onnx_dir`
+        on first use (optionally int8-quantized) and run with ONNX Runtime
+        on the CPU, without loading PyTorch.
         """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {backend} (expected one of {EMBEDDING_BACKENDS})")
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
-        self.embedding_dim = self.model.get_sentence_embedding_dimension()
+        self.cache = cache
+        self.backend = backend
         
-        # Set device
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = self.model.to(self.device)
+        if backend == "onnx":
+            self.model = load_onnx_encoder(model_name, onnx_dir, quantized=onnx_quantized,
+                                           intra_op_threads=intra_op_threads,
+                                           inter_op_threads=inter_op_threads)
+            self.device = 'cpu'
+        else:
+            from sentence_transformers import SentenceTransformer
+            import torch
+            self.model = SentenceTransformer(model_name)
+            
+            # Set device
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.model = self.model.to(self.device)
+        self.embedding_dim = self.model.get_sentence_embedding_dimension()
         
-    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+    def generate_embeddings(self, texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
         """
         Generate embeddings for a list of texts
         """
         try:
-            embeddings = self.model.encode(
-                texts,
-                batch_size=32,
-                show_progress_bar=True,
-                convert_to_numpy=True,
-                normalize_embeddings=True  # Normalize for cosine similarity
-            )
-            return embeddings
+            if self.cache is None:
+                return self._encode(texts, show_progress_bar)
+            
+            cached = self.cache.get_many(self.model_name, texts)
+            missing = [i for i, embedding in enumerate(cached) if embedding is None]
+            
+            if missing:
+                # Encode each distinct (normalized) missing text once
+                by_hash = {}
+                for i in missing:
+                    by_hash.setdefault(self.cache.text_hash(texts[i]), []).append(i)
+                missing_texts = [texts[indices[0]] for indices in by_hash.values()]
+                encoded = self._encode(missing_texts, show_progress_bar and len(missing_texts) > 32)
+                self.cache.put_many(self.model_name, missing_texts, encoded)
+                for indices, embedding in zip(by_hash.values(), encoded):
+                    for i in indices:
+                        cached[i] = embedding
+            
+            if not cached:
+                return np.zeros((0, self.embedding_dim), dtype=np.float32)
+            return np.stack(cached)
         except Exception as e:
             print(f"Error generating embeddings: {str(e)}")
             return np.array([])
@@ -38,16 +71,44 @@ class EmbeddingEngine:
         Generate embedding for a single text
         """
         try:
+            if self.cache is not None:
+                cached = self.cache.get(self.model_name, text)
+                if cached is not None:
+                    return cached
+            
             embedding = self.model.encode(
                 [text],
                 convert_to_numpy=True,
                 normalize_embeddings=True
             )
+            
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, [text], embedding)
             return embedding[0]
         except Exception as e:
             print(f"Error generating single embedding: {str(e)}")
             return np.array([])
     
+    def warm_up(self):
+        """
+        Run a dummy query and a dummy batch through the model (bypassing the
+        cache) so the first real request does not pay for lazy initialization
+        """
+        self._encode(["warm-up query"], show_progress_bar=False)
+        self._encode(["warm-up passage " * 64] * 8, show_progress_bar=False)
+    
+    def _encode(self, texts: List[str], show_progress_bar: bool) -> np.ndarray:
+        """
+        Run the model over texts
+        """
+        return self.model.encode(
+            texts,
+            batch_size=32,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+            normalize_embeddings=True  # Normalize for cosine similarity
+        )
+    
     def calculate_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """
         Calculate cosine similarity between two embeddings
@@ -61,4 +122,21 @@ class EmbeddingEngine:
             return float(similarity)
         except Exception as e:
             print(f"Error calculating similarity: {str(e)}")
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+
+def create_embedding_engine(model_name: str, cache: Optional[EmbeddingCache] = None, backend: str = "torch",
+                            onnx_dir: str = "data/models/onnx", onnx_quantized: bool = True,
+                            intra_op_threads: int = 0, inter_op_threads: int = 1) -> EmbeddingEngine:
+    """
+    Build the embedding engine for a backend, falling back to PyTorch if the
+    ONNX model cannot be exported or loaded
+    """
+    if backend == "onnx":
+        try:
+            return EmbeddingEngine(model_name, cache=cache, backend="onnx", onnx_dir=onnx_dir,
+                                   onnx_quantized=onnx_quantized, intra_op_threads=intra_op_threads,
+                                   inter_op_threads=inter_op_threads)
+        except Exception as e:
+            print(f"Error loading ONNX embedding backend, using PyTorch: {str(e)}")
+    return EmbeddingEngine(model_name, cache=cache)
@@ -0,0 +1,274 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from .pdf_processor import PDFProcessor, DocumentChunk
+from .embedding_engine import EmbeddingEngine
+from .vector_store import VectorStore
+from .metrics import INGEST_CHUNKS, INGEST_STAGE_SECONDS
+
+# Marks the end of a stage's output stream
+_END = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def wall_seconds(self) -> float:
+        if not self.started_at:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        Items per second of wall-clock time spent in this stage
+        """
+        return self.items / self.wall_seconds if self.wall_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'batches': self.batches,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'throughput': round(self.throughput, 2)
+        }
+
+
+@dataclass
+class IngestionReport:
+    documents_total: int = 0
+    documents_succeeded: List[str] = field(default_factory=list)
+    documents_failed: List[str] = field(default_factory=list)
+    chunk_counts: Dict[str, int] = field(default_factory=dict)
+    chunks_written: int = 0
+    elapsed_seconds: float = 0.0
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+
+
+class IngestionPipeline:
+    """
+    Pipelined PDF ingestion.
+
+    Stage 1 extracts and chunks PDFs in a process pool, stage 2 embeds chunks
+    in a single worker that batches across documents, and stage 3 commits
+    embedded chunks to the vector store in large batches. Stages are connected
+    by bounded queues so a slow stage applies backpressure upstream instead of
+    buffering the whole corpus in memory.
+    """
+
+    def __init__(self, pdf_processor: PDFProcessor, embedding_engine: EmbeddingEngine,
+                 vector_store: VectorStore, workers: Optional[int] = None,
+                 embed_batch_size: int = 256, write_batch_size: int = 2048,
+                 queue_size: int = 8):
+        self.pdf_processor = pdf_processor
+        self.embedding_engine = embedding_engine
+        self.vector_store = vector_store
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
+
+    def run(self, pdf_paths: List[str],
+            document_hashes: Optional[Dict[str, str]] = None) -> IngestionReport:
+        """
+        Ingest the given PDFs and return a report with per-stage throughput.
+        Precomputed content hashes (keyed by path) avoid re-hashing in the workers.
+        """
+        document_hashes = document_hashes or {}
+        report = IngestionReport(documents_total=len(pdf_paths))
+        report.stages = {
+            name: StageStats(name=name) for name in ('extract', 'embed', 'write')
+        }
+
+        chunk_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        write_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        abort = threading.Event()
+        errors: List[Tuple[str, Exception]] = []
+        # Chunks not yet committed per document, used to report per-document success
+        pending: Dict[str, int] = {}
+        pending_lock = threading.Lock()
+
+        def put(q: "queue.Queue", item: Any):
+            while not abort.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(q: "queue.Queue") -> Any:
+            while not abort.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def guarded(stage: str, target):
+            def runner():
+                stats = report.stages[stage]
+                stats.started_at = time.time()
+                try:
+                    target(stats)
+                except Exception as e:
+                    print(f"Error in ingestion stage '{stage}': {str(e)}")
+                    errors.append((stage, e))
+                    abort.set()
+                finally:
+                    stats.finished_at = time.time()
+            return threading.Thread(target=runner, name=f"ingest-{stage}", daemon=True)
+
+        def extract(stats: StageStats):
+            max_in_flight = self.workers * 2
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                paths = iter(pdf_paths)
+                in_flight = {}
+
+                def submit_next() -> bool:
+                    path = next(paths, None)
+                    if path is None:
+                        return False
+                    future = pool.submit(self.pdf_processor.process_pdf, path, document_hashes.get(path))
+                    in_flight[future] = (path, time.perf_counter())
+                    return True
+
+                while len(in_flight) < max_in_flight and submit_next():
+                    pass
+
+                while in_flight and not abort.is_set():
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, submitted = in_flight.pop(future)
+                        INGEST_STAGE_SECONDS.labels('extract').observe(time.perf_counter() - submitted)
+                        filename = os.path.basename(path)
+                        try:
+                            chunks = future.result()
+                        except Exception as e:
+                            print(f"  ❌ Error processing {filename}: {str(e)}")
+                            chunks = []
+
+                        stats.batches += 1
+                        if not chunks:
+                            report.documents_failed.append(filename)
+                        else:
+                            stats.items += len(chunks)
+                            with pending_lock:
+                                pending[filename] = len(chunks)
+                                report.chunk_counts[filename] = len(chunks)
+                            put(chunk_queue, chunks)
+                        submit_next()
+
+            put(chunk_queue, _END)
+
+        def embed(stats: StageStats):
+            buffer: List[DocumentChunk] = []
+
+            def flush():
+                if not buffer:
+                    return
+                batch = buffer[:]
+                buffer.clear()
+                started = time.time()
+                embeddings = self.embedding_engine.generate_embeddings(
+                    [chunk.content for chunk in batch]
+                )
+                stats.busy_seconds += time.time() - started
+                INGEST_STAGE_SECONDS.labels('embed').observe(time.time() - started)
+                if len(embeddings) != len(batch):
+                    raise RuntimeError(f"Embedding failed for a batch of {len(batch)} chunks")
+                stats.items += len(batch)
+                stats.batches += 1
+                put(write_queue, (batch, embeddings.tolist()))
+
+            while True:
+                chunks = get(chunk_queue)
+                if chunks is _END:
+                    break
+                buffer.extend(chunks)
+                while len(buffer) >= self.embed_batch_size:
+                    overflow = buffer[self.embed_batch_size:]
+                    del buffer[self.embed_batch_size:]
+                    flush()
+                    buffer.extend(overflow)
+            flush()
+            put(write_queue, _END)
+
+        def write(stats: StageStats):
+            chunks: List[DocumentChunk] = []
+            embeddings: List[List[float]] = []
+
+            def flush():
+                if not chunks:
+                    return
+                started = time.time()
+                stored = self.vector_store.add_chunks(chunks, embeddings)
+                stats.busy_seconds += time.time() - started
+                INGEST_STAGE_SECONDS.labels('write').observe(time.time() - started)
+                stats.batches += 1
+                if stored != len(chunks):
+                    # Which chunks made it is unknown: every document in the batch failed
+                    with pending_lock:
+                        for document in dict.fromkeys(chunk.metadata.source_document for chunk in chunks):
+                            if pending.pop(document, None) is not None:
+                                report.documents_failed.append(document)
+                    chunks.clear()
+                    embeddings.clear()
+                    return
+                INGEST_CHUNKS.inc(len(chunks))
+                stats.items += len(chunks)
+                report.chunks_written += len(chunks)
+                with pending_lock:
+                    for chunk in chunks:
+                        document = chunk.metadata.source_document
+                        # Skip documents that already failed in an earlier batch
+                        if document not in pending:
+                            continue
+                        pending[document] -= 1
+                        if pending[document] == 0:
+                            del pending[document]
+                            report.documents_succeeded.append(document)
+                chunks.clear()
+                embeddings.clear()
+
+            while True:
+                item = get(write_queue)
+                if item is _END:
+                    break
+                batch, batch_embeddings = item
+                chunks.extend(batch)
+                embeddings.extend(batch_embeddings)
+                if len(chunks) >= self.write_batch_size:
+                    flush()
+            flush()
+
+        start_time = time.time()
+        threads = [guarded('extract', extract), guarded('embed', embed), guarded('write', write)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report.elapsed_seconds = time.time() - start_time
+        # The extract stage is measured on wall-clock time across the process pool
+        report.stages['extract'].busy_seconds = report.stages['extract'].wall_seconds
+
+        # Anything still pending never made it to the store
+        report.documents_failed.extend(sorted(pending))
+
+        if errors:
+            stage, error = errors[0]
+            raise RuntimeError(f"Ingestion pipeline failed in stage '{stage}': {error}") from error
+
+        return report
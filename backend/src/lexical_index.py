@@ -0,0 +1,465 @@
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEXICAL_INDEX_DIRNAME = "lexical"
+CURRENT_FILENAME = "CURRENT"
+
+# Words, numbers and decimals ("0.5", "1,000"); element symbols survive as short tokens
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or such that the
+their then there these this to was were which with wherein whereby thereof said
+""".split())
+
+# Buffered postings are compacted into numpy segments past this size
+_SEGMENT_POSTINGS = 1_000_000
+
+# Terms in more than 1/8 of the chunks are only scored against candidates from rarer terms
+_DENSE_TERM_FRACTION = 8
+
+_ARRAY_NAMES = ("terms", "indptr", "doc_ids", "tfs", "impacts", "doc_lengths", "chunk_ids", "doc_sources")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word/number tokens with stopwords removed
+    """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def _empty_part() -> Dict[str, np.ndarray]:
+    return {
+        'vocab': np.array([], dtype='S1'),
+        'post_terms': np.array([], dtype=np.int64),
+        'post_rows': np.array([], dtype=np.int64),
+        'tfs': np.array([], dtype=np.uint16),
+        'chunk_ids': np.array([], dtype='S1'),
+        'doc_lengths': np.array([], dtype=np.int32),
+        'doc_sources': np.array([], dtype=np.int64),
+        'source_names': np.array([], dtype=str),
+        'alive': np.array([], dtype=bool)
+    }
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk text, persisted next to the vector store.
+
+    Postings are CSR arrays: the rows containing term t are
+    doc_ids[indptr[t]:indptr[t + 1]] with term frequencies in the parallel
+    `tfs` array and precomputed BM25 term-frequency weights in `impacts`, so
+    a query term costs one contiguous slice times its idf. Terms are a sorted
+    byte-string array looked up with searchsorted, so no per-term Python
+    objects exist at query time.
+    Each save writes a new generation directory of .npy files (memory-mapped
+    on load) and then atomically repoints CURRENT at it. Added chunks are
+    buffered and merged in on `save()`; deletes are tombstones until then.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._set_arrays(None)
+        self._current_mtime = None
+        self._clear_pending()
+        self._segments: List[Dict[str, np.ndarray]] = []
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def for_store(cls, persist_directory: str, **kwargs) -> "LexicalIndex":
+        return cls(os.path.join(persist_directory, LEXICAL_INDEX_DIRNAME), **kwargs)
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, CURRENT_FILENAME))
+
+    @property
+    def document_count(self) -> int:
+        return len(self.chunk_ids)
+
+    def _set_arrays(self, arrays: Optional[Dict[str, np.ndarray]], source_names: Optional[List[str]] = None,
+                    generation: int = 0):
+        if arrays is None:
+            arrays = {
+                'terms': np.array([], dtype='S1'),
+                'indptr': np.zeros(1, dtype=np.int64),
+                'doc_ids': np.array([], dtype=np.int32),
+                'tfs': np.array([], dtype=np.uint16),
+                'impacts': np.array([], dtype=np.float32),
+                'doc_lengths': np.array([], dtype=np.int32),
+                'chunk_ids': np.array([], dtype='S1'),
+                'doc_sources': np.array([], dtype=np.int32)
+            }
+        for name in _ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.source_names = np.array(source_names or [], dtype=str)
+        self.generation = generation
+        self.alive = np.ones(len(self.chunk_ids), dtype=bool)
+        self.alive_count = len(self.chunk_ids)
+
+    def _clear_pending(self):
+        self._pending_ids: List[str] = []
+        self._pending_sources: List[str] = []
+        self._pending_lengths: List[int] = []
+        self._pending_terms: List[str] = []
+        self._pending_rows: List[int] = []
+        self._pending_tfs: List[int] = []
+
+    def load(self) -> bool:
+        """
+        Memory-map the current generation from disk, if one has been saved
+        """
+        current_path = os.path.join(self.path, CURRENT_FILENAME)
+        try:
+            mtime = os.stat(current_path).st_mtime_ns
+            with open(current_path, 'r') as file:
+                current = json.load(file)
+            generation_dir = os.path.join(self.path, current['directory'])
+            arrays = {
+                name: np.load(os.path.join(generation_dir, f"{name}.npy"), mmap_mode='r')
+                for name in _ARRAY_NAMES
+            }
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Error loading lexical index: {str(e)}")
+            return False
+
+        with self._lock:
+            self._set_arrays(arrays, current['source_names'], current['generation'])
+            self._current_mtime = mtime
+        return True
+
+    def refresh(self):
+        """
+        Pick up a generation saved by another process (e.g. a re-ingest)
+        """
+        try:
+            mtime = os.stat(os.path.join(self.path, CURRENT_FILENAME)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._current_mtime and not self._dirty:
+            self.load()
+
+    def add(self, chunk_id: str, source_document: str, text: str):
+        """
+        Buffer one chunk; it becomes searchable after `save()`.
+        Re-adding an existing chunk ID replaces it.
+        """
+        counts = Counter(tokenize(text))
+        with self._lock:
+            row = len(self._pending_ids)
+            self._pending_ids.append(chunk_id)
+            self._pending_sources.append(source_document)
+            self._pending_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._pending_terms.append(sys.intern(term))
+                self._pending_rows.append(row)
+                self._pending_tfs.append(min(tf, 65535))
+            self._dirty = True
+            if len(self._pending_terms) >= _SEGMENT_POSTINGS:
+                self._flush_pending()
+
+    def add_chunks(self, chunks: List[Any]):
+        """
+        Buffer DocumentChunks for indexing
+        """
+        for chunk in chunks:
+            self.add(chunk.chunk_id, chunk.metadata.source_document, chunk.content)
+
+    def delete_document(self, source_document: str):
+        """
+        Tombstone every chunk of a source document
+        """
+        with self._lock:
+            self._flush_pending()
+            matches = np.flatnonzero(self.source_names == source_document)
+            if len(matches):
+                dead = (self.doc_sources == matches[0]) & self.alive
+                if dead.any():
+                    self.alive[dead] = False
+                    self.alive_count -= int(dead.sum())
+                    self._dirty = True
+            for segment in self._segments:
+                matches = np.flatnonzero(segment['source_names'] == source_document)
+                if len(matches):
+                    segment['alive'][segment['doc_sources'] == matches[0]] = False
+                    self._dirty = True
+
+    def reset(self):
+        """
+        Drop every chunk; the empty index is written on the next `save()`
+        """
+        with self._lock:
+            self._set_arrays(None)
+            self._clear_pending()
+            self._segments = []
+            self._dirty = True
+
+    def covers(self, chunk_count: int) -> bool:
+        """
+        Whether the saved index holds as many chunks as the vector store;
+        a store written without the index (or with only part of it) does not
+        """
+        return self.exists() and self.alive_count == chunk_count
+
+    def rebuild(self, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Replace the index with the given store chunks (`iter_chunks()` dicts) and save it
+        """
+        self.reset()
+        count = 0
+        for chunk in chunks:
+            self.add(chunk['chunk_id'], chunk['metadata']['source_document'], chunk['content'])
+            count += 1
+        self.save()
+        return count
+
+    def _flush_pending(self):
+        """
+        Compact buffered Python lists into a numpy segment
+        """
+        if not self._pending_ids:
+            return
+        vocab, post_terms = np.unique(np.array(self._pending_terms, dtype='S'), return_inverse=True)
+        source_names, doc_sources = np.unique(np.array(self._pending_sources, dtype=str), return_inverse=True)
+        self._segments.append({
+            'vocab': vocab,
+            'post_terms': post_terms.astype(np.int64),
+            'post_rows': np.array(self._pending_rows, dtype=np.int64),
+            'tfs': np.array(self._pending_tfs, dtype=np.uint16),
+            'chunk_ids': np.array(self._pending_ids, dtype='S'),
+            'doc_lengths': np.array(self._pending_lengths, dtype=np.int32),
+            'doc_sources': doc_sources.astype(np.int64),
+            'source_names': source_names,
+            'alive': np.ones(len(self._pending_ids), dtype=bool)
+        })
+        self._clear_pending()
+
+    def _committed_part(self) -> Dict[str, np.ndarray]:
+        if not len(self.chunk_ids):
+            return _empty_part()
+        return {
+            'vocab': np.asarray(self.terms),
+            'post_terms': np.repeat(np.arange(len(self.terms)), np.diff(self.indptr)),
+            'post_rows': np.asarray(self.doc_ids, dtype=np.int64),
+            'tfs': np.asarray(self.tfs),
+            'chunk_ids': np.asarray(self.chunk_ids),
+            'doc_lengths': np.asarray(self.doc_lengths),
+            'doc_sources': np.asarray(self.doc_sources, dtype=np.int64),
+            'source_names': self.source_names,
+            'alive': self.alive
+        }
+
+    def _merge(self) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        """
+        Merge committed postings and buffered segments into fresh CSR arrays,
+        dropping tombstoned rows and superseded chunk IDs
+        """
+        parts = [self._committed_part()] + self._segments
+        vocab = np.unique(np.concatenate([part['vocab'] for part in parts]))
+        source_names = np.unique(np.concatenate([part['source_names'] for part in parts]))
+
+        # The last occurrence of a chunk ID wins, so re-added chunks replace old rows
+        all_ids = np.concatenate([part['chunk_ids'] for part in parts])
+        _, first_reversed = np.unique(all_ids[::-1], return_index=True)
+        keep = np.zeros(len(all_ids), dtype=bool)
+        keep[len(all_ids) - 1 - first_reversed] = True
+        keep &= np.concatenate([part['alive'] for part in parts])
+        new_rows = np.cumsum(keep) - 1
+
+        post_terms, post_rows, tfs, doc_sources = [], [], [], []
+        offset = 0
+        for part in parts:
+            rows = part['post_rows'] + offset
+            mask = keep[rows]
+            post_terms.append(np.searchsorted(vocab, part['vocab'])[part['post_terms']][mask])
+            post_rows.append(new_rows[rows[mask]])
+            tfs.append(part['tfs'][mask])
+            doc_sources.append(np.searchsorted(source_names, part['source_names'])[part['doc_sources']])
+            offset += len(part['chunk_ids'])
+
+        post_terms = np.concatenate(post_terms)
+        post_rows = np.concatenate(post_rows)
+        tfs = np.concatenate(tfs)
+
+        # Drop terms left without postings and renumber the rest
+        term_counts = np.bincount(post_terms, minlength=len(vocab))
+        used = term_counts > 0
+        post_terms = (np.cumsum(used) - 1)[post_terms]
+        term_counts = term_counts[used]
+
+        order = np.lexsort((post_rows, post_terms))
+        indptr = np.zeros(len(term_counts) + 1, dtype=np.int64)
+        np.cumsum(term_counts, out=indptr[1:])
+        doc_ids = post_rows[order].astype(np.int32)
+        tfs = tfs[order].astype(np.uint16)
+        doc_lengths = np.concatenate([part['doc_lengths'] for part in parts])[keep].astype(np.int32)
+
+        arrays = {
+            'terms': vocab[used],
+            'indptr': indptr,
+            'doc_ids': doc_ids,
+            'tfs': tfs,
+            'impacts': self._impacts(tfs, doc_lengths[doc_ids], doc_lengths),
+            'doc_lengths': doc_lengths,
+            'chunk_ids': all_ids[keep],
+            'doc_sources': np.concatenate(doc_sources)[keep].astype(np.int32)
+        }
+        return arrays, source_names.tolist()
+
+    def _impacts(self, tfs: np.ndarray, posting_lengths: np.ndarray, doc_lengths: np.ndarray) -> np.ndarray:
+        """
+        BM25 term-frequency component per posting; the query multiplies in idf
+        """
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        tf = tfs.astype(np.float32)
+        norm = self.k1 * (1.0 - self.b + self.b * posting_lengths / max(avg_length, 1.0))
+        return (tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32)
+
+    def save(self):
+        """
+        Merge buffered changes and write them as a new generation
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._flush_pending()
+            arrays, source_names = self._merge()
+            generation = self.generation + 1
+            directory = f"gen-{generation:06d}"
+            generation_dir = os.path.join(self.path, directory)
+            os.makedirs(generation_dir, exist_ok=True)
+
+            for name in _ARRAY_NAMES:
+                np.save(os.path.join(generation_dir, f"{name}.npy"), arrays[name])
+
+            current_path = os.path.join(self.path, CURRENT_FILENAME)
+            temp_path = current_path + ".tmp"
+            with open(temp_path, 'w') as file:
+                json.dump({
+                    'generation': generation,
+                    'directory': directory,
+                    'documents': len(arrays['chunk_ids']),
+                    'source_names': source_names
+                }, file)
+            os.replace(temp_path, current_path)
+
+            # Old generations may still be mapped by readers; unlinking is safe on POSIX
+            for entry in os.listdir(self.path):
+                if entry.startswith("gen-") and entry != directory:
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+            self._segments = []
+            self._dirty = False
+            self._set_arrays(arrays, source_names, generation)
+            self._current_mtime = os.stat(current_path).st_mtime_ns
+
+    def search(self, query: str, n_results: int = 10,
+               documents: Optional[Sequence[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Return (chunk_id, BM25 score) pairs for the best matching chunks,
+        optionally only among chunks of the given source documents.
+
+        Postings of rare query terms are accumulated into a candidate set;
+        very common terms are only looked up for those candidates (binary
+        search in their sorted postings). If the common terms' maximum
+        possible contribution could still lift an unseen chunk into the top
+        results, the query is re-scored over the full postings instead.
+        """
+        self.refresh()
+        query_terms = Counter(tokenize(query))
+
+        with self._lock:
+            terms, indptr, doc_ids, impacts = self.terms, self.indptr, self.doc_ids, self.impacts
+            chunk_ids, alive = self.chunk_ids, self.alive
+            doc_sources, source_names = self.doc_sources, self.source_names
+        total_docs = len(chunk_ids)
+        if documents is not None:
+            # Chunks of other documents are treated like deleted ones
+            allowed_sources = np.flatnonzero(np.isin(source_names, list(documents)))
+            alive = alive & np.isin(doc_sources, allowed_sources)
+
+        if not query_terms or not len(terms) or total_docs == 0:
+            return []
+
+        keys = np.array(list(query_terms), dtype='S')
+        positions = np.minimum(np.searchsorted(terms, keys), len(terms) - 1)
+        found = terms[positions] == keys
+
+        postings = []
+        for term_id, query_tf in zip(positions[found], np.array(list(query_terms.values()))[found]):
+            start, end = int(indptr[term_id]), int(indptr[term_id + 1])
+            df = end - start
+            weight = query_tf * math.log(1.0 + (total_docs - df + 0.5) / (df + 0.5))
+            postings.append((df, start, end, weight))
+        if not postings:
+            return []
+        postings.sort()
+
+        sparse = [p for p in postings if p[0] * _DENSE_TERM_FRACTION <= total_docs]
+        dense = [p for p in postings if p[0] * _DENSE_TERM_FRACTION > total_docs]
+
+        if sparse and dense:
+            candidates, scores = self._accumulate(sparse, doc_ids, impacts, total_docs)
+            for _, start, end, weight in dense:
+                term_docs = doc_ids[start:end]
+                slots = np.minimum(np.searchsorted(term_docs, candidates), len(term_docs) - 1)
+                hit = term_docs[slots] == candidates
+                scores[hit] += weight * impacts[start + slots[hit]]
+            candidates, scores = candidates[alive[candidates]], scores[alive[candidates]]
+
+            # Chunks matching only dense terms score at most the sum of their bounds
+            dense_bound = sum(weight * (self.k1 + 1.0) for _, _, _, weight in dense)
+            if len(scores) < n_results or np.partition(scores, -n_results)[-n_results] < dense_bound:
+                candidates, scores = self._accumulate(postings, doc_ids, impacts, total_docs)
+                candidates, scores = candidates[alive[candidates]], scores[alive[candidates]]
+        else:
+            candidates, scores = self._accumulate(postings, doc_ids, impacts, total_docs)
+            candidates, scores = candidates[alive[candidates]], scores[alive[candidates]]
+
+        if len(candidates) > n_results:
+            top = np.argpartition(-scores, n_results - 1)[:n_results]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+
+        return [(chunk_ids[candidates[i]].decode(), float(scores[i])) for i in order]
+
+    @staticmethod
+    def _accumulate(postings: List[Tuple[int, int, int, float]], doc_ids: np.ndarray,
+                    impacts: np.ndarray, total_docs: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sum weighted impacts per row over full posting lists
+        """
+        docs = np.concatenate([doc_ids[start:end] for _, start, end, _ in postings])
+        weights = np.concatenate([weight * impacts[start:end] for _, start, end, weight in postings])
+
+        if len(docs) * _DENSE_TERM_FRACTION > total_docs:
+            # Dense accumulation is cheaper than sorting a large candidate set
+            scores = np.bincount(docs, weights=weights, minlength=total_docs)
+            candidates = np.flatnonzero(scores)
+            return candidates, scores[candidates]
+
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        return candidates, np.bincount(inverse, weights=weights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'generation': self.generation,
+            'documents': self.alive_count,
+            'terms': len(self.terms),
+            'postings': len(self.doc_ids),
+            'pending': len(self._pending_ids) + sum(len(s['chunk_ids']) for s in self._segments)
+        }
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, asdict, field
+from typing import List, Dict, Any, Optional
+
+from .pdf_processor import PDFProcessor
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+@dataclass
+class ManifestEntry:
+    content_hash: str
+    chunk_size: int
+    overlap: int
+    embedding_model: str
+    file_size: int = 0
+    modified_time: float = 0.0
+    chunk_count: int = 0
+    ingested_at: float = 0.0
+    # Manifests written before extraction backends were pluggable used pypdf
+    extractor: str = "pypdf"
+    # ... and chunked each page on its own
+    chunker: str = "page"
+
+
+@dataclass
+class IngestionPlan:
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    # Content hash of every PDF that needs (re-)ingestion, keyed by path
+    hashes: Dict[str, str] = field(default_factory=dict)
+    # The store was ingested with another number of shards: everything is re-ingested
+    relayout: bool = False
+
+    @property
+    def to_ingest(self) -> List[str]:
+        return self.new + self.changed
+
+
+class DocumentManifest:
+    """
+    Persistent record of what has been ingested into the vector store.
+
+    Maps each PDF (by filename, matching the `source_document` metadata) to its
+    content hash and the extraction/chunking/embedding parameters used, so that re-runs
+    only touch new, changed or deleted files. Also records how many shards the
+    store was split across, since the shard count decides where chunks live.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self.shards = 1
+        self.load()
+
+    @classmethod
+    def for_store(cls, persist_directory: str) -> "DocumentManifest":
+        """
+        Open the manifest that lives next to a vector store's data
+        """
+        return cls(os.path.join(persist_directory, MANIFEST_FILENAME))
+
+    def load(self):
+        """
+        Load the manifest from disk (an absent file is an empty manifest)
+        """
+        self.entries = {}
+        self.shards = 1
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+            # Manifests written before sharding describe an unsharded store
+            self.shards = data.get('shards', 1)
+            for filename, entry in data.get('documents', {}).items():
+                self.entries[filename] = ManifestEntry(**entry)
+        except Exception as e:
+            print(f"Error loading manifest {self.path}: {str(e)}")
+
+    def save(self):
+        """
+        Atomically write the manifest to disk
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        data = {
+            'version': 1,
+            'fingerprint': self.fingerprint(),
+            'shards': self.shards,
+            'documents': {name: asdict(entry) for name, entry in sorted(self.entries.items())}
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(data, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self) -> str:
+        """
+        Digest of the ingested corpus; changes whenever any document is
+        added, replaced or removed
+        """
+        digest = hashlib.sha256()
+        for filename, entry in sorted(self.entries.items()):
+            digest.update(f"{filename}:{entry.content_hash}:{entry.chunk_size}:"
+                          f"{entry.overlap}:{entry.embedding_model}:{entry.extractor}:"
+                          f"{entry.chunker};".encode())
+        return digest.hexdigest()[:16]
+
+    def plan(self, pdf_paths: List[str], chunk_size: int, overlap: int,
+             embedding_model: str, force: bool = False,
+             extractor: str = "pypdf", chunker: str = "page", shards: int = 1) -> IngestionPlan:
+        """
+        Classify PDFs as new, changed or unchanged and find deleted documents.
+
+        Files whose size and modification time match the manifest are trusted
+        without re-hashing, so planning over an unchanged corpus is cheap.
+        If the store was ingested with a different number of shards, every
+        recorded PDF is changed and the plan is marked `relayout`.
+        """
+        plan = IngestionPlan()
+        seen = set()
+        if self.entries and self.shards != shards:
+            plan.relayout = True
+            force = True
+
+        for path in pdf_paths:
+            filename = os.path.basename(path)
+            seen.add(filename)
+            entry = self.entries.get(filename)
+            stat = os.stat(path)
+
+            same_params = (
+                entry is not None
+                and entry.chunk_size == chunk_size
+                and entry.overlap == overlap
+                and entry.embedding_model == embedding_model
+                and entry.extractor == extractor
+                and entry.chunker == chunker
+            )
+            if not force and same_params and entry.file_size == stat.st_size \
+                    and entry.modified_time == stat.st_mtime:
+                plan.unchanged.append(path)
+                continue
+
+            content_hash = PDFProcessor.compute_file_hash(path)
+            if entry is None:
+                plan.new.append(path)
+            elif force or not same_params or entry.content_hash != content_hash:
+                plan.changed.append(path)
+            else:
+                # Touched but identical content: refresh the stat fields only
+                entry.file_size = stat.st_size
+                entry.modified_time = stat.st_mtime
+                plan.unchanged.append(path)
+                continue
+            plan.hashes[path] = content_hash
+
+        plan.deleted = sorted(filename for filename in self.entries if filename not in seen)
+        return plan
+
+    def record(self, pdf_path: str, content_hash: str, chunk_size: int, overlap: int,
+               embedding_model: str, chunk_count: int, extractor: str = "pypdf",
+               chunker: str = "page"):
+        """
+        Record a successfully ingested PDF
+        """
+        stat = os.stat(pdf_path)
+        self.entries[os.path.basename(pdf_path)] = ManifestEntry(
+            content_hash=content_hash,
+            chunk_size=chunk_size,
+            overlap=overlap,
+            embedding_model=embedding_model,
+            file_size=stat.st_size,
+            modified_time=stat.st_mtime,
+            chunk_count=chunk_count,
+            ingested_at=time.time(),
+            extractor=extractor,
+            chunker=chunker
+        )
+
+    def remove(self, filename: str):
+        self.entries.pop(filename, None)
+
+    def get(self, filename: str) -> Optional[ManifestEntry]:
+        return self.entries.get(filename)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'documents': len(self.entries),
+            'chunks': sum(entry.chunk_count for entry in self.entries.values()),
+            'fingerprint': self.fingerprint()
+        }
+
+
+class ManifestFingerprint:
+    """
+    Reads the fingerprint of a store's manifest, re-reading the file only
+    when its modification time changes
+    """
+
+    def __init__(self, persist_directory: str):
+        self.path = os.path.join(persist_directory, MANIFEST_FILENAME)
+        self._mtime = None
+        self._fingerprint = None
+
+    def read(self) -> Optional[str]:
+        """
+        Current fingerprint, or None if nothing has been ingested yet
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'r') as file:
+                    self._fingerprint = json.load(file).get('fingerprint', 'unknown')
+                self._mtime = mtime
+            except Exception as e:
+                print(f"Error reading manifest fingerprint: {str(e)}")
+
+        return self._fingerprint
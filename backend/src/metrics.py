@@ -0,0 +1,416 @@
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; fine-grained at the low end for embedding and vector search stages
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Seconds between a process's snapshots in a shared metrics directory
+SHARE_INTERVAL_S = 1.0
+
+# (metric name, type, help, [(labels, value)]) produced by a collector at scrape time
+Sample = Tuple[Dict[str, str], float]
+Family = Tuple[str, str, str, List[Sample]]
+# (metric name, type, help, [(sample name, labels, value)]), as rendered
+Exposition = Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """
+        The child metric for one combination of label values
+        """
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Metrics without labels act as their own single child
+        return self.labels()
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    def __init__(self, registry: "MetricsRegistry"):
+        self.registry = registry
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild(self.registry)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}_total", dict(zip(self.labelnames, key)), child.value
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        if self.registry.enabled:
+            self.value = value
+
+    @contextmanager
+    def track_in_progress(self):
+        """
+        Increment for the duration of the block
+        """
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild(self.registry)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def track_in_progress(self):
+        return self._default().track_in_progress()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield self.name, dict(zip(self.labelnames, key)), child.value
+
+
+class _HistogramChild:
+    def __init__(self, registry: "MetricsRegistry", buckets: Sequence[float]):
+        self.registry = registry
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observe the duration of the block in seconds
+        """
+        if not self.registry.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.registry, self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text exposition format.
+
+    Counters, gauges and histograms are updated where the work happens;
+    collectors add values that already live elsewhere (cache hit counters,
+    executor queue depths) at scrape time. While `enabled` is False every
+    update returns after one attribute check, so instrumented code costs
+    next to nothing when metrics are off.
+
+    Worker processes of one server `share` a directory: each writes a
+    snapshot of its metrics there, and rendering merges every snapshot, so
+    any worker answers a scrape for the whole server (see `render`).
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+        self.shared_directory: Optional[str] = None
+        self._snapshot_lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Iterable[Family]]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def collect(self) -> List[Exposition]:
+        """
+        Every metric family of this process, with its samples
+        """
+        families = [
+            (metric.name, metric.type, metric.help, list(metric.samples()))
+            for metric in list(self._metrics.values())
+        ]
+        for collector in list(self._collectors):
+            try:
+                collected = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, metric_type, help, samples in collected:
+                families.append((name, metric_type, help, [(name, labels, value) for labels, value in samples]))
+        return families
+
+    def render(self) -> str:
+        """
+        The exposition of this process's metrics or, once `share` has been
+        called, of every process sharing the directory
+        """
+        families = self.collect() if self.shared_directory is None else self._collect_shared()
+        lines = []
+        for name, metric_type, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def share(self, directory: str, interval: float = SHARE_INTERVAL_S):
+        """
+        Publish this process's metrics to `directory` every `interval`
+        seconds (and on every render), and merge all processes' metrics
+        when rendering. Called in each forked worker.
+        """
+        self.shared_directory = directory
+        self.publish()
+
+        def publish_periodically():
+            while self.shared_directory is not None:
+                time.sleep(interval)
+                try:
+                    self.publish()
+                except Exception as e:
+                    print(f"Error publishing metrics: {str(e)}")
+
+        threading.Thread(target=publish_periodically, name="metrics-publisher", daemon=True).start()
+
+    def publish(self):
+        """
+        Write this process's snapshot to the shared directory
+        """
+        with self._snapshot_lock:
+            if self.shared_directory is None:
+                return
+            path = os.path.join(self.shared_directory, f"worker-{os.getpid()}.json")
+            temporary = f"{path}.tmp"
+            with open(temporary, 'w') as file:
+                json.dump(self.collect(), file)
+            os.replace(temporary, path)
+
+    def stop_sharing(self):
+        """
+        Write a final snapshot and stop publishing, before collectors are
+        removed (a snapshot without them would lower their totals)
+        """
+        self.publish()
+        with self._snapshot_lock:
+            self.shared_directory = None
+
+    def _collect_shared(self) -> List[Exposition]:
+        """
+        Merge the snapshots of every process, this one's written afresh.
+        Counters and histograms are summed, including those of workers that
+        have exited, so totals never go down when a scrape reaches another
+        worker or a worker is restarted. Gauges are per worker (a `worker`
+        label with its pid) and only from live workers.
+        """
+        self.publish()
+        merged: Dict[str, Tuple[str, str, Dict[Tuple, Tuple[str, Dict[str, str], float]]]] = {}
+        for path in sorted(glob.glob(os.path.join(self.shared_directory, "*.json"))):
+            filename = os.path.basename(path)
+            live = filename.startswith("worker-")
+            pid = filename[:-len(".json")].split("-")[1]
+            try:
+                with open(path) as file:
+                    families = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Error reading metrics snapshot {filename}: {str(e)}")
+                continue
+            for name, metric_type, help, samples in families:
+                summed = metric_type in ("counter", "histogram")
+                if not summed and not live:
+                    continue
+                _, _, merged_samples = merged.setdefault(name, (metric_type, help, {}))
+                for sample_name, labels, value in samples:
+                    if not summed:
+                        labels = {**labels, 'worker': pid}
+                    key = (sample_name,) + tuple(sorted(labels.items()))
+                    previous = merged_samples.get(key)
+                    merged_samples[key] = (sample_name, labels, value + (previous[2] if previous else 0.0))
+        return [
+            (name, metric_type, help, list(samples.values()))
+            for name, (metric_type, help, samples) in merged.items()
+        ]
+
+    def write(self, path: str):
+        """
+        Write the exposition to a file (e.g. for node_exporter's textfile collector)
+        """
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as file:
+            file.write(self.render())
+        os.replace(temporary, path)
+
+
+def mark_process_dead(directory: str, pid: int):
+    """
+    Keep an exited worker's counters and histograms in the merged metrics
+    but drop its gauges (called by the process that reaps the worker)
+    """
+    path = os.path.join(directory, f"worker-{pid}.json")
+    if os.path.exists(path):
+        # Timestamped, since the pid may be reused by a later worker
+        os.replace(path, os.path.join(directory, f"exited-{pid}-{time.time_ns()}.json"))
+
+
+# Process-wide registry; the API and ingestion scripts enable it from settings
+REGISTRY = MetricsRegistry()
+
+RAG_STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds", "Duration of each stage of a RAG request", ["stage"]
+)
+RAG_ANSWERS = REGISTRY.counter(
+    "rag_answers", "RAG answers by outcome (generated, cached, no_results, error)", ["outcome"]
+)
+LLM_IN_FLIGHT = REGISTRY.gauge("rag_llm_calls_in_flight", "Anthropic API calls in progress")
+INGEST_STAGE_SECONDS = REGISTRY.histogram(
+    "ingest_stage_duration_seconds", "Duration of ingestion stages per batch or document", ["stage"]
+)
+INGEST_CHUNKS = REGISTRY.counter("ingest_chunks", "Chunks embedded and written to the vector store")
+
+
+def record_rag_timings(timings: Optional[Dict[str, float]], outcome: str):
+    """
+    Observe a RAG request's stage timings (the `*_ms` entries) and count its outcome
+    """
+    if not REGISTRY.enabled:
+        return
+    RAG_ANSWERS.labels(outcome).inc()
+    for key, value in (timings or {}).items():
+        if key.endswith("_ms"):
+            RAG_STAGE_SECONDS.labels(key[:-3]).observe(value / 1000)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    A Server-Timing header value from `*_ms` stage timings
+    """
+    return ", ".join(
+        f"{key[:-3]};dur={value:g}" for key, value in timings.items() if key.endswith("_ms")
+    )
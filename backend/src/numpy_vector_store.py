@@ -0,0 +1,724 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Sequence
+
+import numpy as np
+
+from .pdf_processor import DocumentChunk, ChunkMetadata
+from .manifest import ManifestFingerprint
+from .lexical_index import LexicalIndex
+from .lru_cache import LRUCache
+from .search_filter import SearchFilter
+from .quantization import create_quantizer, save_quantizer, load_quantizer, rescored_search
+
+EMBEDDINGS_FILENAME = "embeddings.npy"
+CODES_FILENAME = "codes.npy"
+QUANTIZER_FILENAME = "quantizer.npz"
+METADATA_FILENAME = "chunks.sqlite"
+PARTITIONS_DIRNAME = "partitions"
+
+_INITIAL_CAPACITY = 1024
+
+# Searches that overlap a write which renumbers rows are retried; the last attempt holds the lock
+_SEARCH_ATTEMPTS = 3
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _grow_npy(path: str, array: Optional[np.memmap], capacity: int, width: int,
+              dtype: np.dtype) -> np.memmap:
+    """
+    Create a (capacity, width) .npy memmap, or extend an existing one to
+    `capacity` rows by rewriting its header in place and growing the file
+    """
+    dtype = np.dtype(dtype)
+    if array is None or not os.path.exists(path):
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(capacity, width))
+
+    offset = array.offset
+    array.flush()
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, {
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': (capacity, width)
+    })
+    if len(header.getvalue()) != offset:
+        raise RuntimeError(f"Header of {path} cannot be resized in place")
+    with open(path, 'r+b') as file:
+        file.write(header.getvalue())
+        file.truncate(offset + capacity * width * dtype.itemsize)
+    return np.load(path, mmap_mode='r+')
+
+
+class NumpyVectorStore:
+    """
+    Exact-search vector store over a contiguous, L2-normalized float32 matrix.
+
+    Embeddings live in a memory-mapped .npy file whose header declares the
+    allocated capacity; the number of filled rows, chunk text and metadata
+    live in a SQLite table keyed by row number. A query is one matrix-vector
+    product plus `argpartition`, so results are exact. Replaced and deleted
+    chunks leave dead rows that are skipped at search time and reclaimed by
+    `compact()`. Implements the same interface as the Chroma `VectorStore`.
+
+    With `compression` set to "int8" or "pq", `build_compressed_index()`
+    trains a quantizer and writes compact codes for every row. Searches then
+    scan only the codes (asymmetric distance computation) and re-score the
+    best `rescore_factor * n_results` candidates exactly against the float
+    rows, which stay on disk and are paged in only for those candidates.
+
+    Filtered searches score only the rows matching the filter. `partitions`
+    maps collection IDs to their documents; each such collection gets a
+    contiguous copy of its rows (written under partitions/ and rebuilt after
+    the store changes), so searching within it reads one sequential block.
+    """
+
+    def __init__(self, persist_directory: str = "data/embeddings_numpy",
+                 lexical_index: Optional[LexicalIndex] = None, compression: str = "none",
+                 pq_subspaces: int = 48, rescore_factor: int = 10,
+                 partitions: Optional[Dict[str, List[str]]] = None):
+        self.persist_directory = persist_directory
+        self.lexical_index = lexical_index
+        self.compression = compression
+        self.pq_subspaces = pq_subspaces
+        self.rescore_factor = rescore_factor
+        self.partitions = partitions or {}
+        # Validates the mode
+        create_quantizer(compression, pq_subspaces)
+        os.makedirs(persist_directory, exist_ok=True)
+        self.matrix_path = os.path.join(persist_directory, EMBEDDINGS_FILENAME)
+        self.codes_path = os.path.join(persist_directory, CODES_FILENAME)
+        self.quantizer_path = os.path.join(persist_directory, QUANTIZER_FILENAME)
+        self.partitions_dir = os.path.join(persist_directory, PARTITIONS_DIRNAME)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            os.path.join(persist_directory, METADATA_FILENAME), check_same_thread=False, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                source_document TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source_document)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        self._matrix: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None
+        self.quantizer = None
+        self.count = 0
+        self.alive = np.zeros(0, dtype=bool)
+        self.generation = None
+        self._manifest_fingerprint = ManifestFingerprint(persist_directory)
+        # (generation, filter) -> sorted matching rows
+        self._filter_rows = LRUCache(256)
+        # collection ID -> (generation, rows, contiguous vectors)
+        self._loaded_partitions: Dict[str, tuple] = {}
+
+        # Bumped on every write through this instance
+        self.version = 0
+        self._refresh()
+
+    # Storage
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def _refresh(self):
+        """
+        Reload row count, live rows and the matrix mapping if another
+        instance (e.g. an ingestion run) has written since we last looked
+        """
+        with self._lock:
+            generation = self._get_meta('generation')
+            if generation == self.generation:
+                return
+
+            self.count = int(self._get_meta('count') or 0)
+            # Mapped read-only; writes through this instance remap it with `_writable()`
+            self._matrix = np.load(self.matrix_path, mmap_mode='r') \
+                if os.path.exists(self.matrix_path) else None
+            self._load_codes()
+            capacity = len(self._matrix) if self._matrix is not None else 0
+            self.alive = np.zeros(capacity, dtype=bool)
+            rows = np.fromiter(
+                (row for (row,) in self._conn.execute("SELECT row FROM chunks")), dtype=np.int64
+            )
+            self.alive[rows] = True
+            self.generation = generation
+
+    def _load_codes(self):
+        """
+        Load the trained quantizer and its codes if they match the configured compression
+        """
+        self.quantizer, self._codes = None, None
+        if self.compression == "none":
+            return
+        try:
+            quantizer = load_quantizer(self.quantizer_path)
+            if quantizer is not None and quantizer.kind == self.compression \
+                    and os.path.exists(self.codes_path):
+                self.quantizer = quantizer
+                self._codes = np.load(self.codes_path, mmap_mode='r')
+        except Exception as e:
+            print(f"Error loading compressed index, using exact search: {str(e)}")
+
+    @property
+    def compressed(self) -> bool:
+        return self._codes is not None and self._matrix is not None \
+            and len(self._codes) >= self.count
+
+    def _commit(self):
+        """
+        Persist the row count and publish a new generation to other instances
+        """
+        self.generation = str(int(self.generation or 0) + 1)
+        self._set_meta('count', self.count)
+        self._set_meta('generation', self.generation)
+        self._conn.commit()
+        self.version += 1
+
+    def _writable(self):
+        """
+        Remap the matrix (and codes) read-write before this instance writes rows
+        """
+        if self._matrix is not None and not self._matrix.flags.writeable:
+            self._matrix = np.load(self.matrix_path, mmap_mode='r+')
+        if self._codes is not None and not self._codes.flags.writeable:
+            self._codes = np.load(self.codes_path, mmap_mode='r+')
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        """
+        Grow the embedding (and code) files to hold at least `rows` rows,
+        doubling capacity
+        """
+        if self._matrix is not None and len(self._matrix) >= rows:
+            return
+
+        capacity = max(_INITIAL_CAPACITY, len(self._matrix) if self._matrix is not None else 0)
+        while capacity < rows:
+            capacity *= 2
+
+        self._matrix = _grow_npy(self.matrix_path, self._matrix, capacity, dim, np.float32)
+        if self._codes is not None:
+            self._codes = _grow_npy(self.codes_path, self._codes, capacity,
+                                    self._codes.shape[1], self._codes.dtype)
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    def _matching_rows(self, search_filter: SearchFilter) -> np.ndarray:
+        """
+        Sorted rows of the chunks passing a filter, cached per generation
+        """
+        key = (self.generation, search_filter)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            condition, params = search_filter.to_sql()
+            with self._lock:
+                rows = np.fromiter(
+                    (row for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE {condition}", params)),
+                    dtype=np.int64
+                )
+            rows.sort()
+            self._filter_rows.put(key, rows)
+        return rows
+
+    def _partition(self, collection: str) -> Optional[tuple]:
+        """
+        (rows, contiguous vectors) of a pre-partitioned collection, loaded
+        from disk or rebuilt if the store has changed since it was written
+        """
+        with self._lock:
+            generation = self.generation
+            loaded = self._loaded_partitions.get(collection)
+            if loaded is not None and loaded[0] == generation:
+                return loaded[1], loaded[2]
+            if self._matrix is None:
+                return None
+
+            rows_path = os.path.join(self.partitions_dir, f"{collection}.rows.npy")
+            vectors_path = os.path.join(self.partitions_dir, f"{collection}.npy")
+            if self._get_meta(f"partition:{collection}") == generation \
+                    and os.path.exists(rows_path) and os.path.exists(vectors_path):
+                rows = np.load(rows_path)
+            else:
+                rows = self._matching_rows(SearchFilter(documents=tuple(sorted(set(self.partitions[collection])))))
+                os.makedirs(self.partitions_dir, exist_ok=True)
+                for path, array in ((rows_path, rows), (vectors_path, np.ascontiguousarray(self._matrix[rows]))):
+                    np.save(path + ".tmp.npy", array)
+                    os.replace(path + ".tmp.npy", path)
+                self._set_meta(f"partition:{collection}", generation)
+                self._conn.commit()
+                print(f"Built partition {collection} ({len(rows)} chunks)")
+
+            vectors = np.load(vectors_path, mmap_mode='r')
+            self._loaded_partitions[collection] = (generation, rows, vectors)
+            return rows, vectors
+
+    def _fetch_rows_at(self, rows: Sequence[int], generation: Optional[str]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """
+        Fetch rows as numbered at `generation`, or None if the store has
+        been written since (a compaction renumbers rows). Both reads share
+        one SQLite read transaction, so they see the same snapshot.
+        """
+        with self._lock:
+            began = not self._conn.in_transaction
+            if began:
+                self._conn.execute("BEGIN")
+            try:
+                if self._get_meta('generation') != generation:
+                    return None
+                return self._fetch_rows(rows)
+            finally:
+                if began:
+                    self._conn.commit()
+
+    def _fetch_rows(self, rows: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        found = {}
+        rows = [int(row) for row in rows]
+        for i in range(0, len(rows), 500):
+            batch = rows[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row, chunk_id, content, metadata in self._conn.execute(
+                f"SELECT row, chunk_id, content, metadata FROM chunks WHERE row IN ({placeholders})", batch
+            ):
+                found[row] = {'chunk_id': chunk_id, 'content': content, 'metadata': json.loads(metadata)}
+        return found
+
+    # VectorStore interface
+
+    def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]) -> int:
+        """
+        Append chunks with their embeddings. Re-adding a chunk ID replaces it.
+        Returns the number of chunks stored (0 if the write failed).
+        """
+        added = len(chunks)
+        try:
+            # The last occurrence of a chunk ID within the batch wins
+            latest = {chunk.chunk_id: i for i, chunk in enumerate(chunks)}
+            order = sorted(latest.values())
+            chunks = [chunks[i] for i in order]
+            vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32)[order])
+
+            with self._lock:
+                self._refresh()
+                self._writable()
+                if self._matrix is not None and vectors.shape[1] != self._matrix.shape[1]:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match "
+                                     f"the store's {self._matrix.shape[1]}")
+
+                count, generation = self.count, self.generation
+                replaced: List[int] = []
+                try:
+                    self._ensure_capacity(count + len(chunks), vectors.shape[1])
+
+                    ids = [chunk.chunk_id for chunk in chunks]
+                    for i in range(0, len(ids), 500):
+                        batch = ids[i:i + 500]
+                        placeholders = ",".join("?" * len(batch))
+                        rows = [row for (row,) in self._conn.execute(
+                            f"SELECT row FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                        )]
+                        self.alive[rows] = False
+                        replaced.extend(rows)
+                        self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+                    self._matrix[count:count + len(chunks)] = vectors
+                    self._matrix.flush()
+                    if self._codes is not None:
+                        self._codes[count:count + len(chunks)] = self.quantizer.encode(vectors)
+                        self._codes.flush()
+                    self._conn.executemany(
+                        "INSERT INTO chunks (row, chunk_id, source_document, content, metadata) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (count + i, chunk.chunk_id, chunk.metadata.source_document, chunk.content,
+                             json.dumps(self._chunk_metadata_to_dict(chunk.metadata)))
+                            for i, chunk in enumerate(chunks)
+                        ]
+                    )
+                    self.alive[count:count + len(chunks)] = True
+                    self.count += len(chunks)
+                    self._commit()
+                except Exception:
+                    # Undo the whole upsert, as Chroma's is atomic: the replaced chunks stay
+                    self._conn.rollback()
+                    self.alive[replaced] = True
+                    self.alive[count:count + len(chunks)] = False
+                    self.count, self.generation = count, generation
+                    raise
+
+            if self.lexical_index is not None:
+                self.lexical_index.add_chunks(chunks)
+
+            print(f"Added {len(chunks)} chunks to vector store")
+            return added
+
+        except Exception as e:
+            print(f"Error adding chunks to vector store: {str(e)}")
+            self.version += 1
+            return 0
+
+    def search_similar(self, query_embedding: List[float], n_results: int = 10,
+                       threshold: float = 0.7,
+                       search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        """
+        Exact top-k search by cosine similarity
+        """
+        results = self.search_similar_many([query_embedding], n_results, threshold, search_filter)
+        return results[0] if results else []
+
+    def search_similar_many(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+                            threshold: float = 0.7,
+                            search_filter: Optional[SearchFilter] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Exact top-k search for several queries with one matrix product.
+        With a filter only matching rows are scored: a pre-partitioned
+        collection's contiguous copy, or the matching rows gathered from the
+        matrix (with compression, the code scan is masked to them instead).
+        """
+        try:
+            if not len(query_embeddings):
+                return []
+            queries = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+            for attempt in range(_SEARCH_ATTEMPTS):
+                if attempt < _SEARCH_ATTEMPTS - 1:
+                    results = self._search_snapshot(queries, n_results, threshold, search_filter)
+                else:
+                    with self._lock:
+                        results = self._search_snapshot(queries, n_results, threshold, search_filter)
+                if results is not None:
+                    return results
+            return [[] for _ in query_embeddings]
+
+        except Exception as e:
+            print(f"Error searching vector store: {str(e)}")
+            return [[] for _ in query_embeddings]
+
+    def _search_snapshot(self, queries: np.ndarray, n_results: int, threshold: float,
+                         search_filter: Optional[SearchFilter]) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        Score against the current generation without holding the lock, then
+        fetch the winning rows; None if a write renumbered rows meanwhile
+        """
+        self._refresh()
+        with self._lock:
+            matrix, count, alive = self._matrix, self.count, self.alive[:self.count]
+            codes = self._codes if self.compressed else None
+            quantizer = self.quantizer
+            generation = self.generation
+        if matrix is None or count == 0:
+            return [[] for _ in queries]
+
+        rows, vectors = None, None
+        if search_filter is not None:
+            if codes is None and search_filter.collection in self.partitions and not search_filter.has_pages:
+                partition = self._partition(search_filter.collection)
+                if partition is not None:
+                    rows, vectors = partition
+            if rows is None:
+                rows = self._matching_rows(search_filter)
+            if not len(rows):
+                return [[] for _ in queries]
+        k = min(n_results, count if rows is None else len(rows))
+
+        if codes is None and rows is not None:
+            # Only the filtered rows: (matches, dim) @ (dim, queries)
+            if vectors is None:
+                vectors = matrix[rows]
+            scores = np.asarray(vectors) @ queries.T
+            top_rows = [self._top_k(scores[:, column], rows, k, threshold)
+                        for column in range(scores.shape[1])]
+        elif codes is None:
+            # (count, dim) @ (dim, queries)
+            scores = matrix[:count] @ queries.T
+            if not alive.all():
+                scores[~alive] = -np.inf
+            top_rows = [self._top_k(scores[:, column], np.arange(count), k, threshold)
+                        for column in range(scores.shape[1])]
+        else:
+            if rows is not None:
+                allowed = np.zeros(count, dtype=bool)
+                allowed[rows] = True
+                alive = alive & allowed
+            # Approximate scan over the codes, then exact re-scoring of the shortlist
+            shortlists = rescored_search(
+                quantizer, codes[:count], matrix, queries, k, self.rescore_factor, alive
+            )
+            top_rows = [self._top_k(exact, rows, k, threshold) for rows, exact in shortlists]
+
+        found = self._fetch_rows_at({row for rows in top_rows for row, _ in rows}, generation)
+        if found is None:
+            return None
+
+        return [
+            [dict(found[row], similarity=similarity) for row, similarity in rows if row in found]
+            for rows in top_rows
+        ]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, rows: np.ndarray, k: int, threshold: float) -> List[tuple]:
+        """
+        Best k (row, score) pairs above the threshold, highest first.
+        The threshold is applied first, so selection and sorting only touch
+        rows that can be returned (often far fewer than k for narrow queries).
+        """
+        above = np.flatnonzero(scores >= threshold)
+        scores, rows = scores[above], rows[above]
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def build_compressed_index(self, sample_size: int = 100_000):
+        """
+        Train the configured quantizer on (a sample of) the live rows and
+        encode every row. Re-run after large ingests so codebooks track the corpus.
+        """
+        if self.compression == "none":
+            return
+        with self._lock:
+            self._refresh()
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            if self._matrix is None or not len(live_rows):
+                return
+
+            rng = np.random.default_rng(0)
+            sample = live_rows if len(live_rows) <= sample_size \
+                else np.sort(rng.choice(live_rows, sample_size, replace=False))
+            quantizer = create_quantizer(self.compression, self.pq_subspaces)
+            quantizer.train(np.asarray(self._matrix[sample]))
+
+            capacity, dim = self._matrix.shape
+            self._codes = None
+            codes = np.lib.format.open_memmap(
+                self.codes_path + ".tmp", mode='w+', dtype=quantizer.code_dtype,
+                shape=(capacity, quantizer.code_size(dim))
+            )
+            for start in range(0, self.count, 65536):
+                end = min(start + 65536, self.count)
+                codes[start:end] = quantizer.encode(np.asarray(self._matrix[start:end]))
+            codes.flush()
+            del codes
+            os.replace(self.codes_path + ".tmp", self.codes_path)
+            save_quantizer(quantizer, self.quantizer_path)
+
+            self.quantizer = quantizer
+            self._codes = np.load(self.codes_path, mmap_mode='r')
+            self._commit()
+            print(f"Built {self.compression} compressed index over {self.count} rows "
+                  f"({quantizer.code_size(dim)} bytes per vector)")
+
+    def get_chunk_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a specific chunk by its ID
+        """
+        chunks = self.get_chunks([chunk_id])
+        return chunks[0] if chunks else None
+
+    def get_chunks(self, chunk_ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retrieve several chunks by ID, optionally with their embeddings
+        """
+        try:
+            self._refresh()
+            chunks = []
+            with self._lock:
+                for i in range(0, len(chunk_ids), 500):
+                    batch = chunk_ids[i:i + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    for row, chunk_id, content, metadata in self._conn.execute(
+                        f"SELECT row, chunk_id, content, metadata FROM chunks "
+                        f"WHERE chunk_id IN ({placeholders})", batch
+                    ):
+                        chunk = {'chunk_id': chunk_id, 'content': content, 'metadata': json.loads(metadata)}
+                        if include_embeddings:
+                            chunk['embedding'] = np.array(self._matrix[row])
+                        chunks.append(chunk)
+            return chunks
+
+        except Exception as e:
+            print(f"Error retrieving chunks: {str(e)}")
+            return []
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Page through every chunk (without embeddings)
+        """
+        last_row = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row, chunk_id, content, metadata FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row, chunk_id, content, metadata in rows:
+                yield {'chunk_id': chunk_id, 'content': content, 'metadata': json.loads(metadata)}
+            last_row = rows[-1][0]
+
+    def delete_document(self, source_document: str):
+        """
+        Remove all chunks belonging to a source document
+        """
+        try:
+            with self._lock:
+                self._refresh()
+                rows = [row for (row,) in self._conn.execute(
+                    "SELECT row FROM chunks WHERE source_document = ?", (source_document,)
+                )]
+                self._conn.execute("DELETE FROM chunks WHERE source_document = ?", (source_document,))
+                self.alive[rows] = False
+                self._commit()
+
+                # Reclaim space once most rows are dead
+                if self.count > _INITIAL_CAPACITY and self.alive[:self.count].sum() * 2 < self.count:
+                    self.compact()
+
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(source_document)
+            print(f"Deleted chunks of {source_document} from vector store")
+        except Exception as e:
+            print(f"Error deleting chunks of {source_document}: {str(e)}")
+
+    def compact(self):
+        """
+        Rewrite the embedding file without dead rows and renumber the metadata
+        """
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                return
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            vectors = np.array(self._matrix[live_rows])
+            codes = np.array(self._codes[live_rows]) if self._codes is not None else None
+            dim = self._matrix.shape[1]
+
+            # Two passes so renumbered rows never collide with existing keys
+            self._conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(-(new_row + 1), int(row)) for new_row, row in enumerate(live_rows)]
+            )
+            self._conn.execute("UPDATE chunks SET row = -row - 1")
+
+            self._matrix = None
+            tmp_path = self.matrix_path + ".tmp"
+            matrix = np.lib.format.open_memmap(
+                tmp_path, mode='w+', dtype=np.float32,
+                shape=(max(_INITIAL_CAPACITY, len(vectors)), dim)
+            )
+            matrix[:len(vectors)] = vectors
+            matrix.flush()
+            del matrix
+            os.replace(tmp_path, self.matrix_path)
+
+            if codes is not None:
+                self._codes = None
+                compacted = np.lib.format.open_memmap(
+                    self.codes_path + ".tmp", mode='w+', dtype=codes.dtype,
+                    shape=(max(_INITIAL_CAPACITY, len(codes)), codes.shape[1])
+                )
+                compacted[:len(codes)] = codes
+                compacted.flush()
+                del compacted
+                os.replace(self.codes_path + ".tmp", self.codes_path)
+                self._codes = np.load(self.codes_path, mmap_mode='r')
+
+            self._matrix = np.load(self.matrix_path, mmap_mode='r')
+            self.alive = np.zeros(len(self._matrix), dtype=bool)
+            self.alive[:len(vectors)] = True
+            self.count = len(vectors)
+            self._commit()
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the collection
+        """
+        try:
+            self._refresh()
+            return {
+                'total_chunks': int(self.alive[:self.count].sum()),
+                'collection_name': 'numpy',
+                'rows': self.count,
+                'capacity': len(self._matrix) if self._matrix is not None else 0,
+                'compression': self.compression if self.compressed else "none",
+                'partitions': sorted(self.partitions),
+                'bytes_per_vector': (
+                    self._codes.shape[1] * self._codes.itemsize if self.compressed
+                    else self._matrix.shape[1] * 4 if self._matrix is not None else 0
+                )
+            }
+        except Exception as e:
+            print(f"Error getting collection stats: {str(e)}")
+            return {'total_chunks': 0, 'collection_name': 'unknown'}
+
+    def get_corpus_version(self) -> str:
+        """
+        Manifest fingerprint plus this instance's write counter (see VectorStore)
+        """
+        fingerprint = self._manifest_fingerprint.read() or "empty"
+        return f"{fingerprint}.{self.version}"
+
+    def close(self):
+        """
+        Release the metadata database and the matrix mappings
+        """
+        with self._lock:
+            self._matrix, self._codes = None, None
+            self._conn.close()
+
+    def _chunk_metadata_to_dict(self, metadata: ChunkMetadata) -> Dict[str, Any]:
+        return {
+            'source_document': metadata.source_document,
+            'page_number': metadata.page_number,
+            'chunk_type': metadata.chunk_type,
+            'section_title': metadata.section_title,
+            'document_hash': metadata.document_hash,
+            'char_start': metadata.char_start,
+            'char_end': metadata.char_end,
+            'page_end': metadata.page_end or metadata.page_number
+        }
+
+    def reset_collection(self):
+        """
+        Drop every chunk and the embedding file
+        """
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM chunks")
+                self._matrix, self._codes, self.quantizer = None, None, None
+                for path in (self.matrix_path, self.codes_path, self.quantizer_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.alive = np.zeros(0, dtype=bool)
+                self.count = 0
+                self._commit()
+            if self.lexical_index is not None:
+                self.lexical_index.reset()
+            print("Collection reset successfully")
+        except Exception as e:
+            print(f"Error resetting collection: {str(e)}")
@@ -0,0 +1,215 @@
+import inspect
+import json
+import os
+from typing import List, Dict, Any
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:
+    Tokenizer = None
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+# ONNX embeddings are checked against the PyTorch model at export time.
+# Mean cosine similarity to the torch embedding of the same text must reach:
+ONNX_FP32_MIN_COSINE = 0.9999
+ONNX_INT8_MIN_COSINE = 0.98
+
+
+def onnx_model_dir(root: str, model_name: str) -> str:
+    """
+    Directory of a model's exported ONNX files under `root`
+    """
+    return os.path.join(root, model_name.replace('/', '--'))
+
+
+def onnx_model_file(model_dir: str, quantized: bool) -> str:
+    return os.path.join(model_dir, "model.int8.onnx" if quantized else "model.onnx")
+
+
+def export_onnx_model(model_name: str, model_dir: str, quantize: bool = True,
+                      opset: int = 17) -> Dict[str, Any]:
+    """
+    Export a sentence-transformers model to ONNX with its tokenizer, plus a
+    dynamically int8-quantized copy, and verify both against the PyTorch
+    model. Needs torch, sentence-transformers and onnx; serving only needs
+    onnxruntime and tokenizers.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if ort is None or Tokenizer is None:
+        raise RuntimeError("onnxruntime and tokenizers are required to export an ONNX embedding model")
+
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0]
+    # get_pooling_mode_str() in sentence-transformers 2.x, pooling_mode in later versions
+    pooling = model[1].get_pooling_mode_str() if hasattr(model[1], 'get_pooling_mode_str') else model[1].pooling_mode
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling}")
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, auto_model):
+            super().__init__()
+            self.auto_model = auto_model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.auto_model(input_ids=input_ids, attention_mask=attention_mask,
+                                   token_type_ids=token_type_ids).last_hidden_state
+
+    os.makedirs(model_dir, exist_ok=True)
+    fp32_path = onnx_model_file(model_dir, quantized=False)
+    sample = model.tokenizer(["An example sentence", "Another one"], padding=True, return_tensors='pt')
+    if 'token_type_ids' not in sample:
+        sample['token_type_ids'] = torch.zeros_like(sample['input_ids'])
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in ('input_ids', 'attention_mask', 'token_type_ids')}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+    # torch >= 2.5 has a dynamo exporter (the default from 2.9); keep the TorchScript one.
+    # Older releases, such as the pinned 2.1, only have TorchScript and reject the argument.
+    export_options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        export_options['dynamo'] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            HiddenStates(transformer.auto_model.eval()),
+            (sample['input_ids'], sample['attention_mask'], sample['token_type_ids']),
+            fp32_path,
+            input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            **export_options
+        )
+    model.tokenizer.save_pretrained(model_dir)
+
+    config = {
+        'model_name': model_name,
+        'dimension': model.get_sentence_embedding_dimension(),
+        'max_seq_length': model.max_seq_length,
+        'pooling': pooling,
+        'opset': opset
+    }
+    with open(os.path.join(model_dir, "onnx_config.json"), 'w') as file:
+        json.dump(config, file, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, onnx_model_file(model_dir, quantized=True), weight_type=QuantType.QInt8)
+
+    # Cosine compatibility with the PyTorch embeddings already in the index
+    texts = [
+        "Fe-Cr-Si non-oriented electrical steel sheet with 2.5% to 10% by mass of Si",
+        "final annealing in an atmosphere with less than 30 percent nitrogen by volume",
+        "core loss in the high-frequency range of 1 kHz or more",
+        "What is the chromium content?",
+        "hot-dip aluminum-zinc alloy plating layer containing Mg, Cr and Sr"
+    ]
+    reference = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    checks = {'fp32': (False, ONNX_FP32_MIN_COSINE)}
+    if quantize:
+        checks['int8'] = (True, ONNX_INT8_MIN_COSINE)
+    for name, (quantized, minimum) in checks.items():
+        encoded = OnnxEncoder(model_dir, quantized=quantized).encode(texts)
+        cosine = float(np.mean(np.sum(encoded * reference, axis=1)))
+        config[f'{name}_cosine'] = round(cosine, 6)
+        if cosine < minimum:
+            raise RuntimeError(f"ONNX {name} embeddings diverge from {model_name}: "
+                               f"mean cosine {cosine:.4f} < {minimum}")
+
+    with open(os.path.join(model_dir, "onnx_config.json"), 'w') as file:
+        json.dump(config, file, indent=2)
+    return config
+
+
+class OnnxEncoder:
+    """
+    Sentence embeddings from an exported ONNX model on ONNX Runtime (CPU).
+
+    Mirrors the part of SentenceTransformer used by EmbeddingEngine
+    (`encode`, `get_sentence_embedding_dimension`). Texts are tokenized
+    with the model's own fast tokenizer, batched by length to limit
+    padding, pooled like the original model and L2-normalized.
+    `intra_op_threads` parallelizes each matrix multiply (0: ONNX Runtime's
+    default of one thread per physical core); `inter_op_threads` > 1 also
+    runs independent graph nodes in parallel.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, intra_op_threads: int = 0,
+                 inter_op_threads: int = 1):
+        if ort is None or Tokenizer is None:
+            raise RuntimeError("onnxruntime and tokenizers are required for the ONNX embedding backend")
+
+        with open(os.path.join(model_dir, "onnx_config.json")) as file:
+            self.config = json.load(file)
+        self.quantized = quantized
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1 \
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_model_file(model_dir, quantized), options,
+                                            providers=['CPUExecutionProvider'])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config['dimension']
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = True) -> np.ndarray:
+        """
+        Embed texts, returned in input order as a float32 matrix
+        """
+        embeddings = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Longest first, so each batch pads to a similar length
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            embeddings[indices] = self._embed_batch([texts[i] for i in indices])
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            'input_ids': np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            'attention_mask': np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            'token_type_ids': np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(['last_hidden_state'],
+                                  {name: value for name, value in feeds.items() if name in self.input_names})[0]
+
+        if self.config['pooling'] == "cls":
+            return hidden[:, 0]
+        mask = feeds['attention_mask'][:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def load_onnx_encoder(model_name: str, root: str, quantized: bool = True, intra_op_threads: int = 0,
+                      inter_op_threads: int = 1) -> OnnxEncoder:
+    """
+    Load a model's ONNX encoder from `root`, exporting it on first use
+    """
+    model_dir = onnx_model_dir(root, model_name)
+    if not os.path.exists(onnx_model_file(model_dir, quantized)):
+        print(f"📦 Exporting {model_name} to ONNX in {model_dir}...")
+        config = export_onnx_model(model_name, model_dir, quantize=quantized)
+        print(f"✅ Exported (cosine to PyTorch: fp32 {config['fp32_cosine']}"
+              + (f", int8 {config['int8_cosine']}" if quantized else "") + ")")
+    return OnnxEncoder(model_dir, quantized=quantized, intra_op_threads=intra_op_threads,
+                       inter_op_threads=inter_op_threads)
@@ -0,0 +1,332 @@
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import List, Iterable, Iterator, Optional, Tuple
+
+from .pdf_processor import ChunkRecord, PDFProcessor
+
+CHUNKING_STRATEGIES = ("page", "patent")
+
+# Running header of EP publications ("EP 1 577 413 A1") followed by the
+# page number and the 5..55 line-number column of the margin
+_PAGE_HEADER = re.compile(r'\A[ \t]*EP \d(?: \d{3}){2} [AB]\d[ \t]*\n(?:[ \t]*\d{1,3}[ \t]*\n)*')
+
+_ABSTRACT = re.compile(r'^\(57\)[ \t]*$', re.MULTILINE)
+_DESCRIPTION = re.compile(r'^Description[ \t]*$', re.MULTILINE)
+# Claims, followed in B1 specifications by the German and French translations
+_CLAIMS = re.compile(r'^(Claims|Patentansprüche|Revendications)[ \t]*$', re.MULTILINE)
+_REFERENCES = re.compile(r'^REFERENCES CITED IN THE DESCRIPTION[ \t]*$', re.MULTILINE)
+
+_PARAGRAPH = re.compile(r'^\[(\d{4})\]', re.MULTILINE)
+_CLAIM = re.compile(r'^(\d{1,3})\.(?=\s|$)', re.MULTILINE)
+
+_HEADING_WORD = re.compile(r"[A-Za-z][\w'-]*")
+_HEADING_SMALL_WORDS = {'a', 'an', 'and', 'as', 'at', 'by', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+_TABLE_LABEL = re.compile(r'^Table \d+$', re.IGNORECASE)
+
+SECTION_TITLES = {
+    'bibliography': "Bibliography",
+    'abstract': "Abstract",
+    'description': "Description",
+    'examples': "Examples",
+    'claims': "Claims",
+    'references': "References cited"
+}
+
+
+@dataclass
+class _Unit:
+    """
+    A self-contained span of the document stream: a numbered paragraph
+    (with the heading line before it), a claim, or a whole short section
+    """
+    kind: str
+    start: int
+    end: int
+    heading: str = ""
+    number: str = ""
+
+
+def is_heading(line: str) -> bool:
+    """
+    Whether a line looks like a section heading of a patent description
+    ("TECHNICAL FIELD", "Best Mode for Carrying Out the Invention",
+    "(Example 1)", "<Experiment 2>") rather than the tail of a paragraph
+    """
+    line = line.strip()
+    if not line or len(line) > 60 or line[-1] in '.,;:':
+        return False
+    if line[0] in '([<' and line[-1] in ')]>':
+        line = line[1:-1].strip()
+    if not line or _TABLE_LABEL.match(line) or any(char in line for char in ':%=≤≥'):
+        return False
+
+    words = _HEADING_WORD.findall(line)
+    if not words or len(words) > 8 or not line[0].isalpha():
+        return False
+    return all(word[0].isupper() or word.lower() in _HEADING_SMALL_WORDS for word in words) \
+        and words[0][0].isupper()
+
+
+class PatentChunker:
+    """
+    Structure-aware chunker for EP patent publications.
+
+    Page chunking cuts numbered paragraphs and claims in half at page breaks
+    and repeats the running header in every chunk. This chunker strips the
+    header and margin line numbers, joins the pages into one text stream and
+    splits it into sections (bibliography, abstract, description, examples,
+    claims, and the "references cited" list, skipped by default). Chunks are
+    packed from whole units, [0001]-style paragraphs with their heading and
+    individual claims, up to `chunk_size` characters without overlap; only
+    units longer than that are split with the overlapping sentence chunker.
+
+    Each chunk records the page and offset where it starts and the page
+    (`page_end`) and offset where it ends, measured in the extracted page
+    text, so sources can still be highlighted in the PDF viewer. Documents
+    without a recognizable description or claims fall back to
+    overlapping chunks of the joined stream.
+    """
+    name = "patent"
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200, min_chunk_chars: int = 50,
+                 include_references: bool = False):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.min_chunk_chars = min_chunk_chars
+        self.include_references = include_references
+
+    def chunk(self, pages: Iterable[Tuple[int, str]], filename: str,
+              document_hash: str) -> Iterator[ChunkRecord]:
+        """
+        Chunk (0-based page, text) pairs of one document
+        """
+        stream, starts, locations = self._join_pages(pages)
+        if not stream.strip():
+            return
+
+        def record(start: int, end: int, kind: str, title: Optional[str]) -> Optional[ChunkRecord]:
+            # Trim whitespace so the offsets point at the first and last characters of the content
+            end = min(end, len(stream))
+            text = stream[start:end]
+            start += len(text) - len(text.lstrip())
+            end -= len(text) - len(text.rstrip())
+            if end - start < self.min_chunk_chars:
+                return None
+            page, char_start = self._locate(starts, locations, start)
+            page_end, char_end = self._locate(starts, locations, end - 1)
+            return ChunkRecord(document_hash, filename, page, char_start, char_end + 1,
+                               stream[start:end], chunk_type=kind, section_title=title, page_end=page_end)
+
+        units = self._units(stream)
+        if units is None:
+            for start, end in PDFProcessor._iter_spans(stream, self.chunk_size, self.overlap):
+                chunk = record(start, end, "text", None)
+                if chunk is not None:
+                    yield chunk
+            return
+
+        for start, end, kind, title in self._pack(stream, units):
+            chunk = record(start, end, kind, title)
+            if chunk is not None:
+                yield chunk
+
+    @staticmethod
+    def _join_pages(pages: Iterable[Tuple[int, str]]) -> Tuple[str, List[int], List[Tuple[int, int]]]:
+        """
+        Join page bodies with newlines. Returns the stream, the stream offset
+        of each page body and its (1-based page, offset in the page text).
+        """
+        bodies = []
+        starts = []
+        locations = []
+        position = 0
+        for page_num, text in pages:
+            header = _PAGE_HEADER.match(text)
+            skip = header.end() if header else 0
+            body = text[skip:]
+            if not body.strip():
+                continue
+            starts.append(position)
+            locations.append((page_num + 1, skip))
+            bodies.append(body)
+            position += len(body) + 1
+        return "\n".join(bodies), starts, locations
+
+    @staticmethod
+    def _locate(starts: List[int], locations: List[Tuple[int, int]], position: int) -> Tuple[int, int]:
+        """
+        Map a stream offset to (1-based page, offset in the page text)
+        """
+        index = bisect_right(starts, position) - 1
+        page, skip = locations[index]
+        return page, skip + position - starts[index]
+
+    def _units(self, stream: str) -> Optional[List[_Unit]]:
+        """
+        Split the stream into units, or None if it has no patent structure
+        """
+        description = _DESCRIPTION.search(stream)
+        claims = list(_CLAIMS.finditer(stream))
+        if description is None and not claims:
+            return None
+
+        references = _REFERENCES.search(stream)
+        end_of_text = len(stream)
+        if references is not None and not self.include_references:
+            end_of_text = references.start()
+
+        # (kind, heading, start, end) of each section
+        boundaries = []
+        front_end = description.start() if description else claims[0].start()
+        abstract = _ABSTRACT.search(stream, 0, front_end)
+        if abstract is not None:
+            boundaries.append(('bibliography', "", 0, abstract.start()))
+            boundaries.append(('abstract', "", abstract.end(), front_end))
+        else:
+            boundaries.append(('bibliography', "", 0, front_end))
+
+        tail = [match for match in claims if match.start() > front_end or description is None]
+        if description is not None:
+            boundaries.append(('description', "", description.end(),
+                               tail[0].start() if tail else end_of_text))
+        for i, match in enumerate(tail):
+            end = tail[i + 1].start() if i + 1 < len(tail) else end_of_text
+            heading = "" if match.group(1) == "Claims" else match.group(1)
+            boundaries.append(('claims', heading, match.end(), end))
+        if references is not None and self.include_references:
+            boundaries.append(('references', "", references.start(), len(stream)))
+
+        units = []
+        for kind, heading, start, end in boundaries:
+            end = min(end, end_of_text) if kind != 'references' else end
+            if start >= end:
+                continue
+            if kind == 'description':
+                units += self._paragraph_units(stream, start, end)
+            elif kind == 'claims':
+                units += self._claim_units(stream, start, end, heading)
+            else:
+                units.append(_Unit(kind, start, end))
+        return units
+
+    @staticmethod
+    def _paragraph_units(stream: str, start: int, end: int) -> List[_Unit]:
+        """
+        Numbered paragraphs, each starting at its heading line if it has one
+        """
+        markers = list(_PARAGRAPH.finditer(stream, start, end))
+        if not markers:
+            return [_Unit('description', start, end)]
+
+        units = []
+        heading = ""
+        unit_starts = []
+        headings = []
+        for marker in markers:
+            line_start = stream.rfind('\n', start, marker.start() - 1) + 1
+            line = stream[max(line_start, start):marker.start()]
+            if is_heading(line):
+                heading = line.strip()
+                unit_starts.append(max(line_start, start))
+            else:
+                unit_starts.append(marker.start())
+            headings.append(heading)
+
+        # Text before the first paragraph (usually just its heading) joins it
+        unit_starts[0] = start
+        for i, marker in enumerate(markers):
+            unit_end = unit_starts[i + 1] if i + 1 < len(markers) else end
+            kind = 'examples' if re.search(r'example', headings[i], re.IGNORECASE) else 'description'
+            units.append(_Unit(kind, unit_starts[i], unit_end, headings[i], marker.group(1)))
+        return units
+
+    @staticmethod
+    def _claim_units(stream: str, start: int, end: int, heading: str) -> List[_Unit]:
+        """
+        Claims numbered 1., 2., ... in sequence (other numbered lines stay
+        inside their claim)
+        """
+        claim_starts = []
+        numbers = []
+        expected = 1
+        for match in _CLAIM.finditer(stream, start, end):
+            if int(match.group(1)) == expected:
+                claim_starts.append(match.start())
+                numbers.append(match.group(1))
+                expected += 1
+        if not claim_starts:
+            return [_Unit('claims', start, end, heading)]
+
+        claim_starts[0] = start
+        return [
+            _Unit('claims', claim_start, claim_starts[i + 1] if i + 1 < len(claim_starts) else end,
+                  heading, numbers[i])
+            for i, claim_start in enumerate(claim_starts)
+        ]
+
+    def _pack(self, stream: str, units: List[_Unit]) -> Iterator[Tuple[int, int, str, str]]:
+        """
+        Group consecutive units of a section into chunks of up to
+        `chunk_size` characters, yielding (start, end, kind, section title)
+        """
+        group: List[_Unit] = []
+
+        def flush():
+            if group:
+                yield group[0].start, group[-1].end, group[0].kind, self._title(group)
+                group.clear()
+
+        for unit in units:
+            if group:
+                length = group[-1].end - group[0].start
+                if unit.kind != group[0].kind or (unit.kind == 'claims' and unit.heading != group[0].heading):
+                    yield from flush()
+                elif unit.heading != group[-1].heading and length >= self.chunk_size // 2:
+                    # A new heading starts a new chunk unless the current one is still small
+                    yield from flush()
+                elif unit.end - group[0].start > self.chunk_size:
+                    yield from flush()
+
+            if unit.end - unit.start > self.chunk_size:
+                title = self._title([unit])
+                # The last span's end can run past the text it was computed on
+                for start, end in PDFProcessor._iter_spans(stream[unit.start:unit.end], self.chunk_size, self.overlap):
+                    yield unit.start + start, unit.start + min(end, unit.end - unit.start), unit.kind, title
+                continue
+            group.append(unit)
+        yield from flush()
+
+    @staticmethod
+    def _title(units: List[_Unit]) -> str:
+        """
+        "Description: Technical Field [0001]-[0003]", "Claims 1-3", "Abstract"
+        """
+        first, last = units[0], units[-1]
+        if first.kind == 'claims':
+            title = first.heading or SECTION_TITLES['claims']
+            if first.number:
+                numbers = first.number if first.number == last.number else f"{first.number}-{last.number}"
+                title = f"{title} {numbers}"
+            return title
+
+        title = SECTION_TITLES[first.kind]
+        headings = [unit.heading for unit in units if unit.heading]
+        if headings:
+            title = f"{title}: {headings[0]}"
+        if first.number:
+            numbers = f"[{first.number}]" if first.number == last.number else f"[{first.number}]-[{last.number}]"
+            title = f"{title} {numbers}"
+        return title[:100]
+
+
+def create_document_chunker(strategy: str, chunk_size: int = 1000,
+                            overlap: int = 200) -> Optional[PatentChunker]:
+    """
+    Build the document-level chunker for a strategy, or None for per-page chunking
+    """
+    if strategy not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy} (expected one of {CHUNKING_STRATEGIES})")
+    if strategy == "patent":
+        return PatentChunker(chunk_size=chunk_size, overlap=overlap)
+    return None
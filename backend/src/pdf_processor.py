@@ -1,10 +1,24 @@
 import os
-from typing import List, Dict, Any
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Iterable, Sequence
 from dataclasses import dataclass
-import uuid
+import hashlib
 import pypdf
 import re
 
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24.3
+    except ImportError:
+        fitz = None
+
+PDF_BACKENDS = ("pymupdf", "pypdf")
+
 @dataclass
 class ChunkMetadata:
     chunk_id: str
@@ -12,6 +26,12 @@ class ChunkMetadata:
     page_number: int
     chunk_type: str
     section_title: str = ""
+    document_hash: str = ""
+    # char_start is an offset into page_number's text, char_end into page_end's
+    char_start: int = 0
+    char_end: int = 0
+    # Last page of a chunk that crosses a page break (0: same as page_number)
+    page_end: int = 0
     
 @dataclass
 class DocumentChunk:
@@ -19,79 +39,374 @@ class DocumentChunk:
     content: str
     metadata: ChunkMetadata
 
+class ChunkRecord:
+    """
+    Lightweight chunk yielded by the streaming chunkers: document fields,
+    (start, end) offsets into the page text and the stripped content.
+
+    It has the DocumentChunk interface (chunk_id, content, metadata) and
+    doubles as its own metadata, so each chunk is one slotted object instead
+    of two dataclasses. chunk_id is derived on access, and so is
+    section_title unless the chunker supplies one.
+    """
+    __slots__ = ('document_hash', 'source_document', 'page_number', 'char_start', 'char_end', 'content',
+                 'chunk_type', 'page_end', '_section_title')
+    
+    def __init__(self, document_hash: str, source_document: str, page_number: int,
+                 char_start: int, char_end: int, content: str, chunk_type: str = "text",
+                 section_title: Optional[str] = None, page_end: Optional[int] = None):
+        self.document_hash = document_hash
+        self.source_document = source_document
+        self.page_number = page_number
+        self.char_start = char_start
+        self.char_end = char_end
+        self.content = content
+        self.chunk_type = chunk_type
+        self.page_end = page_end or page_number
+        self._section_title = section_title
+    
+    @property
+    def chunk_id(self) -> str:
+        return PDFProcessor.make_chunk_id(self.document_hash, self.page_number, self.char_start)
+    
+    @property
+    def section_title(self) -> str:
+        if self._section_title is not None:
+            return self._section_title
+        # First line of the chunk
+        return self.content.split('\n', 1)[0][:100]
+    
+    @property
+    def metadata(self) -> "ChunkRecord":
+        return self
+    
+    def to_document_chunk(self) -> DocumentChunk:
+        return DocumentChunk(
+            chunk_id=self.chunk_id,
+            content=self.content,
+            metadata=ChunkMetadata(
+                chunk_id=self.chunk_id,
+                source_document=self.source_document,
+                page_number=self.page_number,
+                chunk_type=self.chunk_type,
+                section_title=self.section_title,
+                document_hash=self.document_hash,
+                char_start=self.char_start,
+                char_end=self.char_end,
+                page_end=self.page_end
+            )
+        )
+    
+    def __repr__(self) -> str:
+        return f"ChunkRecord({self.chunk_id!r}, pages {self.page_number}-{self.page_end}, {len(self.content)} chars)"
+
+def _page_count(pdf_path: str, backend: str) -> int:
+    if backend == "pymupdf":
+        with fitz.open(pdf_path) as document:
+            return document.page_count
+    with open(pdf_path, 'rb') as file:
+        return len(pypdf.PdfReader(file).pages)
+
+def _iter_page_texts(pdf_path: str, backend: str, pages: Sequence[int]) -> Iterator[str]:
+    """
+    Extract the text of the given pages (0-based) in order, keeping the document open
+    """
+    if backend == "pymupdf":
+        with fitz.open(pdf_path) as document:
+            for page in pages:
+                yield document[page].get_text()
+    else:
+        with open(pdf_path, 'rb') as file:
+            reader = pypdf.PdfReader(file)
+            for page in pages:
+                yield reader.pages[page].extract_text()
+
+def _extract_pages(pdf_path: str, backend: str, pages: Sequence[int]) -> List[str]:
+    """
+    Worker entry point for parallel extraction of a page range
+    """
+    return list(_iter_page_texts(pdf_path, backend, pages))
+
+class PageTextCache:
+    """
+    SQLite cache of extracted page text keyed by (file hash, backend, page).
+
+    Re-chunking a known PDF (new chunk size, forced re-ingest) skips text
+    extraction entirely. Text is stored zlib-compressed. The connection is
+    opened lazily, so processors holding a cache can be sent to worker
+    processes.
+    """
+
+    def __init__(self, path: str = "data/cache/page_text.sqlite"):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_conn'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_text (
+                    document_hash TEXT NOT NULL,
+                    backend TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    text BLOB NOT NULL,
+                    PRIMARY KEY (document_hash, backend, page)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get_pages(self, document_hash: str, backend: str) -> Dict[int, str]:
+        """
+        All cached pages of a document (0-based page -> text)
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT page, text FROM page_text WHERE document_hash = ? AND backend = ?",
+                (document_hash, backend)
+            ).fetchall()
+        return {page: zlib.decompress(blob).decode('utf-8') for page, blob in rows}
+
+    def put_pages(self, document_hash: str, backend: str, pages: Dict[int, str]):
+        if not pages:
+            return
+        rows = [
+            (document_hash, backend, page, zlib.compress(text.encode('utf-8')))
+            for page, text in pages.items()
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO page_text (document_hash, backend, page, text) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def create_page_text_cache(enabled: bool, path: str) -> Optional[PageTextCache]:
+    """
+    Build the page text cache if enabled, or return None to always extract
+    """
+    return PageTextCache(path) if enabled else None
+
 class PDFProcessor:
-    def __init__(self, chunk_size: int = 1000, overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200, backend: str = "pymupdf",
+                 page_workers: int = 1, parallel_min_pages: int = 32,
+                 page_cache: Optional[PageTextCache] = None, document_chunker=None):
+        """
+        Text is extracted with PyMuPDF (falling back to pypdf when it is not
+        installed or cannot open a file). Documents with at least
+        `parallel_min_pages` uncached pages are split into `page_workers`
+        page ranges extracted in worker processes.
+        
+        Pages are chunked independently unless a `document_chunker` (such as
+        PatentChunker) is given, which chunks the whole document's text.
+        """
+        if backend not in PDF_BACKENDS:
+            raise ValueError(f"Unknown PDF backend: {backend} (expected one of {PDF_BACKENDS})")
+        if backend == "pymupdf" and fitz is None:
+            print("PyMuPDF is not installed, extracting PDF text with pypdf")
+            backend = "pypdf"
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.backend = backend
+        # Extra workers beyond the CPU count only add process start-up cost
+        self.page_workers = max(1, min(page_workers, os.cpu_count() or 1))
+        self.parallel_min_pages = parallel_min_pages
+        self.page_cache = page_cache
+        self.document_chunker = document_chunker
+    
+    @property
+    def chunking(self) -> str:
+        """
+        Name of the chunking strategy, recorded in the manifest
+        """
+        return self.document_chunker.name if self.document_chunker is not None else "page"
+    
+    @staticmethod
+    def compute_file_hash(pdf_path: str) -> str:
+        """
+        Compute the SHA-256 content hash of a file
+        """
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def make_chunk_id(document_hash: str, page_number: int, offset: int) -> str:
+        """
+        Build a deterministic chunk ID from document hash, page and character offset
+        """
+        return f"{document_hash[:16]}-p{page_number}-o{offset}"
     
-    def process_pdf(self, pdf_path: str) -> List[DocumentChunk]:
+    def process_pdf(self, pdf_path: str, document_hash: Optional[str] = None) -> List[ChunkRecord]:
         """
-        Process a PDF file into chunks with metadata using pypdf
+        Process a PDF file into a list of chunks with metadata
         """
         try:
-            filename = os.path.basename(pdf_path)
-            document_chunks = []
-            
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    text = page.extract_text()
-                    
-                    if not text.strip():
-                        continue
-                    
-                    # Simple text chunking with overlap
-                    chunks = self._chunk_text(text, self.chunk_size, self.overlap)
-                    
-                    for i, chunk_text in enumerate(chunks):
-                        if len(chunk_text.strip()) < 50:  # Skip very short chunks
-                            continue
-                            
-                        chunk_id = str(uuid.uuid4())
-                        
-                        # Extract section title from chunk (first line or first sentence)
-                        lines = chunk_text.strip().split('\n')
-                        section_title = lines[0][:100] if lines else ""
-                        
-                        metadata = ChunkMetadata(
-                            chunk_id=chunk_id,
-                            source_document=filename,
-                            page_number=page_num + 1,
-                            chunk_type="text",
-                            section_title=section_title
-                        )
-                        
-                        document_chunk = DocumentChunk(
-                            chunk_id=chunk_id,
-                            content=chunk_text.strip(),
-                            metadata=metadata
-                        )
-                        
-                        document_chunks.append(document_chunk)
-            
-            return document_chunks
+            return list(self.iter_chunks(pdf_path, document_hash))
             
         except Exception as e:
             print(f"Error processing PDF {pdf_path}: {str(e)}")
             return []
     
+    def iter_chunks(self, pdf_path: str, document_hash: Optional[str] = None) -> Iterator[ChunkRecord]:
+        """
+        Yield a PDF's chunks page by page without building the full list
+        """
+        if document_hash is None:
+            document_hash = self.compute_file_hash(pdf_path)
+        
+        return self.chunk_pages(
+            self.iter_page_texts(pdf_path, document_hash), os.path.basename(pdf_path), document_hash
+        )
+    
+    def chunk_pages(self, pages: Iterable[Tuple[int, str]], filename: str,
+                    document_hash: str) -> Iterator[ChunkRecord]:
+        """
+        Chunk (0-based page, text) pairs as they arrive
+        """
+        if self.document_chunker is not None:
+            yield from self.document_chunker.chunk(pages, filename, document_hash)
+            return
+        
+        for page_num, text in pages:
+            if not text.strip():
+                continue
+            
+            # Simple text chunking with overlap
+            for start, end in self._iter_spans(text, self.chunk_size, self.overlap):
+                content = text[start:end].strip()
+                if len(content) < 50:  # Skip very short chunks
+                    continue
+                
+                yield ChunkRecord(document_hash, filename, page_num + 1, start, end, content)
+    
+    def iter_chunk_batches(self, pdf_path: str, document_hash: Optional[str] = None,
+                           batch_size: int = 256) -> Iterator[List[ChunkRecord]]:
+        """
+        Yield a PDF's chunks in lists of at most `batch_size`, for embedding
+        """
+        batch = []
+        for chunk in self.iter_chunks(pdf_path, document_hash):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def iter_page_texts(self, pdf_path: str, document_hash: str) -> Iterator[Tuple[int, str]]:
+        """
+        Yield (0-based page, text) in page order, from the page cache where possible
+        """
+        backend = self.backend
+        try:
+            page_count = _page_count(pdf_path, backend)
+        except Exception as e:
+            if backend == "pypdf":
+                raise
+            print(f"Error opening {pdf_path} with PyMuPDF, falling back to pypdf: {str(e)}")
+            backend = "pypdf"
+            page_count = _page_count(pdf_path, backend)
+        
+        cached = self.page_cache.get_pages(document_hash, backend) if self.page_cache else {}
+        missing = [page for page in range(page_count) if page not in cached]
+        if self.page_cache:
+            self.page_cache.hits += page_count - len(missing)
+            self.page_cache.misses += len(missing)
+        
+        extracted: Dict[int, str] = {}
+        texts = self._extract(pdf_path, backend, missing)
+        try:
+            for page in range(page_count):
+                if page in cached:
+                    yield page, cached[page]
+                else:
+                    text = next(texts)
+                    extracted[page] = text
+                    yield page, text
+        finally:
+            texts.close()
+            if self.page_cache and extracted:
+                self.page_cache.put_pages(document_hash, backend, extracted)
+    
+    def _extract(self, pdf_path: str, backend: str, pages: List[int]) -> Iterator[str]:
+        """
+        Texts of `pages` in order; large page sets are split across worker processes
+        """
+        if self.page_workers == 1 or len(pages) < self.parallel_min_pages:
+            yield from _iter_page_texts(pdf_path, backend, pages)
+            return
+        
+        workers = min(self.page_workers, len(pages))
+        size = -(-len(pages) // workers)
+        ranges = [pages[i:i + size] for i in range(0, len(pages), size)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_pages, pdf_path, backend, page_range) for page_range in ranges]
+            for future in futures:
+                yield from future.result()
+    
     def _chunk_text(self, text: str, chunk_size: int, overlap: int) -> List[str]:
         """
         Split text into overlapping chunks
         """
+        return [text[start:end] for start, end in self._chunk_spans(text, chunk_size, overlap)]
+    
+    def _chunk_spans(self, text: str, chunk_size: int, overlap: int) -> List[Tuple[int, int]]:
+        """
+        Compute (start, end) offsets of overlapping chunks
+        """
+        return list(self._iter_spans(text, chunk_size, overlap))
+    
+    @staticmethod
+    def _iter_spans(text: str, chunk_size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yield (start, end) offsets of overlapping chunks, each ending after the
+        last sentence end or line break in its window
+        """
         if len(text) <= chunk_size:
-            return [text]
+            yield 0, len(text)
+            return
         
-        chunks = []
         start = 0
         
         while start < len(text):
             end = start + chunk_size
             
-            # Try to break at sentence boundary
+            # Try to break at sentence boundary (rfind scans only this window, in C)
             if end < len(text):
-                # Look for sentence endings within the last 100 characters
                 last_period = text.rfind('.', start, end)
                 last_newline = text.rfind('\n', start, end)
                 
@@ -99,16 +414,17 @@ class PDFProcessor:
                 if break_point > start:
                     end = break_point + 1
             
-            chunk = text[start:end]
-            chunks.append(chunk)
+            yield start, end
             
-            # Move start position with overlap
-            start = end - overlap
+            # Move start position with overlap; a chunk shorter than the overlap
+            # (boundary right after its start) would not advance, so continue
+            # from its end instead of looping over the same window
+            previous_start, start = start, end - overlap
+            if start <= previous_start:
+                start = end
             
             if start >= len(text):
                 break
-        
-        return chunks
     
     def extract_material_info(self, chunks: List[DocumentChunk]) -> List[DocumentChunk]:
         """
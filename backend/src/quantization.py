@@ -0,0 +1,230 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+COMPRESSION_MODES = ("none", "int8", "pq")
+
+# Rows scored per block, bounding the float32 temporaries of a full scan
+_SCAN_BLOCK_ROWS = 65536
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization with a per-dimension range.
+
+    Each component is stored as one signed byte: x ~= offset + scale * (code + 128).
+    Inner products with a float query are computed asymmetrically (the query
+    stays float32), so only the database side loses precision. 4x smaller
+    than float32.
+    """
+
+    kind = "int8"
+    code_dtype = np.int8
+
+    def __init__(self):
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    def code_size(self, dim: int) -> int:
+        return dim
+
+    def train(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        self.offset = low
+        self.scale = np.maximum((high - low) / 255.0, 1e-12).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.offset + self.scale * (codes.astype(np.float32) + 128)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products, shape (rows, queries)
+        """
+        scaled = (queries * self.scale).T.astype(np.float32)
+        bias = queries @ self.offset + 128 * (queries @ self.scale)
+        out = np.empty((len(codes), len(queries)), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_BLOCK_ROWS):
+            block = codes[start:start + _SCAN_BLOCK_ROWS].astype(np.float32)
+            out[start:start + len(block)] = block @ scaled + bias
+        return out
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {'offset': self.offset, 'scale': self.scale}
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]):
+        self.offset = arrays['offset']
+        self.scale = arrays['scale']
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `subspaces` equal slices
+    and each slice is replaced by the index of its nearest of 256 k-means
+    centroids, so a vector costs `subspaces` bytes. Queries are scored by
+    asymmetric distance computation: one (subspaces x 256) table of
+    query-slice/centroid inner products, then a table lookup per code.
+    """
+
+    kind = "pq"
+    code_dtype = np.uint8
+
+    def __init__(self, subspaces: int = 48, iterations: int = 12, sample_size: int = 20000,
+                 seed: int = 0):
+        self.subspaces = subspaces
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        # (subspaces, 256, subspace dim)
+        self.centroids: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def code_size(self, dim: int) -> int:
+        return self.subspaces
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        View (n, dim) vectors as (subspaces, n, subspace dim)
+        """
+        n, dim = vectors.shape
+        if dim % self.subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.subspaces} subspaces")
+        return vectors.reshape(n, self.subspaces, dim // self.subspaces).transpose(1, 0, 2)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||p - c||^2 = argmin ||c||^2 - 2 p.c
+        distances = (centroids * centroids).sum(axis=1) - 2.0 * points @ centroids.T
+        return distances.argmin(axis=1)
+
+    def train(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[rng.choice(len(vectors), self.sample_size, replace=False)]
+        n_centroids = min(256, len(vectors))
+
+        centroids = []
+        for points in self._split(vectors):
+            points = np.ascontiguousarray(points)
+            current = points[rng.choice(len(points), n_centroids, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(points, current)
+                sums = np.zeros_like(current)
+                np.add.at(sums, assignment, points)
+                counts = np.bincount(assignment, minlength=n_centroids)
+                filled = counts > 0
+                current[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters from random points
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    current[empty] = points[rng.choice(len(points), len(empty))]
+            if n_centroids < 256:
+                current = np.vstack([current, np.repeat(current[-1:], 256 - n_centroids, axis=0)])
+            centroids.append(current)
+        self.centroids = np.stack(centroids).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), _SCAN_BLOCK_ROWS):
+            block = self._split(vectors[start:start + _SCAN_BLOCK_ROWS])
+            for j, points in enumerate(block):
+                codes[start:start + len(points), j] = self._nearest(points, self.centroids[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[j][codes[:, j]] for j in range(self.subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Approximate inner products via per-query lookup tables, shape (rows, queries)
+        """
+        # (queries, subspaces, 256)
+        tables = np.einsum('qsd,scd->qsc', self._split(queries).transpose(1, 0, 2), self.centroids)
+        out = np.empty((len(codes), len(queries)), dtype=np.float32)
+        subspace_index = np.arange(self.subspaces)
+        for start in range(0, len(codes), _SCAN_BLOCK_ROWS):
+            block = np.asarray(codes[start:start + _SCAN_BLOCK_ROWS])
+            for q, table in enumerate(tables):
+                out[start:start + len(block), q] = table[subspace_index, block].sum(axis=1)
+        return out
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {'centroids': self.centroids}
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]):
+        self.centroids = arrays['centroids']
+        self.subspaces = self.centroids.shape[0]
+
+
+def rescored_search(quantizer, codes: np.ndarray, vectors: np.ndarray, queries: np.ndarray,
+                    k: int, rescore_factor: int,
+                    alive: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Approximate scan over the codes, then exact inner products for the best
+    `k * rescore_factor` candidates of each query. Returns (rows, exact
+    scores) of every query's shortlist; `alive` masks out dead rows.
+    """
+    count = len(codes)
+    approximate = quantizer.scores(codes, queries)
+    if alive is not None and not alive.all():
+        approximate[~alive] = -np.inf
+    shortlist_size = min(count, k * max(rescore_factor, 1))
+
+    results = []
+    for column in range(approximate.shape[1]):
+        column_scores = approximate[:, column]
+        if shortlist_size < count:
+            shortlist = np.argpartition(-column_scores, shortlist_size - 1)[:shortlist_size]
+        else:
+            shortlist = np.arange(count)
+        # Sorted rows read the memory-mapped vectors sequentially
+        shortlist = np.sort(shortlist[np.isfinite(column_scores[shortlist])])
+        results.append((shortlist, np.asarray(vectors[shortlist]) @ queries[column]))
+    return results
+
+
+def create_quantizer(mode: str, pq_subspaces: int = 48):
+    """
+    Build an untrained quantizer for a compression mode, or None for "none"
+    """
+    if mode == "none":
+        return None
+    if mode == "int8":
+        return ScalarQuantizer()
+    if mode == "pq":
+        return ProductQuantizer(subspaces=pq_subspaces)
+    raise ValueError(f"Unknown compression mode: {mode} (expected one of {COMPRESSION_MODES})")
+
+
+def save_quantizer(quantizer, path: str):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, kind=np.array(quantizer.kind), **quantizer.to_arrays())
+    os.replace(tmp_path, path)
+
+
+def load_quantizer(path: str):
+    """
+    Load a trained quantizer saved by `save_quantizer`, or None if absent
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    quantizer = ScalarQuantizer() if str(arrays.pop('kind')) == "int8" else ProductQuantizer()
+    quantizer.load_arrays(arrays)
+    return quantizer
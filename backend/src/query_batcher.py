@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from .embedding_engine import EmbeddingEngine
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent query embeddings into batched `encode` calls.
+
+    Queries that arrive within `window_ms` of the first query in a batch (up to
+    `max_batch_size`) are encoded together in one forward pass on a dedicated
+    worker thread, and each caller's future is resolved with its own vector.
+    """
+
+    def __init__(self, embedding_engine: EmbeddingEngine, window_ms: float = 5.0,
+                 max_batch_size: int = 32, executor: Optional[ThreadPoolExecutor] = None):
+        self.embedding_engine = embedding_engine
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embed")
+        self._owns_executor = executor is None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.batch_sizes: Counter = Counter()
+        self.queries = 0
+        self.batches = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.total_encode_time = 0.0
+        self._recent_delays: deque = deque(maxlen=1024)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a single query, sharing a forward pass with concurrent callers
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._encode_batch(loop, batch)
+
+    async def _encode_batch(self, loop: asyncio.AbstractEventLoop,
+                            batch: List[Tuple[str, asyncio.Future, float]]):
+        started = time.perf_counter()
+        for _, _, enqueued in batch:
+            self._record_delay(started - enqueued)
+        self.batch_sizes[len(batch)] += 1
+        self.batches += 1
+        self.queries += len(batch)
+
+        try:
+            texts = [text for text, _, _ in batch]
+            embeddings = await loop.run_in_executor(
+                self._executor, self.embedding_engine.generate_embeddings, texts, False
+            )
+            if len(embeddings) != len(batch):
+                raise RuntimeError("Query embedding failed")
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.total_encode_time += time.perf_counter() - started
+
+        for (_, future, _), embedding in zip(batch, embeddings):
+            # The caller may have been cancelled while waiting
+            if not future.done():
+                future.set_result(embedding)
+
+    def _record_delay(self, delay: float):
+        self.total_queue_delay += delay
+        self.max_queue_delay = max(self.max_queue_delay, delay)
+        self._recent_delays.append(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        recent = sorted(self._recent_delays)
+
+        def percentile(p: float) -> float:
+            if not recent:
+                return 0.0
+            return recent[min(len(recent) - 1, int(p * len(recent)))] * 1000
+
+        return {
+            'window_ms': self.window * 1000,
+            'max_batch_size': self.max_batch_size,
+            'queries': self.queries,
+            'batches': self.batches,
+            'mean_batch_size': round(self.queries / self.batches, 2) if self.batches else 0.0,
+            'batch_size_distribution': dict(sorted(self.batch_sizes.items())),
+            'queue_delay_ms': {
+                'mean': round(self.total_queue_delay / self.queries * 1000, 3) if self.queries else 0.0,
+                'p50': round(percentile(0.50), 3),
+                'p95': round(percentile(0.95), 3),
+                'max': round(self.max_queue_delay * 1000, 3)
+            },
+            'mean_encode_ms': round(self.total_encode_time / self.batches * 1000, 3) if self.batches else 0.0
+        }
+
+    async def close(self):
+        """
+        Stop the batching worker and release the encode thread
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
@@ -1,100 +1,611 @@
-import anthropic
-from typing import List, Dict, Any
-from dataclasses import dataclass
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, TYPE_CHECKING
+from dataclasses import dataclass, field, replace
+import numpy as np
 from .search_engine import SemanticSearchEngine, SearchResult
+from .concurrency import BoundedExecutor
+from .query_batcher import QueryBatcher
+from .answer_cache import AnswerCache
+from .reranker import CrossEncoderReranker
+from .context_builder import ContextBuilder, format_excerpt, page_label
+from .retrieval_cutoff import AdaptiveCutoff
+from .search_filter import SearchFilter
+from .metrics import LLM_IN_FLIGHT, record_rag_timings
 import os
 
+if TYPE_CHECKING:
+    import anthropic
+
 @dataclass
 class RAGResponse:
     answer: str
     sources: List[Dict[str, Any]]
     confidence: float
     total_chunks_found: int
+    timings: Dict[str, float] = field(default_factory=dict)
+    context: Dict[str, int] = field(default_factory=dict)
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
 
 class RAGEngine:
-    def __init__(self, search_engine: SemanticSearchEngine):
+    def __init__(self, search_engine: SemanticSearchEngine,
+                 anthropic_client: Optional["anthropic.Anthropic"] = None,
+                 async_anthropic_client: Optional["anthropic.AsyncAnthropic"] = None,
+                 search_executor: Optional[BoundedExecutor] = None,
+                 query_batcher: Optional[QueryBatcher] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 reranker: Optional[CrossEncoderReranker] = None,
+                 context_builder: Optional[ContextBuilder] = None,
+                 cutoff: Optional[AdaptiveCutoff] = None,
+                 max_results: int = 10,
+                 max_concurrent_llm_calls: int = 32,
+                 llm_model: str = "claude-3-5-sonnet-20241022"):
         self.search_engine = search_engine
+        self.llm_model = llm_model
         
-        # Initialize Anthropic client
-        api_key = os.getenv('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY environment variable is required")
+        # Initialize Anthropic clients
+        if anthropic_client is None or async_anthropic_client is None:
+            api_key = os.getenv('ANTHROPIC_API_KEY')
+            if not api_key:
+                raise ValueError("ANTHROPIC_API_KEY environment variable is required")
+            # Imported here so that importing the API does not load the SDK
+            import anthropic
+            anthropic_client = anthropic_client or anthropic.Anthropic(api_key=api_key)
+            async_anthropic_client = async_anthropic_client or anthropic.AsyncAnthropic(api_key=api_key)
         
-        self.anthropic_client = anthropic.Anthropic(api_key=api_key)
+        self.anthropic_client = anthropic_client
+        self.async_anthropic_client = async_anthropic_client
+        
+        # Blocking retrieval (embedding + Chroma query) runs in its own bounded pool
+        self.search_executor = search_executor or BoundedExecutor("rag-search", max_workers=4)
+        # Query embeddings on the async paths are coalesced by the batcher when given
+        self.query_batcher = query_batcher
+        self.answer_cache = answer_cache
+        # With a reranker, retrieval over-fetches candidates and the reranker keeps the best few
+        self.reranker = reranker
+        # At most max_results chunks (per request, or this default) reach the prompt;
+        # the adaptive cutoff may keep fewer
+        self.max_results = max_results
+        self.cutoff = cutoff
+        # Without a context builder every chunk becomes its own excerpt
+        self.context_builder = context_builder
+        self.max_concurrent_llm_calls = max_concurrent_llm_calls
+        self._llm_semaphore: Optional[asyncio.Semaphore] = None
     
-    def generate_answer(self, query: str, threshold: float = 0.7) -> RAGResponse:
+    def generate_answer(self, query: str, threshold: float = 0.7,
+                        query_embedding: Optional[np.ndarray] = None,
+                        max_results: Optional[int] = None,
+                        search_filter: Optional[SearchFilter] = None) -> RAGResponse:
         """
         Generate an answer using RAG with Claude Sonnet
         """
         try:
-            # 1. Retrieve relevant chunks
-            relevant_chunks = self.search_engine.search(
-                query=query,
-                threshold=threshold,
-                max_results=10
-            )
+            started = time.perf_counter()
+            timings: Dict[str, float] = {}
+            max_results = max_results or self.max_results
             
-            if not relevant_chunks:
-                return RAGResponse(
-                    answer="I couldn't find any relevant information in the documents to answer your question.",
-                    sources=[],
-                    confidence=0.0,
-                    total_chunks_found=0
+            cached, corpus_version = self._lookup_cached_answer(query, threshold, max_results, search_filter, started)
+            if cached is not None:
+                return cached
+            
+            # 1. Retrieve relevant chunks (the retrieval cache skips embedding entirely)
+            retrieval_size = self.retrieval_size(max_results)
+            relevant_chunks = self.search_engine.get_cached(query, threshold, retrieval_size, search_filter)
+            if relevant_chunks is None:
+                if query_embedding is None:
+                    stage_started = time.perf_counter()
+                    query_embedding = self.search_engine.embedding_engine.generate_single_embedding(query)
+                    timings['embed_ms'] = _elapsed_ms(stage_started)
+                
+                stage_started = time.perf_counter()
+                relevant_chunks = self.search_engine.search(
+                    query=query,
+                    threshold=threshold,
+                    max_results=retrieval_size,
+                    query_embedding=query_embedding,
+                    check_cache=False,
+                    search_filter=search_filter
                 )
+                timings['search_ms'] = _elapsed_ms(stage_started)
             
-            # 2. Format context for Claude Sonnet
-            context = self.format_context_for_llm(relevant_chunks)
+            relevant_chunks = self._select(self._rerank(query, relevant_chunks, timings), max_results)
             
-            # 3. Build prompt
-            prompt = self.build_rag_prompt(query, context)
+            if not relevant_chunks:
+                return self._no_results_response(timings)
             
-            # 4. Generate answer using Claude Sonnet
-            response = self.anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1000,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
+            cached = self._lookup_semantic_answer(
+                query_embedding, relevant_chunks, threshold, corpus_version, started
             )
+            if cached is not None:
+                return cached
+            
+            # 2. Pack context and build the prompt for Claude Sonnet
+            prompt, context_stats, context_chunks = self._build_prompt(query, relevant_chunks, timings)
+            
+            # 4. Generate answer using Claude Sonnet
+            stage_started = time.perf_counter()
+            with LLM_IN_FLIGHT.track_in_progress():
+                response = self.anthropic_client.messages.create(
+                    model=self.llm_model,
+                    max_tokens=1000,
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }]
+                )
+            timings['llm_ms'] = _elapsed_ms(stage_started)
             
             # 5. Format response
             answer = response.content[0].text if response.content else "No response generated"
+            timings['total_ms'] = _elapsed_ms(started)
+            rag_response = self._build_response(answer, relevant_chunks, timings, context_stats, context_chunks)
+            self._store_answer(query, threshold, max_results, search_filter, corpus_version, rag_response,
+                               query_embedding, relevant_chunks)
+            return rag_response
             
-            # Calculate average confidence from similarity scores
-            confidence = sum(chunk.similarity for chunk in relevant_chunks) / len(relevant_chunks)
-            
-            # Format sources
-            sources = [
-                {
-                    "chunk_id": chunk.chunk_id,
-                    "content": chunk.content[:500] + "..." if len(chunk.content) > 500 else chunk.content,
-                    "similarity": int(round(chunk.similarity * 100)),  # Convert to percentage (whole number)
-                    "metadata": {
-                        "document": chunk.metadata.get('source_document', ''),
-                        "page": chunk.metadata.get('page_number', 1),
-                        "section": chunk.metadata.get('section_title', ''),
-                        "type": chunk.metadata.get('chunk_type', '')
-                    }
-                }
-                for chunk in relevant_chunks
-            ]
-            
-            return RAGResponse(
-                answer=answer,
-                sources=sources,
-                confidence=round(confidence, 2),
-                total_chunks_found=len(relevant_chunks)
+        except Exception as e:
+            print(f"Error generating RAG answer: {str(e)}")
+            return self._error_response(e)
+    
+    async def generate_answer_async(self, query: str, threshold: float = 0.7,
+                                    query_embedding: Optional[np.ndarray] = None,
+                                    max_results: Optional[int] = None,
+                                    search_filter: Optional[SearchFilter] = None) -> RAGResponse:
+        """
+        Generate an answer without blocking the event loop: retrieval runs in the
+        bounded search executor and Claude is called through AsyncAnthropic
+        """
+        try:
+            started = time.perf_counter()
+            timings: Dict[str, float] = {}
+            max_results = max_results or self.max_results
+            
+            cached, corpus_version = self._lookup_cached_answer(query, threshold, max_results, search_filter, started)
+            if cached is not None:
+                return cached
+            
+            # 1. Retrieve relevant chunks
+            relevant_chunks, query_embedding = await self._retrieve_async(
+                query, threshold, max_results, search_filter, query_embedding, timings
+            )
+            
+            return await self._answer_async(
+                query, threshold, max_results, search_filter, relevant_chunks, query_embedding,
+                corpus_version, started, timings
             )
             
         except Exception as e:
             print(f"Error generating RAG answer: {str(e)}")
-            return RAGResponse(
-                answer=f"Error generating answer: {str(e)}",
-                sources=[],
-                confidence=0.0,
-                total_chunks_found=0
+            return self._error_response(e)
+    
+    async def generate_answers_async(self, queries: List[str], threshold: float = 0.7,
+                                     max_results: Optional[int] = None,
+                                     search_filter: Optional[SearchFilter] = None) -> List[RAGResponse]:
+        """
+        Answer several queries at once: retrieval for every query missing from
+        the caches is one embedding pass and one vector store call, then the
+        answers are generated concurrently (bounded by the LLM concurrency
+        limit). Responses are returned in query order.
+        """
+        # Identical queries in one batch are answered once
+        keys = [AnswerCache.normalize_query(query) for query in queries]
+        distinct = dict(zip(reversed(keys), reversed(queries)))
+        if len(distinct) < len(queries):
+            answers = await self.generate_answers_async(list(distinct.values()), threshold, max_results,
+                                                        search_filter)
+            by_key = dict(zip(distinct, answers))
+            return [by_key[key] for key in keys]
+        
+        started = time.perf_counter()
+        max_results = max_results or self.max_results
+        retrieval_size = self.retrieval_size(max_results)
+        responses: List[Optional[RAGResponse]] = [None] * len(queries)
+        corpus_versions: List[Optional[str]] = [None] * len(queries)
+        for i, query in enumerate(queries):
+            responses[i], corpus_versions[i] = self._lookup_cached_answer(query, threshold, max_results, search_filter, started)
+        
+        pending = [i for i, response in enumerate(responses) if response is None]
+        # Retrieval cache hits skip embedding, as in generate_answer_async
+        results = [self.search_engine.get_cached(queries[i], threshold, retrieval_size, search_filter)
+                   for i in pending]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(pending)
+        misses = [position for position, chunks in enumerate(results) if chunks is None]
+        retrieval_timings: Dict[str, float] = {}
+        try:
+            if misses:
+                texts = [queries[pending[position]] for position in misses]
+                stage_started = time.perf_counter()
+                encoded = await self.search_executor.run(
+                    self.search_engine.embedding_engine.generate_embeddings, texts, False
+                )
+                retrieval_timings['embed_ms'] = _elapsed_ms(stage_started)
+                
+                stage_started = time.perf_counter()
+                retrieved = await self.search_executor.run(
+                    self.search_engine.search_many,
+                    texts,
+                    threshold=threshold,
+                    max_results=retrieval_size,
+                    query_embeddings=encoded if encoded.size else None,
+                    check_cache=False,
+                    search_filter=search_filter
+                )
+                retrieval_timings['search_ms'] = _elapsed_ms(stage_started)
+                for k, position in enumerate(misses):
+                    results[position] = retrieved[k]
+                    embeddings[position] = encoded[k] if encoded.size else None
+        except Exception as e:
+            print(f"Error in batch retrieval: {str(e)}")
+            for i in pending:
+                responses[i] = self._error_response(e)
+            return responses
+        
+        async def answer(position: int, i: int) -> RAGResponse:
+            try:
+                timings = dict(retrieval_timings) if embeddings[position] is not None else {}
+                relevant_chunks = results[position]
+                if self.reranker is not None and relevant_chunks:
+                    relevant_chunks = await self.search_executor.run(
+                        self._rerank, queries[i], relevant_chunks, timings
+                    )
+                return await self._answer_async(
+                    queries[i], threshold, max_results, search_filter,
+                    self._select(relevant_chunks, max_results),
+                    embeddings[position], corpus_versions[i], started, timings
+                )
+            except Exception as e:
+                print(f"Error generating RAG answer: {str(e)}")
+                return self._error_response(e)
+        
+        answers = await asyncio.gather(*(answer(position, i) for position, i in enumerate(pending)))
+        for i, response in zip(pending, answers):
+            responses[i] = response
+        return responses
+    
+    async def _answer_async(self, query: str, threshold: float, max_results: int,
+                            search_filter: Optional[SearchFilter],
+                            relevant_chunks: List[SearchResult],
+                            query_embedding: Optional[np.ndarray], corpus_version: Optional[str],
+                            started: float, timings: Dict[str, float]) -> RAGResponse:
+        """
+        Generate the answer for retrieved chunks, unless a near-duplicate
+        query's answer is cached
+        """
+        if not relevant_chunks:
+            return self._no_results_response(timings)
+        
+        cached = self._lookup_semantic_answer(
+            query_embedding, relevant_chunks, threshold, corpus_version, started
+        )
+        if cached is not None:
+            return cached
+        
+        # 2. Pack context and build prompt
+        prompt, context_stats, context_chunks = self._build_prompt(query, relevant_chunks, timings)
+        
+        # 3. Generate answer using Claude Sonnet, bounded by the LLM concurrency limit
+        stage_started = time.perf_counter()
+        async with self._llm_slot():
+            with LLM_IN_FLIGHT.track_in_progress():
+                response = await self.async_anthropic_client.messages.create(
+                    model=self.llm_model,
+                    max_tokens=1000,
+                    messages=[{
+                        "role": "user",
+                        "content": prompt
+                    }]
+                )
+        timings['llm_ms'] = _elapsed_ms(stage_started)
+        
+        # 4. Format response
+        answer = response.content[0].text if response.content else "No response generated"
+        timings['total_ms'] = _elapsed_ms(started)
+        rag_response = self._build_response(answer, relevant_chunks, timings, context_stats, context_chunks)
+        self._store_answer(query, threshold, max_results, search_filter, corpus_version, rag_response,
+                           query_embedding, relevant_chunks)
+        return rag_response
+    
+    async def stream_answer(self, query: str, threshold: float = 0.7,
+                            query_embedding: Optional[np.ndarray] = None,
+                            max_results: Optional[int] = None,
+                            search_filter: Optional[SearchFilter] = None
+                            ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Stream a RAG answer as (event, data) pairs: the retrieved `sources` first,
+        then one `token` event per text delta from Claude, then a final `done`
+        event with confidence and timings (or an `error` event)
+        """
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        max_results = max_results or self.max_results
+        try:
+            cached, corpus_version = self._lookup_cached_answer(query, threshold, max_results, search_filter, started)
+            if cached is None:
+                relevant_chunks, query_embedding = await self._retrieve_async(
+                    query, threshold, max_results, search_filter, query_embedding, timings
+                )
+                if relevant_chunks:
+                    cached = self._lookup_semantic_answer(
+                        query_embedding, relevant_chunks, threshold, corpus_version, started
+                    )
+            
+            if cached is not None:
+                # Replay a cached answer as a single token
+                yield "sources", {
+                    "sources": cached.sources,
+                    "total_chunks_found": cached.total_chunks_found
+                }
+                yield "token", {"text": cached.answer}
+                yield "done", {"confidence": cached.confidence, "timings": cached.timings, "context": cached.context}
+                return
+            
+            if not relevant_chunks:
+                yield "sources", {"sources": [], "total_chunks_found": 0}
+                no_results = self._no_results_response(timings)
+                yield "token", {"text": no_results.answer}
+                timings['total_ms'] = _elapsed_ms(started)
+                yield "done", {"confidence": 0.0, "timings": timings}
+                return
+            
+            # Packed before the sources are sent, so they list only what Claude sees
+            prompt, context_stats, context_chunks = self._build_prompt(query, relevant_chunks, timings)
+            yield "sources", {
+                "sources": self.format_sources(context_chunks),
+                "total_chunks_found": len(relevant_chunks)
+            }
+            
+            stage_started = time.perf_counter()
+            answer_parts = []
+            async with self._llm_slot():
+                with LLM_IN_FLIGHT.track_in_progress():
+                    async with self.async_anthropic_client.messages.stream(
+                        model=self.llm_model,
+                        max_tokens=1000,
+                        messages=[{
+                            "role": "user",
+                            "content": prompt
+                        }]
+                    ) as stream:
+                        async for text in stream.text_stream:
+                            if 'first_token_ms' not in timings:
+                                timings['first_token_ms'] = _elapsed_ms(started)
+                            answer_parts.append(text)
+                            yield "token", {"text": text}
+            timings['llm_ms'] = _elapsed_ms(stage_started)
+            timings['total_ms'] = _elapsed_ms(started)
+            
+            rag_response = self._build_response("".join(answer_parts), relevant_chunks, timings, context_stats,
+                                                context_chunks)
+            self._store_answer(query, threshold, max_results, search_filter, corpus_version, rag_response,
+                               query_embedding, relevant_chunks)
+            yield "done", {"confidence": float(rag_response.confidence), "timings": timings, "context": context_stats}
+            
+        except Exception as e:
+            print(f"Error streaming RAG answer: {str(e)}")
+            record_rag_timings(None, "error")
+            yield "error", {"message": f"Error generating answer: {str(e)}"}
+    
+    async def _retrieve_async(self, query: str, threshold: float, max_results: int,
+                              search_filter: Optional[SearchFilter],
+                              query_embedding: Optional[np.ndarray],
+                              timings: Dict[str, float]) -> Tuple[List[SearchResult], Optional[np.ndarray]]:
+        """
+        Embed the query (through the batcher if configured) and retrieve chunks
+        in the search executor, recording stage timings. On a retrieval cache
+        hit no embedding is computed and None is returned in its place.
+        Candidates are reranked in the same executor when a reranker is set,
+        then trimmed to max_results and the adaptive cutoff.
+        """
+        retrieval_size = self.retrieval_size(max_results)
+        relevant_chunks = self.search_engine.get_cached(query, threshold, retrieval_size, search_filter)
+        if relevant_chunks is None:
+            relevant_chunks, query_embedding = await self._search_async(
+                query, threshold, retrieval_size, search_filter, query_embedding, timings
             )
+        
+        if self.reranker is not None and relevant_chunks:
+            relevant_chunks = await self.search_executor.run(self._rerank, query, relevant_chunks, timings)
+        return self._select(relevant_chunks, max_results), query_embedding
+    
+    async def _search_async(self, query: str, threshold: float, retrieval_size: int,
+                            search_filter: Optional[SearchFilter],
+                            query_embedding: Optional[np.ndarray],
+                            timings: Dict[str, float]) -> Tuple[List[SearchResult], Optional[np.ndarray]]:
+        """
+        Embed and search after a retrieval cache miss
+        """
+        if query_embedding is None:
+            stage_started = time.perf_counter()
+            if self.query_batcher is not None:
+                query_embedding = await self.query_batcher.embed(query)
+            else:
+                query_embedding = await self.search_executor.run(
+                    self.search_engine.embedding_engine.generate_single_embedding, query
+                )
+            timings['embed_ms'] = _elapsed_ms(stage_started)
+        
+        stage_started = time.perf_counter()
+        relevant_chunks = await self.search_executor.run(
+            self.search_engine.search,
+            query=query,
+            threshold=threshold,
+            max_results=retrieval_size,
+            query_embedding=query_embedding,
+            check_cache=False,
+            search_filter=search_filter
+        )
+        timings['search_ms'] = _elapsed_ms(stage_started)
+        return relevant_chunks, query_embedding
+    
+    def retrieval_size(self, max_results: int) -> int:
+        """
+        Chunks to retrieve for max_results: the reranker's candidate pool if it is larger
+        """
+        if self.reranker is not None:
+            return max(self.reranker.candidates, max_results)
+        return max_results
+    
+    def _select(self, relevant_chunks: List[SearchResult], max_results: int) -> List[SearchResult]:
+        """
+        The chunks that go to the LLM: at most max_results, fewer if the
+        adaptive cutoff finds the scores falling off earlier
+        """
+        relevant_chunks = relevant_chunks[:max_results]
+        if self.cutoff is not None and relevant_chunks:
+            relevant_chunks = self.cutoff.apply(relevant_chunks)
+        return relevant_chunks
+    
+    def _rerank(self, query: str, relevant_chunks: List[SearchResult],
+                timings: Dict[str, float]) -> List[SearchResult]:
+        """
+        Keep the reranker's top chunks (a no-op without a reranker)
+        """
+        if self.reranker is None or not relevant_chunks:
+            return relevant_chunks
+        
+        stage_started = time.perf_counter()
+        relevant_chunks = self.reranker.rerank(query, relevant_chunks)
+        timings['rerank_ms'] = _elapsed_ms(stage_started)
+        return relevant_chunks
+    
+    def _build_prompt(self, query: str, relevant_chunks: List[SearchResult],
+                      timings: Dict[str, float]) -> Tuple[str, Dict[str, int], List[SearchResult]]:
+        """
+        Pack the chunks into the context (token-budgeted when a context builder
+        is set) and build the prompt; returns the prompt, packing stats and
+        the chunks that made it into the context
+        """
+        stage_started = time.perf_counter()
+        if self.context_builder is not None:
+            packed = self.context_builder.build(relevant_chunks)
+            context, context_stats = packed.text, packed.stats
+            packed_ids = set(packed.chunk_ids)
+            context_chunks = [chunk for chunk in relevant_chunks if chunk.chunk_id in packed_ids]
+        else:
+            context, context_stats = self.format_context_for_llm(relevant_chunks), {}
+            context_chunks = relevant_chunks
+        prompt = self.build_rag_prompt(query, context)
+        timings['context_ms'] = _elapsed_ms(stage_started)
+        return prompt, context_stats, context_chunks
+    
+    def _lookup_cached_answer(self, query: str, threshold: float, max_results: int,
+                              search_filter: Optional[SearchFilter],
+                              started: float) -> Tuple[Optional[RAGResponse], Optional[str]]:
+        """
+        Exact-match answer cache lookup; also returns the corpus version for later steps
+        """
+        if self.answer_cache is None:
+            return None, None
+        
+        corpus_version = self.search_engine.vector_store.get_corpus_version()
+        cached = self.answer_cache.lookup_exact(query, threshold, corpus_version, max_results, search_filter)
+        if cached is not None:
+            cached = replace(cached, timings={'total_ms': _elapsed_ms(started)})
+            record_rag_timings(cached.timings, "cached")
+        return cached, corpus_version
+    
+    def _lookup_semantic_answer(self, query_embedding: Optional[np.ndarray],
+                                relevant_chunks: List[SearchResult],
+                                threshold: float, corpus_version: Optional[str],
+                                started: float) -> Optional[RAGResponse]:
+        """
+        Near-duplicate answer cache lookup, once retrieval has produced the chunk set
+        """
+        if self.answer_cache is None or query_embedding is None:
+            return None
+        
+        cached = self.answer_cache.lookup_semantic(
+            query_embedding, [chunk.chunk_id for chunk in relevant_chunks], threshold, corpus_version
+        )
+        if cached is not None:
+            cached = replace(cached, timings={'total_ms': _elapsed_ms(started)})
+            record_rag_timings(cached.timings, "cached")
+        return cached
+    
+    def _store_answer(self, query: str, threshold: float, max_results: int,
+                      search_filter: Optional[SearchFilter], corpus_version: Optional[str],
+                      response: RAGResponse,
+                      query_embedding: Optional[np.ndarray], relevant_chunks: List[SearchResult]):
+        if self.answer_cache is None:
+            return
+        
+        self.answer_cache.store(
+            query, threshold, corpus_version, response,
+            query_embedding=query_embedding,
+            chunk_ids=[chunk.chunk_id for chunk in relevant_chunks],
+            max_results=max_results,
+            search_filter=search_filter
+        )
+    
+    def _llm_slot(self) -> asyncio.Semaphore:
+        """
+        Semaphore bounding concurrent LLM calls (created on the running loop)
+        """
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+        return self._llm_semaphore
+    
+    def _build_response(self, answer: str, relevant_chunks: List[SearchResult],
+                        timings: Optional[Dict[str, float]] = None,
+                        context_stats: Optional[Dict[str, int]] = None,
+                        context_chunks: Optional[List[SearchResult]] = None) -> RAGResponse:
+        """
+        Assemble the RAG response from the generated answer and retrieved chunks;
+        the sources are the chunks that were in the context (all of them by default)
+        """
+        # Calculate average confidence from similarity scores
+        confidence = sum(chunk.similarity for chunk in relevant_chunks) / len(relevant_chunks)
+        record_rag_timings(timings, "generated")
+        
+        return RAGResponse(
+            answer=answer,
+            sources=self.format_sources(relevant_chunks if context_chunks is None else context_chunks),
+            confidence=round(confidence, 2),
+            total_chunks_found=len(relevant_chunks),
+            timings=timings or {},
+            context=context_stats or {}
+        )
+    
+    def format_sources(self, relevant_chunks: List[SearchResult]) -> List[Dict[str, Any]]:
+        """
+        Format retrieved chunks as response sources
+        """
+        return [
+            {
+                "chunk_id": chunk.chunk_id,
+                "content": chunk.content[:500] + "..." if len(chunk.content) > 500 else chunk.content,
+                "similarity": int(round(chunk.similarity * 100)),  # Convert to percentage (whole number)
+                "metadata": {
+                    "document": chunk.metadata.get('source_document', ''),
+                    "page": chunk.metadata.get('page_number', 1),
+                    "page_end": chunk.metadata.get('page_end') or chunk.metadata.get('page_number', 1),
+                    "section": chunk.metadata.get('section_title', ''),
+                    "type": chunk.metadata.get('chunk_type', '')
+                }
+            }
+            for chunk in relevant_chunks
+        ]
+    
+    def _no_results_response(self, timings: Optional[Dict[str, float]] = None) -> RAGResponse:
+        record_rag_timings(timings, "no_results")
+        return RAGResponse(
+            answer="I couldn't find any relevant information in the documents to answer your question.",
+            sources=[],
+            confidence=0.0,
+            total_chunks_found=0,
+            timings=timings or {}
+        )
+    
+    def _error_response(self, error: Exception) -> RAGResponse:
+        record_rag_timings(None, "error")
+        return RAGResponse(
+            answer=f"Error generating answer: {str(error)}",
+            sources=[],
+            confidence=0.0,
+            total_chunks_found=0
+        )
     
     def format_context_for_llm(self, chunks: List[SearchResult]) -> str:
         """
@@ -103,21 +614,15 @@ class RAGEngine:
         context_parts = []
         
         for i, chunk in enumerate(chunks, 1):
-            similarity_pct = round(chunk.similarity * 100, 1)
             metadata = chunk.metadata
-            
-            context_part = f"""
-EXCERPT {i} (Relevance: {similarity_pct}%)
-Document: {metadata.get('source_document', 'Unknown')}
-Page: {metadata.get('page_number', 'Unknown')}
-Section: {metadata.get('section_title', 'N/A')}
-
-Content:
-"{chunk.content}"
-
----
-"""
-            context_parts.append(context_part)
+            context_parts.append(format_excerpt(
+                i,
+                chunk.similarity,
+                metadata.get('source_document', 'Unknown'),
+                page_label(metadata),
+                metadata.get('section_title', 'N/A'),
+                chunk.content
+            ))
         
         return "\n".join(context_parts)
     
@@ -151,7 +656,7 @@ IMPORTANT: Your answer will be displayed alongside the source excerpts, so users
         """
         try:
             response = self.anthropic_client.messages.create(
-                model="claude-3-5-sonnet-20241022",
+                model=self.llm_model,
                 max_tokens=10,
                 messages=[{
                     "role": "user",
@@ -0,0 +1,126 @@
+import time
+from dataclasses import replace
+from typing import List, Dict, Any, Optional
+
+from .embedding_cache import EmbeddingCache
+from .lru_cache import LRUCache
+from .search_engine import SearchResult
+
+
+class CrossEncoderReranker:
+    """
+    Re-orders retrieved chunks with a small local cross-encoder.
+
+    The RAG engine over-fetches `candidates` chunks by cosine similarity; the
+    cross-encoder scores (query, chunk) pairs in CPU batches and only the best
+    `top_k` reach the prompt. Scores are cached per (query, chunk ID). If
+    scoring runs past `latency_budget_ms`, the remaining batches are skipped
+    and the original cosine order is used for this request.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 candidates: int = 30, top_k: int = 5, batch_size: int = 16,
+                 latency_budget_ms: float = 250.0, score_cache: Optional[LRUCache] = None,
+                 max_length: int = 512):
+        self.model_name = model_name
+        self.candidates = candidates
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.score_cache = score_cache if score_cache is not None else LRUCache(50_000)
+        # Imported here so that importing the API does not load PyTorch
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device='cpu', max_length=max_length)
+
+        # Metrics
+        self.requests = 0
+        self.fallbacks = 0
+        self.pairs_scored = 0
+        self.total_time = 0.0
+
+    def warm_up(self):
+        """
+        Score a dummy pair so the first request does not pay for lazy initialization
+        """
+        self.model.predict([("warm-up query", "warm-up passage")], show_progress_bar=False)
+
+    def rerank(self, query: str, results: List[SearchResult]) -> List[SearchResult]:
+        """
+        Return the top_k results by cross-encoder score, or the top_k in
+        cosine order if the latency budget runs out
+        """
+        if not results:
+            return results
+
+        started = time.perf_counter()
+        self.requests += 1
+        normalized_query = EmbeddingCache.normalize(query)
+
+        scores: Dict[str, float] = {}
+        missing = []
+        for result in results:
+            cached = self.score_cache.get((normalized_query, result.chunk_id))
+            if cached is None:
+                missing.append(result)
+            else:
+                scores[result.chunk_id] = cached
+
+        try:
+            for start in range(0, len(missing), self.batch_size):
+                if time.perf_counter() - started > self.latency_budget:
+                    self.fallbacks += 1
+                    return results[:self.top_k]
+
+                batch = missing[start:start + self.batch_size]
+                batch_scores = self.model.predict(
+                    [(query, result.content) for result in batch],
+                    batch_size=self.batch_size,
+                    show_progress_bar=False
+                )
+                self.pairs_scored += len(batch)
+                for result, score in zip(batch, batch_scores):
+                    scores[result.chunk_id] = float(score)
+                    self.score_cache.put((normalized_query, result.chunk_id), float(score))
+        except Exception as e:
+            print(f"Error reranking, keeping cosine order: {str(e)}")
+            self.fallbacks += 1
+            return results[:self.top_k]
+        finally:
+            self.total_time += time.perf_counter() - started
+
+        reranked = sorted(results, key=lambda result: scores[result.chunk_id], reverse=True)
+        return [replace(result, rerank_score=scores[result.chunk_id]) for result in reranked[:self.top_k]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'model': self.model_name,
+            'candidates': self.candidates,
+            'top_k': self.top_k,
+            'latency_budget_ms': self.latency_budget * 1000,
+            'requests': self.requests,
+            'fallbacks': self.fallbacks,
+            'pairs_scored': self.pairs_scored,
+            'mean_rerank_ms': round(self.total_time / self.requests * 1000, 3) if self.requests else 0.0,
+            'score_cache': self.score_cache.stats()
+        }
+
+
+def create_reranker(enabled: bool, model_name: str, candidates: int, top_k: int, batch_size: int,
+                    latency_budget_ms: float, cache_max_entries: int) -> Optional[CrossEncoderReranker]:
+    """
+    Build the cross-encoder reranker if enabled, or return None to use cosine order
+    """
+    if not enabled:
+        return None
+    try:
+        return CrossEncoderReranker(
+            model_name,
+            candidates=candidates,
+            top_k=top_k,
+            batch_size=batch_size,
+            latency_budget_ms=latency_budget_ms,
+            score_cache=LRUCache(cache_max_entries)
+        )
+    except Exception as e:
+        print(f"Error loading reranker {model_name}, using cosine order: {str(e)}")
+        return None
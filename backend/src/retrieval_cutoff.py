@@ -0,0 +1,113 @@
+from typing import Any, Dict, List, Optional
+
+from .search_engine import SearchResult
+from .context_builder import estimate_tokens
+
+CUTOFF_MODES = ("none", "elbow", "budget")
+
+
+def ranking_score(result: SearchResult) -> float:
+    """
+    The score a result was ranked by: cross-encoder score if reranked,
+    fusion score in hybrid mode, cosine similarity otherwise
+    """
+    if result.rerank_score is not None:
+        return result.rerank_score
+    if result.fusion_score:
+        return result.fusion_score
+    return result.similarity
+
+
+class AdaptiveCutoff:
+    """
+    Trims a ranked result list to the chunks worth sending to the LLM.
+
+    "elbow" cuts at the largest drop between consecutive scores, if that
+    drop is at least `elbow_gap` of the list's score range; a narrow query
+    with three strong matches and a tail of weak ones keeps the three.
+    "budget" keeps results until they hold `score_mass` of the list's total
+    (min-max normalized) score, and in either mode results stop once their
+    estimated tokens exceed `token_budget` (0 disables it). At least
+    `min_results` are always kept.
+    """
+
+    def __init__(self, mode: str = "elbow", min_results: int = 3, elbow_gap: float = 0.25,
+                 score_mass: float = 0.9, token_budget: int = 0):
+        if mode not in CUTOFF_MODES:
+            raise ValueError(f"Unknown cutoff mode: {mode} (expected one of {CUTOFF_MODES})")
+        self.mode = mode
+        self.min_results = max(1, min_results)
+        self.elbow_gap = elbow_gap
+        self.score_mass = score_mass
+        self.token_budget = token_budget
+        self.requests = 0
+        self.results_in = 0
+        self.results_out = 0
+
+    def apply(self, results: List[SearchResult]) -> List[SearchResult]:
+        """
+        The leading results to keep, in their original order
+        """
+        keep = len(results)
+        if keep > self.min_results:
+            scores = [ranking_score(result) for result in results]
+            if self.mode == "elbow":
+                keep = self._elbow(scores)
+            elif self.mode == "budget":
+                keep = self._score_budget(scores)
+            if self.token_budget > 0:
+                keep = min(keep, self._token_budget(results))
+
+        self.requests += 1
+        self.results_in += len(results)
+        self.results_out += keep
+        return results[:keep]
+
+    def _elbow(self, scores: List[float]) -> int:
+        score_range = scores[0] - min(scores)
+        if score_range <= 0:
+            return len(scores)
+        # Only cuts that keep at least min_results are candidates
+        gaps = [(scores[i - 1] - scores[i], i) for i in range(self.min_results, len(scores))]
+        gap, position = max(gaps)
+        return position if gap >= self.elbow_gap * score_range else len(scores)
+
+    def _score_budget(self, scores: List[float]) -> int:
+        low, high = min(scores), max(scores)
+        if high <= low:
+            return len(scores)
+        weights = [(score - low) / (high - low) for score in scores]
+        target = self.score_mass * sum(weights)
+        total = 0.0
+        for i, weight in enumerate(weights):
+            total += weight
+            if total >= target:
+                return max(i + 1, self.min_results)
+        return len(scores)
+
+    def _token_budget(self, results: List[SearchResult]) -> int:
+        tokens = 0
+        for i, result in enumerate(results):
+            tokens += estimate_tokens(result.content)
+            if tokens > self.token_budget:
+                return max(i, self.min_results)
+        return len(results)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'requests': self.requests,
+            'avg_results_in': round(self.results_in / self.requests, 2) if self.requests else 0.0,
+            'avg_results_out': round(self.results_out / self.requests, 2) if self.requests else 0.0
+        }
+
+
+def create_adaptive_cutoff(mode: str = "none", min_results: int = 3, elbow_gap: float = 0.25,
+                           score_mass: float = 0.9, token_budget: int = 0) -> Optional[AdaptiveCutoff]:
+    """
+    Build the configured cutoff, or None for "none" without a token budget
+    """
+    if mode == "none" and token_budget <= 0:
+        return None
+    return AdaptiveCutoff(mode, min_results=min_results, elbow_gap=elbow_gap,
+                          score_mass=score_mass, token_budget=token_budget)
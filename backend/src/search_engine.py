@@ -1,7 +1,16 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from .embedding_engine import EmbeddingEngine
 from .vector_store import VectorStore
+from .embedding_cache import EmbeddingCache
+from .lexical_index import LexicalIndex
+from .lru_cache import LRUCache
+from .search_filter import SearchFilter
+
+SEARCH_MODES = ("vector", "hybrid")
+FUSION_METHODS = ("rrf", "weighted")
 
 @dataclass
 class SearchResult:
@@ -9,40 +18,91 @@ class SearchResult:
     content: str
     similarity: float
     metadata: Dict[str, Any]
+    lexical_score: float = 0.0
+    fusion_score: float = 0.0
+    rerank_score: Optional[float] = None
 
 class SemanticSearchEngine:
-    def __init__(self, embedding_engine: EmbeddingEngine, vector_store: VectorStore):
+    def __init__(self, embedding_engine: EmbeddingEngine, vector_store: VectorStore,
+                 result_cache: Optional[LRUCache] = None,
+                 lexical_index: Optional[LexicalIndex] = None, mode: str = "vector",
+                 fusion: str = "rrf", rrf_k: int = 60, lexical_weight: float = 0.3,
+                 candidate_pool: int = 50):
+        """
+        In "hybrid" mode BM25 retrieval from the lexical index runs alongside
+        vector retrieval and the two rankings are fused, either by reciprocal
+        rank fusion or by a weighted sum of normalized BM25 and cosine scores.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {fusion}")
+        
         self.embedding_engine = embedding_engine
         self.vector_store = vector_store
+        # (query, threshold, max_results, filter, corpus version) -> List[SearchResult]
+        self.result_cache = result_cache
+        self.lexical_index = lexical_index
+        self.mode = mode
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.lexical_weight = lexical_weight
+        self.candidate_pool = candidate_pool
+        self._lexical_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lexical") \
+            if lexical_index is not None else None
+    
+    @property
+    def hybrid(self) -> bool:
+        return self.mode == "hybrid" and self.lexical_index is not None
     
-    def search(self, query: str, threshold: float = 0.7, max_results: int = 10) -> List[SearchResult]:
+    def _cache_key(self, query: str, threshold: float, max_results: int,
+                   search_filter: Optional[SearchFilter] = None) -> tuple:
+        return (
+            EmbeddingCache.normalize(query),
+            round(threshold, 4),
+            max_results,
+            search_filter,
+            self.vector_store.get_corpus_version()
+        )
+    
+    def get_cached(self, query: str, threshold: float = 0.7, max_results: int = 10,
+                   search_filter: Optional[SearchFilter] = None) -> Optional[List[SearchResult]]:
+        """
+        Return cached results for a query if present for the current corpus version
         """
-        Perform semantic search for relevant chunks
+        if self.result_cache is None:
+            return None
+        cached = self.result_cache.get(self._cache_key(query, threshold, max_results, search_filter))
+        return list(cached) if cached is not None else None
+    
+    def search(self, query: str, threshold: float = 0.7, max_results: int = 10,
+               query_embedding: Optional[np.ndarray] = None,
+               check_cache: bool = True,
+               search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """
+        Perform semantic search for relevant chunks.
+        A precomputed query embedding (e.g. from the QueryBatcher) skips encoding.
+        Pass check_cache=False if the caller already missed in `get_cached`;
+        fresh results are cached either way. A search filter restricts the
+        search to some documents or pages inside the stores.
         """
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_engine.generate_single_embedding(query)
-            
-            if query_embedding.size == 0:
-                return []
+            if self.result_cache is not None:
+                cache_key = self._cache_key(query, threshold, max_results, search_filter)
+                if check_cache:
+                    cached = self.result_cache.get(cache_key)
+                    if cached is not None:
+                        return list(cached)
             
-            # Search in vector store
-            results = self.vector_store.search_similar(
-                query_embedding=query_embedding.tolist(),
-                n_results=max_results,
-                threshold=threshold
-            )
+            if self.hybrid:
+                search_results = self._hybrid_search(query, threshold, max_results, query_embedding, search_filter)
+            else:
+                if query_embedding is None:
+                    query_embedding = self.embedding_engine.generate_single_embedding(query)
+                search_results = self._vector_search(query_embedding, threshold, max_results, search_filter)
             
-            # Convert to SearchResult objects
-            search_results = []
-            for result in results:
-                search_result = SearchResult(
-                    chunk_id=result['chunk_id'],
-                    content=result['content'],
-                    similarity=result['similarity'],
-                    metadata=result['metadata']
-                )
-                search_results.append(search_result)
+            if self.result_cache is not None:
+                self.result_cache.put(cache_key, tuple(search_results))
             
             return search_results
             
@@ -50,6 +110,200 @@ class SemanticSearchEngine:
             print(f"Error in semantic search: {str(e)}")
             return []
     
+    def _vector_search(self, query_embedding: np.ndarray, threshold: float,
+                       max_results: int, search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """
+        Nearest chunks by cosine similarity above the threshold
+        """
+        if query_embedding.size == 0:
+            return []
+        
+        # Search in vector store
+        results = self.vector_store.search_similar(
+            query_embedding=query_embedding.tolist(),
+            n_results=max_results,
+            threshold=threshold,
+            search_filter=search_filter
+        )
+        return self._to_search_results(results)
+    
+    def _vector_search_many(self, query_embeddings: np.ndarray, threshold: float,
+                            max_results: int,
+                            search_filter: Optional[SearchFilter] = None) -> List[List[SearchResult]]:
+        """
+        Nearest chunks for several query embeddings in one vector store call
+        """
+        if query_embeddings.size == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        results = self.vector_store.search_similar_many(
+            query_embeddings=query_embeddings.tolist(),
+            n_results=max_results,
+            threshold=threshold,
+            search_filter=search_filter
+        )
+        return [self._to_search_results(query_results) for query_results in results]
+    
+    @staticmethod
+    def _to_search_results(results: List[Dict[str, Any]]) -> List[SearchResult]:
+        """
+        Convert vector store results to SearchResult objects
+        """
+        return [
+            SearchResult(
+                chunk_id=result['chunk_id'],
+                content=result['content'],
+                similarity=result['similarity'],
+                metadata=result['metadata']
+            )
+            for result in results
+        ]
+    
+    def search_many(self, queries: List[str], threshold: float = 0.7, max_results: int = 10,
+                    query_embeddings: Optional[np.ndarray] = None,
+                    check_cache: bool = True,
+                    search_filter: Optional[SearchFilter] = None) -> List[List[SearchResult]]:
+        """
+        Search for several queries at once, returning results per query in
+        order. Queries missing from the retrieval cache are embedded in one
+        forward pass (unless `query_embeddings`, one row per query, are
+        given) and looked up in one vector store call; in hybrid mode their
+        BM25 searches run in parallel and each ranking is fused separately.
+        """
+        try:
+            all_results: List[Optional[List[SearchResult]]] = [None] * len(queries)
+            cache_keys = [None] * len(queries)
+            if self.result_cache is not None:
+                for i, query in enumerate(queries):
+                    cache_keys[i] = self._cache_key(query, threshold, max_results, search_filter)
+                    if check_cache:
+                        cached = self.result_cache.get(cache_keys[i])
+                        if cached is not None:
+                            all_results[i] = list(cached)
+            
+            missing = [i for i, results in enumerate(all_results) if results is None]
+            if not missing:
+                return all_results
+            
+            if query_embeddings is None:
+                embeddings = self.embedding_engine.generate_embeddings(
+                    [queries[i] for i in missing], show_progress_bar=False
+                )
+            else:
+                embeddings = np.asarray(query_embeddings, dtype=np.float32)[missing]
+            if embeddings.size == 0:
+                embeddings = np.zeros((len(missing), 0), dtype=np.float32)
+            
+            if self.hybrid:
+                pool_size = max(max_results, self.candidate_pool)
+                documents = search_filter.documents if search_filter is not None else None
+                lexical_futures = [
+                    self._lexical_executor.submit(self.lexical_index.search, queries[i], pool_size, documents)
+                    for i in missing
+                ]
+                vector_results = self._vector_search_many(embeddings, threshold, pool_size, search_filter)
+                for i, lexical_future, results, embedding in zip(missing, lexical_futures,
+                                                                 vector_results, embeddings):
+                    try:
+                        lexical_hits = lexical_future.result()
+                    except Exception as e:
+                        print(f"Error in lexical search: {str(e)}")
+                        lexical_hits = []
+                    all_results[i] = self._fuse(results, lexical_hits, embedding, threshold, max_results,
+                                                search_filter)
+            else:
+                for i, results in zip(missing, self._vector_search_many(embeddings, threshold, max_results,
+                                                                        search_filter)):
+                    all_results[i] = results
+            
+            if self.result_cache is not None:
+                for i in missing:
+                    self.result_cache.put(cache_keys[i], tuple(all_results[i]))
+            
+            return all_results
+            
+        except Exception as e:
+            print(f"Error in batch semantic search: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _hybrid_search(self, query: str, threshold: float, max_results: int,
+                       query_embedding: Optional[np.ndarray],
+                       search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """
+        Run BM25 and vector retrieval concurrently and fuse the rankings.
+        Keyword hits still have to reach the similarity threshold, so they
+        re-rank and add relevant chunks rather than pull in unrelated ones.
+        """
+        pool_size = max(max_results, self.candidate_pool)
+        lexical_future = self._lexical_executor.submit(
+            self.lexical_index.search, query, pool_size,
+            search_filter.documents if search_filter is not None else None
+        )
+        
+        if query_embedding is None:
+            query_embedding = self.embedding_engine.generate_single_embedding(query)
+        vector_results = self._vector_search(query_embedding, threshold, pool_size, search_filter)
+        
+        try:
+            lexical_hits = lexical_future.result()
+        except Exception as e:
+            print(f"Error in lexical search: {str(e)}")
+            lexical_hits = []
+        
+        return self._fuse(vector_results, lexical_hits, query_embedding, threshold, max_results,
+                          search_filter)
+    
+    def _fuse(self, vector_results: List[SearchResult], lexical_hits: List[Tuple[str, float]],
+              query_embedding: np.ndarray, threshold: float, max_results: int,
+              search_filter: Optional[SearchFilter] = None) -> List[SearchResult]:
+        """
+        Merge vector results and BM25 hits into one ranking. Lexical-only
+        hits below the similarity threshold are dropped, and so are hits
+        outside a filter's page range (the lexical index only filters by
+        document).
+        """
+        results = {result.chunk_id: result for result in vector_results}
+        lexical_scores = dict(lexical_hits)
+        
+        # Lexical-only hits need their content and a cosine similarity for display
+        missing = [chunk_id for chunk_id in lexical_scores if chunk_id not in results]
+        if missing and query_embedding.size:
+            for chunk in self.vector_store.get_chunks(missing, include_embeddings=True):
+                if search_filter is not None and not search_filter.matches(chunk['metadata']):
+                    continue
+                embedding = np.asarray(chunk['embedding'], dtype=np.float32)
+                norm = float(np.linalg.norm(embedding) * np.linalg.norm(query_embedding)) or 1.0
+                similarity = float(np.dot(embedding, query_embedding)) / norm
+                if similarity < threshold:
+                    continue
+                results[chunk['chunk_id']] = SearchResult(
+                    chunk_id=chunk['chunk_id'],
+                    content=chunk['content'],
+                    similarity=similarity,
+                    metadata=chunk['metadata']
+                )
+        
+        for chunk_id, score in lexical_scores.items():
+            if chunk_id in results:
+                results[chunk_id].lexical_score = score
+        
+        if self.fusion == "rrf":
+            for rank, result in enumerate(vector_results):
+                result.fusion_score += 1.0 / (self.rrf_k + rank + 1)
+            for rank, (chunk_id, _) in enumerate(lexical_hits):
+                if chunk_id in results:
+                    results[chunk_id].fusion_score += 1.0 / (self.rrf_k + rank + 1)
+        else:
+            max_lexical = max(lexical_scores.values(), default=0.0) or 1.0
+            for result in results.values():
+                result.fusion_score = (
+                    self.lexical_weight * result.lexical_score / max_lexical
+                    + (1.0 - self.lexical_weight) * max(result.similarity, 0.0)
+                )
+        
+        fused = sorted(results.values(), key=lambda result: result.fusion_score, reverse=True)
+        return fused[:max_results]
+    
     def filter_by_relevance(self, results: List[SearchResult], threshold: float = 0.7) -> List[SearchResult]:
         """
         Filter results by relevance threshold
@@ -60,4 +314,15 @@ class SemanticSearchEngine:
         """
         Get search engine statistics
         """
-        return self.vector_store.get_collection_stats()
\ No newline at end of file
+        stats = self.vector_store.get_collection_stats()
+        stats['search_mode'] = self.mode if self.hybrid else "vector"
+        if self.lexical_index is not None:
+            stats['lexical_index'] = self.lexical_index.stats()
+        return stats
+    
+    def close(self):
+        """
+        Stop the lexical search threads
+        """
+        if self._lexical_executor is not None:
+            self._lexical_executor.shutdown(wait=False)
\ No newline at end of file
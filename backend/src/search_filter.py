@@ -0,0 +1,182 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# `id: "..."` and `filename: "..."` entries of the frontend's data/collections.ts
+_TS_FIELD_PATTERN = re.compile(r'\b(id|name|filename)\s*:\s*"([^"]*)"')
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """
+    Restricts a search to chunks of some documents and/or a page range.
+
+    `documents` is the resolved set of source document filenames (a
+    collection is resolved to its documents before searching). `collection`
+    is set only when the documents are exactly one collection's, so a store
+    with a pre-partitioned index for it can search that partition instead.
+    Pages are inclusive; a chunk matches if any of its pages is in range.
+    Frozen, so it can be part of cache keys.
+    """
+    documents: Optional[Tuple[str, ...]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    collection: Optional[str] = None
+
+    @property
+    def has_pages(self) -> bool:
+        return self.page_from is not None or self.page_to is not None
+
+    def matches(self, metadata: Dict[str, Any]) -> bool:
+        """
+        Whether a chunk with this metadata passes the filter
+        """
+        if self.documents is not None and metadata.get('source_document') not in self.documents:
+            return False
+        first_page = metadata.get('page_number') or 1
+        last_page = metadata.get('page_end') or first_page
+        if self.page_from is not None and last_page < self.page_from:
+            return False
+        if self.page_to is not None and first_page > self.page_to:
+            return False
+        return True
+
+    def to_chroma_where(self) -> Optional[Dict[str, Any]]:
+        """
+        The equivalent ChromaDB `where` clause, or None for no restriction
+        """
+        clauses = []
+        if self.documents is not None:
+            clauses.append({'source_document': {'$in': list(self.documents)}})
+        if self.page_from is not None:
+            # Chunks written before multi-page chunking have no page_end; they match on
+            # page_number. page_end >= page_number, so the rest are unaffected.
+            clauses.append({'$or': [
+                {'page_end': {'$gte': self.page_from}},
+                {'page_number': {'$gte': self.page_from}}
+            ]})
+        if self.page_to is not None:
+            clauses.append({'page_number': {'$lte': self.page_to}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+    def to_sql(self) -> Tuple[str, List[Any]]:
+        """
+        A WHERE condition over the numpy store's `chunks` table, with its parameters
+        """
+        conditions, params = [], []
+        if self.documents is not None:
+            conditions.append(f"source_document IN ({','.join('?' * len(self.documents))})")
+            params.extend(self.documents)
+        if self.page_from is not None:
+            conditions.append(
+                "COALESCE(json_extract(metadata, '$.page_end'), json_extract(metadata, '$.page_number')) >= ?"
+            )
+            params.append(self.page_from)
+        if self.page_to is not None:
+            conditions.append("json_extract(metadata, '$.page_number') <= ?")
+            params.append(self.page_to)
+        return " AND ".join(conditions) or "1", params
+
+
+class DocumentCollections:
+    """
+    Collection ID -> document filenames, as defined for the frontend in
+    data/collections.ts (or a JSON list of {"id", "name", "documents"})
+    """
+
+    def __init__(self, documents: Optional[Dict[str, List[str]]] = None,
+                 names: Optional[Dict[str, str]] = None):
+        self.documents = documents or {}
+        self.names = names or {}
+
+    @classmethod
+    def load(cls, path: str) -> "DocumentCollections":
+        """
+        Read collections from a .ts or .json file; a missing file means no collections
+        """
+        if not os.path.exists(path):
+            print(f"No collections file at {path}; collection filters are unavailable")
+            return cls()
+        try:
+            with open(path) as file:
+                text = file.read()
+            if path.endswith(".json"):
+                entries = json.loads(text)
+                return cls(
+                    {entry['id']: [document if isinstance(document, str) else document['filename']
+                                   for document in entry['documents']] for entry in entries},
+                    {entry['id']: entry.get('name', entry['id']) for entry in entries}
+                )
+
+            documents: Dict[str, List[str]] = {}
+            names: Dict[str, str] = {}
+            current = None
+            for field, value in _TS_FIELD_PATTERN.findall(text):
+                if field == "id":
+                    current = value
+                    documents[current] = []
+                elif field == "name" and current is not None and current not in names:
+                    names[current] = value
+                elif field == "filename" and current is not None:
+                    documents[current].append(value)
+            return cls(documents, names)
+
+        except Exception as e:
+            print(f"Error loading collections from {path}: {str(e)}")
+            return cls()
+
+    def resolve(self, collection: str) -> Optional[str]:
+        """
+        The ID of a collection given by ID or display name (the frontend sends names)
+        """
+        if collection in self.documents:
+            return collection
+        folded = collection.casefold()
+        for collection_id, name in self.names.items():
+            if name.casefold() == folded or collection_id.casefold() == folded:
+                return collection_id
+        return None
+
+    def partitions(self, collection_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """
+        Documents of the given collections, for a store's pre-partitioned indexes
+        """
+        partitions = {}
+        for collection_id in collection_ids:
+            if collection_id in self.documents:
+                partitions[collection_id] = self.documents[collection_id]
+            else:
+                print(f"Unknown collection {collection_id}; not partitioning it")
+        return partitions
+
+    def build_filter(self, collection: Optional[str] = None, documents: Optional[Sequence[str]] = None,
+                     page_from: Optional[int] = None, page_to: Optional[int] = None) -> Optional[SearchFilter]:
+        """
+        A SearchFilter for the request fields, or None if nothing is restricted.
+        Raises ValueError for an unknown collection or an empty page range.
+        """
+        if page_from is not None and page_to is not None and page_from > page_to:
+            raise ValueError("page_from must not be greater than page_to")
+
+        collection_id = None
+        selected = tuple(sorted(set(documents))) if documents else None
+        if collection:
+            collection_id = self.resolve(collection)
+            if collection_id is None:
+                raise ValueError(f"Unknown collection: {collection}")
+            collection_documents = tuple(sorted(set(self.documents[collection_id])))
+            if selected is None:
+                selected = collection_documents
+            else:
+                selected = tuple(document for document in selected if document in collection_documents)
+                if selected != collection_documents:
+                    collection_id = None
+
+        if selected is None and page_from is None and page_to is None:
+            return None
+        return SearchFilter(documents=selected, page_from=page_from, page_to=page_to,
+                            collection=collection_id)
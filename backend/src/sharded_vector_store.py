@@ -0,0 +1,356 @@
+from typing import List, Dict, Any, Optional, Iterator, Sequence
+import hashlib
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+import numpy as np
+from .pdf_processor import DocumentChunk
+from .manifest import ManifestFingerprint
+from .lexical_index import LexicalIndex
+from .search_filter import SearchFilter
+
+SHARD_DIRNAME_FORMAT = "shard-{:02d}"
+
+
+def shard_for(source_document: str, shards: int) -> int:
+    """
+    The shard owning a document: a stable hash of its filename, so a
+    document's chunks always live together and a re-ingest or delete
+    touches exactly one shard
+    """
+    digest = hashlib.md5(source_document.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") % shards
+
+
+def _serve_shard(conn, backend: str, persist_directory: str, options: Dict[str, Any]):
+    """
+    Shard worker process: owns one vector store and answers
+    (method, args, kwargs) requests from the parent until told to close
+    """
+    # Imported here: vector_store imports this module
+    from .vector_store import create_vector_store
+
+    store = create_vector_store(backend, persist_directory, **options)
+    chunk_iterator = None
+    while True:
+        try:
+            method, args, kwargs = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        try:
+            if method == "iter_chunks":
+                chunk_iterator = store.iter_chunks(*args, **kwargs)
+                result = None
+            elif method == "next_chunks":
+                result = list(itertools.islice(chunk_iterator, args[0])) if chunk_iterator else []
+            elif method == "compressed":
+                result = getattr(store, "compressed", False)
+            else:
+                result = getattr(store, method)(*args, **kwargs)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {str(e)}"))
+        if method == "close":
+            break
+    conn.close()
+
+
+class ShardClient:
+    """
+    Parent-side handle of one shard process, talking over a pipe.
+    One request is in flight per shard; `send` and `receive` are split so a
+    caller can scatter to every shard before gathering any reply.
+    """
+
+    def __init__(self, index: int, backend: str, persist_directory: str, options: Dict[str, Any]):
+        self.index = index
+        self.persist_directory = persist_directory
+        # Spawned, not forked: the parent may already run thread pools and model runtimes
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_serve_shard,
+            args=(child_conn, backend, persist_directory, options),
+            name=f"vector-shard-{index}",
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def send(self, method: str, *args, **kwargs):
+        self.requests += 1
+        self.conn.send((method, args, kwargs))
+
+    def receive(self) -> Any:
+        status, result = self.conn.recv()
+        if status == "error":
+            raise RuntimeError(f"Shard {self.index}: {result}")
+        return result
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        with self.lock:
+            self.send(method, *args, **kwargs)
+            return self.receive()
+
+    def close(self, timeout: float = 10.0):
+        try:
+            self.call("close")
+        except Exception:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class ShardedVectorStore:
+    """
+    Vector store split across `shards` worker processes, each holding its
+    own index (of the configured backend) in a shard-NN/ subdirectory.
+
+    Chunks are placed by a hash of their source document. Searches are
+    scattered to every shard at once (or, with a document filter, only to
+    the shards owning those documents), each shard returns its own top-k,
+    and the per-shard lists are merged with a heap. The lexical index, the
+    ingestion manifest and the corpus version stay in the parent, so the
+    interface is the same as VectorStore's.
+    """
+
+    def __init__(self, backend: str = "chroma", persist_directory: str = "data/embeddings",
+                 shards: int = 2, lexical_index: Optional[LexicalIndex] = None,
+                 compression: str = "none", pq_subspaces: int = 48, rescore_factor: int = 10,
+                 partitions: Optional[Dict[str, List[str]]] = None):
+        self.backend = backend
+        self.persist_directory = persist_directory
+        self.lexical_index = lexical_index
+        self.compression = compression
+        os.makedirs(persist_directory, exist_ok=True)
+
+        options = {}
+        if backend == "numpy":
+            options = dict(compression=compression, pq_subspaces=pq_subspaces,
+                           rescore_factor=rescore_factor, partitions=partitions)
+        self.shards = [
+            ShardClient(index, backend, os.path.join(persist_directory, SHARD_DIRNAME_FORMAT.format(index)),
+                        options)
+            for index in range(shards)
+        ]
+        print(f"Started {shards} {backend} vector store shards")
+
+        self._manifest_fingerprint = ManifestFingerprint(persist_directory)
+
+        # Bumped on every write through this instance
+        self.version = 0
+        self._version_lock = threading.Lock()
+
+    def _scatter(self, requests: Dict[int, tuple]) -> Dict[int, Any]:
+        """
+        Send each shard its (method, args, kwargs) request, then collect the
+        replies, so the shards work concurrently. Locks are taken in shard
+        order, so concurrent scatters cannot deadlock.
+        """
+        targets = sorted(requests)
+        for index in targets:
+            self.shards[index].lock.acquire()
+        try:
+            for index in targets:
+                method, args, kwargs = requests[index]
+                self.shards[index].send(method, *args, **kwargs)
+            # Drain every reply even if one shard failed, so the pipes stay in step
+            replies, error = {}, None
+            for index in targets:
+                try:
+                    replies[index] = self.shards[index].receive()
+                except Exception as e:
+                    error = error or e
+            if error is not None:
+                raise error
+            return replies
+        finally:
+            for index in targets:
+                self.shards[index].lock.release()
+
+    def _broadcast(self, method: str, *args, **kwargs) -> Dict[int, Any]:
+        return self._scatter({index: (method, args, kwargs) for index in range(len(self.shards))})
+
+    def shard_for(self, source_document: str) -> int:
+        return shard_for(source_document, len(self.shards))
+
+    @property
+    def compressed(self) -> bool:
+        return all(self._broadcast("compressed").values())
+
+    def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]) -> int:
+        """
+        Add chunks to the shards owning their documents. Returns the number
+        of chunks stored, which is short of the batch if any shard failed.
+        """
+        try:
+            batches: Dict[int, tuple] = {}
+            for chunk, embedding in zip(chunks, embeddings):
+                index = self.shard_for(chunk.metadata.source_document)
+                batch_chunks, batch_embeddings = batches.setdefault(index, ([], []))
+                batch_chunks.append(chunk)
+                batch_embeddings.append(embedding)
+
+            replies = self._scatter({index: ("add_chunks", batch, {}) for index, batch in batches.items()})
+
+            if self.lexical_index is not None:
+                self.lexical_index.add_chunks(chunks)
+            return sum(replies.values())
+
+        except Exception as e:
+            print(f"Error adding chunks to vector store: {str(e)}")
+            return 0
+        finally:
+            self._bump_version()
+
+    def search_similar(self, query_embedding: List[float], n_results: int = 10,
+                       threshold: float = 0.7,
+                       search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
+        """
+        Search for similar chunks based on query embedding
+        """
+        results = self.search_similar_many([query_embedding], n_results, threshold, search_filter)
+        return results[0] if results else []
+
+    def search_similar_many(self, query_embeddings: Sequence[List[float]], n_results: int = 10,
+                            threshold: float = 0.7,
+                            search_filter: Optional[SearchFilter] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Scatter the queries to the shards and merge each query's per-shard
+        top-k into the global top-k
+        """
+        try:
+            targets = range(len(self.shards))
+            if search_filter is not None and search_filter.documents is not None:
+                targets = sorted({self.shard_for(document) for document in search_filter.documents})
+            if not targets:
+                return [[] for _ in query_embeddings]
+
+            # Nested lists, as the search engine passes them: Chroma rejects arrays
+            queries = np.asarray(query_embeddings, dtype=np.float32).tolist()
+            request = ("search_similar_many", (queries, n_results, threshold, search_filter), {})
+            replies = self._scatter({index: request for index in targets})
+
+            return [
+                heapq.nlargest(
+                    n_results,
+                    itertools.chain.from_iterable(replies[index][q] for index in targets),
+                    key=lambda result: result['similarity']
+                )
+                for q in range(len(queries))
+            ]
+
+        except Exception as e:
+            print(f"Error searching vector store: {str(e)}")
+            return [[] for _ in query_embeddings]
+
+    def get_chunk_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a specific chunk by its ID (asked of every shard)
+        """
+        chunks = self.get_chunks([chunk_id])
+        return chunks[0] if chunks else None
+
+    def get_chunks(self, chunk_ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retrieve several chunks by ID in one call, optionally with their embeddings
+        """
+        if not chunk_ids:
+            return []
+        try:
+            replies = self._broadcast("get_chunks", chunk_ids, include_embeddings)
+            found = {chunk['chunk_id']: chunk for chunks in replies.values() for chunk in chunks}
+            return [found[chunk_id] for chunk_id in chunk_ids if chunk_id in found]
+
+        except Exception as e:
+            print(f"Error retrieving chunks: {str(e)}")
+            return []
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Page through every chunk, shard by shard (without embeddings)
+        """
+        for shard in self.shards:
+            with shard.lock:
+                shard.send("iter_chunks", batch_size)
+                shard.receive()
+            while True:
+                batch = shard.call("next_chunks", batch_size)
+                if not batch:
+                    break
+                yield from batch
+
+    def delete_document(self, source_document: str):
+        """
+        Remove all chunks belonging to a source document from its shard
+        """
+        try:
+            self.shards[self.shard_for(source_document)].call("delete_document", source_document)
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(source_document)
+        except Exception as e:
+            print(f"Error deleting chunks of {source_document}: {str(e)}")
+        finally:
+            self._bump_version()
+
+    def build_compressed_index(self, sample_size: int = 100_000):
+        """
+        Train and encode each shard's compressed index (numpy backend)
+        """
+        self._broadcast("build_compressed_index", sample_size)
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the collection, summed over the shards
+        """
+        try:
+            shard_stats = [stats for _, stats in sorted(self._broadcast("get_collection_stats").items())]
+            return {
+                'total_chunks': sum(stats['total_chunks'] for stats in shard_stats),
+                'collection_name': f"{self.backend} ({len(self.shards)} shards)",
+                'shards': [
+                    dict(stats, requests=shard.requests, pid=shard.process.pid)
+                    for shard, stats in zip(self.shards, shard_stats)
+                ]
+            }
+        except Exception as e:
+            print(f"Error getting collection stats: {str(e)}")
+            return {'total_chunks': 0, 'collection_name': 'unknown'}
+
+    def _bump_version(self):
+        with self._version_lock:
+            self.version += 1
+
+    def get_corpus_version(self) -> str:
+        """
+        Version of the indexed corpus: the ingestion manifest's fingerprint
+        (the manifest covers all shards) plus this instance's write counter
+        """
+        fingerprint = self._manifest_fingerprint.read() or "empty"
+        return f"{fingerprint}.{self.version}"
+
+    def close(self):
+        """
+        Stop the shard processes
+        """
+        for shard in self.shards:
+            shard.close()
+
+    def reset_collection(self):
+        """
+        Reset every shard (useful for testing)
+        """
+        try:
+            self._broadcast("reset_collection")
+            if self.lexical_index is not None:
+                self.lexical_index.reset()
+        except Exception as e:
+            print(f"Error resetting collection: {str(e)}")
+        finally:
+            self._bump_version()
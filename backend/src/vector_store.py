@@ -1,18 +1,33 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Sequence
 import json
 import os
+import threading
+import numpy as np
 from .pdf_processor import DocumentChunk, ChunkMetadata
+from .manifest import ManifestFingerprint
+from .lexical_index import LexicalIndex
+from .search_filter import SearchFilter
+from .numpy_vector_store import NumpyVectorStore
+from .sharded_vector_store import ShardedVectorStore
+
+VECTOR_BACKENDS = ("chroma", "numpy")
 
 class VectorStore:
-    def __init__(self, persist_directory: str = "data/embeddings"):
+    def __init__(self, persist_directory: str = "data/embeddings",
+                 lexical_index: Optional[LexicalIndex] = None):
         """
-        Initialize ChromaDB vector store
+        Initialize ChromaDB vector store.
+        If a lexical index is given, writes and deletes are mirrored into it;
+        the caller persists it with `lexical_index.save()`.
         """
         self.persist_directory = persist_directory
+        self.lexical_index = lexical_index
         os.makedirs(persist_directory, exist_ok=True)
         
+        # Imported here so that importing the API does not load ChromaDB
+        import chromadb
+        from chromadb.config import Settings
+        
         # Initialize ChromaDB client with persistence
         self.client = chromadb.PersistentClient(
             path=persist_directory,
@@ -27,10 +42,18 @@ class VectorStore:
             name="document_chunks",
             metadata={"hnsw:space": "cosine"}  # Use cosine similarity
         )
+        
+        self._manifest_fingerprint = ManifestFingerprint(persist_directory)
+        
+        # Bumped on every write through this instance
+        self.version = 0
+        self._version_lock = threading.Lock()
     
-    def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+    def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]) -> int:
         """
-        Add document chunks with their embeddings to the vector store
+        Add document chunks with their embeddings to the vector store.
+        Chunks are upserted, so re-adding a chunk with the same ID replaces it.
+        Returns the number of chunks stored (0 if the write failed).
         """
         try:
             # Prepare data for ChromaDB
@@ -38,51 +61,74 @@ class VectorStore:
             documents = [chunk.content for chunk in chunks]
             metadatas = [self._chunk_metadata_to_dict(chunk.metadata) for chunk in chunks]
             
-            # Add to collection
-            self.collection.add(
+            # Upsert into collection
+            self.collection.upsert(
                 ids=ids,
                 embeddings=embeddings,
                 documents=documents,
                 metadatas=metadatas
             )
             
+            if self.lexical_index is not None:
+                self.lexical_index.add_chunks(chunks)
+            
             print(f"Added {len(chunks)} chunks to vector store")
+            return len(chunks)
             
         except Exception as e:
             print(f"Error adding chunks to vector store: {str(e)}")
+            return 0
+        finally:
+            self._bump_version()
     
     def search_similar(self, query_embedding: List[float], n_results: int = 10, 
-                      threshold: float = 0.7) -> List[Dict[str, Any]]:
+                      threshold: float = 0.7,
+                      search_filter: Optional[SearchFilter] = None) -> List[Dict[str, Any]]:
         """
         Search for similar chunks based on query embedding
         """
+        results = self.search_similar_many([query_embedding], n_results, threshold, search_filter)
+        return results[0] if results else []
+    
+    def search_similar_many(self, query_embeddings: Sequence[List[float]], n_results: int = 10,
+                            threshold: float = 0.7,
+                            search_filter: Optional[SearchFilter] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several query embeddings in one collection query.
+        A filter becomes a `where` clause on the chunk metadata.
+        """
         try:
+            where = search_filter.to_chroma_where() if search_filter is not None else None
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                # Chroma accepts only nested lists, not arrays
+                query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
                 n_results=n_results,
+                where=where,
                 include=["documents", "metadatas", "distances"]
             )
             
-            # Filter by similarity threshold (ChromaDB returns distances, convert to similarity)
-            filtered_results = []
-            for i, distance in enumerate(results['distances'][0]):
-                similarity = 1 - distance  # Convert distance to similarity
-                if similarity >= threshold:
+            all_results = []
+            for q, distances in enumerate(results['distances']):
+                # Filter by similarity threshold (ChromaDB returns distances, convert to similarity).
+                # Results come nearest first, so everything after the first miss is below it too.
+                filtered_results = []
+                for i, distance in enumerate(distances):
+                    similarity = 1 - distance  # Convert distance to similarity
+                    if similarity < threshold:
+                        break
                     filtered_results.append({
-                        'chunk_id': results['ids'][0][i],
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
+                        'chunk_id': results['ids'][q][i],
+                        'content': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i],
                         'similarity': similarity
                     })
+                all_results.append(filtered_results)
             
-            # Sort by similarity (highest first)
-            filtered_results.sort(key=lambda x: x['similarity'], reverse=True)
-            
-            return filtered_results
+            return all_results
             
         except Exception as e:
             print(f"Error searching vector store: {str(e)}")
-            return []
+            return [[] for _ in query_embeddings]
     
     def get_chunk_by_id(self, chunk_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -107,6 +153,67 @@ class VectorStore:
             print(f"Error retrieving chunk {chunk_id}: {str(e)}")
             return None
     
+    def get_chunks(self, chunk_ids: List[str], include_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retrieve several chunks by ID in one call, optionally with their embeddings
+        """
+        if not chunk_ids:
+            return []
+        try:
+            include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+            results = self.collection.get(ids=chunk_ids, include=include)
+            
+            chunks = []
+            for i, chunk_id in enumerate(results['ids']):
+                chunk = {
+                    'chunk_id': chunk_id,
+                    'content': results['documents'][i],
+                    'metadata': results['metadatas'][i]
+                }
+                if include_embeddings:
+                    chunk['embedding'] = results['embeddings'][i]
+                chunks.append(chunk)
+            return chunks
+            
+        except Exception as e:
+            print(f"Error retrieving chunks: {str(e)}")
+            return []
+    
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Page through every chunk in the collection (without embeddings)
+        """
+        offset = 0
+        while True:
+            results = self.collection.get(
+                include=["documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not results['ids']:
+                return
+            for i, chunk_id in enumerate(results['ids']):
+                yield {
+                    'chunk_id': chunk_id,
+                    'content': results['documents'][i],
+                    'metadata': results['metadatas'][i]
+                }
+            offset += len(results['ids'])
+    
+    def delete_document(self, source_document: str):
+        """
+        Remove all chunks belonging to a source document
+        """
+        try:
+            self.collection.delete(where={"source_document": source_document})
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(source_document)
+            print(f"Deleted chunks of {source_document} from vector store")
+        except Exception as e:
+            print(f"Error deleting chunks of {source_document}: {str(e)}")
+        finally:
+            self._bump_version()
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the collection
@@ -121,6 +228,25 @@ class VectorStore:
             print(f"Error getting collection stats: {str(e)}")
             return {'total_chunks': 0, 'collection_name': 'unknown'}
     
+    def _bump_version(self):
+        with self._version_lock:
+            self.version += 1
+    
+    def get_corpus_version(self) -> str:
+        """
+        Version of the indexed corpus: the ingestion manifest's fingerprint, so
+        that re-ingests from another process are noticed, plus this instance's
+        write counter, so that in-process writes are noticed immediately
+        """
+        fingerprint = self._manifest_fingerprint.read() or "empty"
+        return f"{fingerprint}.{self.version}"
+    
+    def close(self):
+        """
+        Nothing to release: the persistent Chroma client holds no handles
+        that outlive the process (kept for parity with NumpyVectorStore)
+        """
+    
     def _chunk_metadata_to_dict(self, metadata: ChunkMetadata) -> Dict[str, Any]:
         """
         Convert ChunkMetadata to dictionary for ChromaDB
@@ -129,7 +255,11 @@ class VectorStore:
             'source_document': metadata.source_document,
             'page_number': metadata.page_number,
             'chunk_type': metadata.chunk_type,
-            'section_title': metadata.section_title
+            'section_title': metadata.section_title,
+            'document_hash': metadata.document_hash,
+            'char_start': metadata.char_start,
+            'char_end': metadata.char_end,
+            'page_end': metadata.page_end or metadata.page_number
         }
     
     def reset_collection(self):
@@ -142,6 +272,49 @@ class VectorStore:
                 name="document_chunks",
                 metadata={"hnsw:space": "cosine"}
             )
+            if self.lexical_index is not None:
+                self.lexical_index.reset()
             print("Collection reset successfully")
         except Exception as e:
-            print(f"Error resetting collection: {str(e)}")
\ No newline at end of file
+            print(f"Error resetting collection: {str(e)}")
+        finally:
+            self._bump_version()
+
+def create_vector_store(backend: str = "chroma", persist_directory: Optional[str] = None,
+                        lexical_index: Optional[LexicalIndex] = None, compression: str = "none",
+                        pq_subspaces: int = 48, rescore_factor: int = 10,
+                        partitions: Optional[Dict[str, List[str]]] = None, shards: int = 1):
+    """
+    Build the configured vector store backend: "chroma" (HNSW, the default)
+    or "numpy" (exact search over a memory-mapped matrix, optionally with an
+    int8/PQ compressed first pass and per-collection partitions).
+    With more than one shard, that backend runs in `shards` worker processes.
+    """
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend} (expected one of {VECTOR_BACKENDS})")
+    if shards > 1:
+        return ShardedVectorStore(
+            backend,
+            persist_directory or ("data/embeddings" if backend == "chroma" else "data/embeddings_numpy"),
+            shards=shards,
+            lexical_index=lexical_index,
+            compression=compression,
+            pq_subspaces=pq_subspaces,
+            rescore_factor=rescore_factor,
+            partitions=partitions
+        )
+    if backend == "chroma":
+        if compression != "none":
+            print("Vector compression is only supported by the numpy backend; ignoring it")
+        if partitions:
+            print("Collection partitions are only supported by the numpy backend; ignoring them")
+        return VectorStore(persist_directory or "data/embeddings", lexical_index=lexical_index)
+    if backend == "numpy":
+        return NumpyVectorStore(
+            persist_directory or "data/embeddings_numpy",
+            lexical_index=lexical_index,
+            compression=compression,
+            pq_subspaces=pq_subspaces,
+            rescore_factor=rescore_factor,
+            partitions=partitions
+        )
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class WarmupTimeout(Exception):
+    """
+    Raised when components are not ready within the caller's timeout
+    """
+
+
+class Warmup:
+    """
+    Builds the heavy components once, in a background thread, so the server
+    accepts connections while models load.
+
+    `build(steps)` constructs and warms everything and returns the result;
+    it can record per-step durations in the `steps` dict. Only one build
+    runs at a time: requests that arrive meanwhile wait for it (up to a
+    timeout) instead of starting their own. A failed build is retried by the
+    next `start()` or `wait()`.
+    """
+
+    IDLE = "idle"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, build: Callable[[Dict[str, float]], Any]):
+        self.build = build
+        self.state = self.IDLE
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self.attempts = 0
+        self.started_at: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self.state == self.READY
+
+    def start(self) -> bool:
+        """
+        Start the build in a background thread unless it is running or done;
+        returns whether a build was started
+        """
+        with self._lock:
+            if self.state in (self.WARMING, self.READY):
+                return False
+            self.state = self.WARMING
+            self.error = None
+            self.steps = {}
+            self.attempts += 1
+            self.started_at = time.time()
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+        return True
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            result = self.build(self.steps)
+            error = None
+        except Exception as e:
+            print(f"Error warming up components: {str(e)}")
+            result, error = None, str(e)
+
+        with self._lock:
+            self.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.result = result
+            self.error = error
+            self.state = self.FAILED if error else self.READY
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self._wake, future)
+
+    @staticmethod
+    def _wake(future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+
+    async def wait(self, timeout: float) -> Any:
+        """
+        Return the built components, starting the build if needed; raises
+        WarmupTimeout after `timeout` seconds and RuntimeError if it fails
+        """
+        if self.state == self.READY:
+            return self.result
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self.state == self.WARMING:
+                self._waiters.append((loop, future))
+            else:
+                future.set_result(None)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise WarmupTimeout(f"Components are still warming up after {timeout:g}s")
+
+        if self.state != self.READY:
+            raise RuntimeError(f"Component warm-up failed: {self.error}")
+        return self.result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'attempts': self.attempts,
+            'duration_ms': self.duration_ms,
+            'steps_ms': dict(self.steps),
+            'waiting_requests': sum(not future.done() for _, future in self._waiters),
+            'error': self.error
+        }
@@ -3,23 +3,40 @@
 Start the FastAPI server
 """
 import uvicorn
+import argparse
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start the RAG API server")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "1")),
+                        help="Worker processes; more than one forks workers from a preloaded master")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Let each worker load the models itself instead of sharing the master's copy")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", "8000"))
     
     print(f"Starting RAG API server on {host}:{port}")
     print("API Documentation available at: http://localhost:8000/docs")
     
-    uvicorn.run(
-        "api.main:app",
-        host=host,
-        port=port,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    if args.workers > 1:
+        from api.main import app
+        from api.prefork import serve_preforked
+        preload = not args.no_preload and os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+        print(f"Forking {args.workers} workers" + (" after preloading models" if preload else ""))
+        serve_preforked(app, host, port, args.workers, preload=preload)
+    else:
+        uvicorn.run(
+            "api.main:app",
+            host=host,
+            port=port,
+            reload=True,
+            log_level="info"
+        )
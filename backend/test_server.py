@@ -13,6 +13,7 @@ from typing import List, Dict, Any
 from src.embedding_engine import EmbeddingEngine
 from src.vector_store import VectorStore
 from src.search_engine import SemanticSearchEngine
+from src.lru_cache import LRUCache
 import uvicorn
 
 app = FastAPI(title="IRIS.ai RAG API - Test Mode")
@@ -64,7 +65,7 @@ def get_search_components():
         vector_store = VectorStore()
     
     if not search_engine:
-        search_engine = SemanticSearchEngine(embedding_engine, vector_store)
+        search_engine = SemanticSearchEngine(embedding_engine, vector_store, result_cache=LRUCache(4096))
     
     return search_engine
 
@@ -136,6 +137,7 @@ async def get_status():
             "mode": "test",
             "total_chunks": stats['total_chunks'],
             "embedding_model": "all-MiniLM-L6-v2",
+            "retrieval_cache": search_engine.result_cache.stats(),
             "note": "Running in test mode without Claude Sonnet"
         }
         